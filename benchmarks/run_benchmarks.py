@@ -0,0 +1,316 @@
+"""
+Benchmark suite for the organiser pipeline.
+
+Every scenario generates a fresh, seeded tree (untimed), then times one stage
+of the pipeline against it. Results are compared with a stored baseline so a
+change to hashing, categorisation or the empty-folder sweep can be measured.
+
+Usage:
+    python -m benchmarks.run_benchmarks                     # run everything, compare with baseline
+    python -m benchmarks.run_benchmarks -s hash_files -r 5  # one scenario, five repeats
+    python -m benchmarks.run_benchmarks --save-baseline     # record the current numbers
+    python -m benchmarks.run_benchmarks --workdir /dev/shm  # run on tmpfs
+
+Nothing here touches the network; trees are written under --workdir (the
+system temp directory by default).
+
+The committed benchmarks/baseline.json was recorded with
+    python -m benchmarks.run_benchmarks -r 5 --save-baseline
+on the machine named in the file. Timings do not carry over between machines,
+so record your own baseline (same command, before making a change) and compare
+against that; --baseline points the suite at a different file.
+"""
+import os, sys, json, time, shutil, tempfile, argparse, statistics, platform, logging
+
+from benchmarks.tree_generator import generate_tree, list_files, merge_spec
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# A run is flagged as a regression when it is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.25
+
+# Tree presets, scaled by --scale
+PRESETS = {
+    "default": {},
+    "small_files": {"size_distribution": "fixed", "size_median": 2 * 1024},
+    "large_files": {"files": 200, "size_distribution": "pareto", "size_median": 1024 * 1024,
+                    "size_max": 64 * 1024 * 1024},
+    "duplicate_heavy": {"duplicate_ratio": 0.6, "numbered_copy_ratio": 0.2},
+    "deep_empty": {"files": 200, "empty_chains": 400, "empty_chain_depth": 12},
+}
+
+
+def _scaled(preset, scale):
+    spec = merge_spec(PRESETS[preset])
+    spec["files"] = max(1, int(spec["files"] * scale))
+    spec["empty_chains"] = int(spec["empty_chains"] * scale)
+    return spec
+
+
+# ---------------------------------------------------------------------------
+# Scenarios. Each takes (workdir, spec, seed), prepares its input untimed and
+# returns a callable that performs the timed work and returns the number of
+# items it handled.
+# ---------------------------------------------------------------------------
+
+def scenario_hash_files(workdir, spec, seed):
+    from organiser.section4_hashing import worker_hash_file
+    src = os.path.join(workdir, "src")
+    generate_tree(src, spec, seed)
+    paths = list_files(src)
+
+    def run():
+        for p in paths:
+            worker_hash_file(p, "sha256", 0)
+        return len(paths)
+    return run
+
+
+def scenario_hash_pool(workdir, spec, seed):
+    import multiprocessing
+    from functools import partial
+    from organiser.section4_hashing import worker_hash_file
+    src = os.path.join(workdir, "src")
+    generate_tree(src, spec, seed)
+    paths = list_files(src)
+
+    def run():
+        with multiprocessing.Pool() as pool:
+            worker = partial(worker_hash_file, algo="sha256", skip_size=0)
+            for _ in pool.imap_unordered(worker, paths):
+                pass
+        return len(paths)
+    return run
+
+
+def scenario_categorise(workdir, spec, seed):
+    from organiser.section6_categorisation import build_final_path_default
+    src = os.path.join(workdir, "src")
+    dest = os.path.join(workdir, "Categorised")
+    generate_tree(src, spec, seed)
+    paths = list_files(src)
+
+    def run():
+        for p in paths:
+            build_final_path_default(dest, p)
+        return len(paths)
+    return run
+
+
+def scenario_filename_duplicates(workdir, spec, seed):
+    from organiser.section7_processing_thread import ProcessingThread
+    src = os.path.join(workdir, "src")
+    generate_tree(src, spec, seed)
+    paths = list_files(src)
+
+    def run():
+        ProcessingThread.find_potential_duplicates(None, paths)
+        return len(paths)
+    return run
+
+
+def scenario_empty_sweep(workdir, spec, seed):
+    from organiser.section5_empty_cleanup import move_empty_folders_single_pass
+    src = os.path.join(workdir, "src")
+    organised = os.path.join(workdir, "organised")
+    generate_tree(src, spec, seed)
+
+    def run():
+        return move_empty_folders_single_pass(organised, [src])
+    return run
+
+
+def scenario_full_pipeline(workdir, spec, seed):
+    from organiser.section7_processing_thread import ProcessingThread
+    src = os.path.join(workdir, "src")
+    organised = os.path.join(workdir, "organised")
+    generate_tree(src, spec, seed)
+    # Seed the organised folder with a previous run's worth of files so the
+    # destination hashing and duplicate lookups have something to match against
+    generate_tree(os.path.join(organised, "Categorised", "previous"),
+                  dict(spec, files=max(1, spec["files"] // 4)), seed)
+    paths = list_files(src)
+
+    def run():
+        thread = ProcessingThread(paths, "sha256", [], 0, organised, [src])
+        thread._process_files()
+        return len(paths)
+    return run
+
+
+def scenario_keyword_organiser(workdir, spec, seed):
+    from organiser.section9_keyword_dialog import organize_by_keyword
+    src = os.path.join(workdir, "src")
+    dest = os.path.join(workdir, "keywords")
+    generate_tree(src, spec, seed)
+    keywords = spec["keywords"]
+
+    def run():
+        moved, _ = organize_by_keyword(src, dest, keywords)
+        return moved
+    return run
+
+
+def scenario_extension_organiser(workdir, spec, seed):
+    from organiser.section8_extension_dialog import organize_by_extension
+    src = os.path.join(workdir, "src")
+    dest = os.path.join(workdir, "extensions")
+    generate_tree(src, spec, seed)
+
+    def run():
+        moved, _ = organize_by_extension(src, dest, ["jpg", "png", "pdf", "docx", "mp4"])
+        return moved
+    return run
+
+
+def scenario_merge_hashing(workdir, spec, seed):
+    from organiser.section13_merge_dialog import MergeFoldersDialog
+    src = os.path.join(workdir, "src")
+    dest = os.path.join(workdir, "dest")
+    generate_tree(src, spec, seed)
+    # Half of the destination overlaps with the source
+    generate_tree(dest, dict(spec, files=max(1, spec["files"] // 2)), seed)
+
+    def run():
+        dest_hashes = MergeFoldersDialog.get_folder_hashes(None, dest)
+        source_hashes = MergeFoldersDialog.get_folder_hashes(None, src)
+        dest_hash_set = set(dest_hashes.keys())
+        return sum(len(v) for h, v in source_hashes.items() if h not in dest_hash_set) + len(dest_hashes)
+    return run
+
+
+# name -> (scenario, preset)
+SCENARIOS = {
+    "hash_files": (scenario_hash_files, "default"),
+    "hash_files_large": (scenario_hash_files, "large_files"),
+    "hash_pool": (scenario_hash_pool, "small_files"),
+    "categorise": (scenario_categorise, "default"),
+    "filename_duplicates": (scenario_filename_duplicates, "duplicate_heavy"),
+    "empty_sweep": (scenario_empty_sweep, "deep_empty"),
+    "full_pipeline": (scenario_full_pipeline, "duplicate_heavy"),
+    "keyword_organiser": (scenario_keyword_organiser, "default"),
+    "extension_organiser": (scenario_extension_organiser, "default"),
+    "merge_hashing": (scenario_merge_hashing, "duplicate_heavy"),
+}
+
+
+def run_scenario(name, workdir, repeats, scale, seed):
+    scenario, preset = SCENARIOS[name]
+    spec = _scaled(preset, scale)
+    timings = []
+    items = 0
+    for i in range(repeats):
+        run_dir = tempfile.mkdtemp(prefix=f"fw-bench-{name}-", dir=workdir)
+        try:
+            run = scenario(run_dir, spec, seed)
+            start = time.perf_counter()
+            items = run()
+            timings.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+    median = statistics.median(timings)
+    return {
+        "median_s": median,
+        "min_s": min(timings),
+        "max_s": max(timings),
+        "repeats": repeats,
+        "items": items,
+        "items_per_s": (items / median) if median > 0 else 0.0,
+        "scale": scale,
+        "seed": seed,
+    }
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("results", {})
+    except (json.JSONDecodeError, OSError) as ex:
+        logging.error("Failed to read benchmark baseline %s: %s", path, ex)
+        return {}
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    existing = load_baseline(path)
+    existing.update(results)
+    with open(path, "w") as f:
+        json.dump({
+            "machine": platform.platform(),
+            "python": platform.python_version(),
+            "results": existing,
+        }, f, indent=4, sort_keys=True)
+
+
+def compare(name, result, baseline):
+    """
+    Returns (ratio, verdict) of this run against the baseline entry for name.
+    A ratio above 1 means slower than the baseline.
+    """
+    base = baseline.get(name)
+    if not base:
+        return None, "no baseline"
+    if base.get("scale") != result["scale"] or base.get("seed") != result["seed"]:
+        return None, "baseline recorded with a different scale/seed"
+    if base["median_s"] <= 0:
+        return None, "empty baseline"
+    ratio = result["median_s"] / base["median_s"]
+    if ratio > REGRESSION_THRESHOLD:
+        verdict = "REGRESSION"
+    elif ratio < 1 / REGRESSION_THRESHOLD:
+        verdict = "improved"
+    else:
+        verdict = "ok"
+    return ratio, verdict
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the organiser benchmark suite.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable). Defaults to all.")
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplier applied to the number of generated files.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--workdir", default=tempfile.gettempdir(),
+                        help="Where trees are generated, e.g. /dev/shm for tmpfs.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run's results as the new baseline.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--log-level", default="CRITICAL",
+                        help="Logging level while benchmarking; console logging skews timings.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+
+    names = args.scenario or list(SCENARIOS)
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = 0
+
+    print(f"{'scenario':<22} {'median':>10} {'items/s':>12} {'vs baseline':>12}  verdict")
+    for name in names:
+        try:
+            result = run_scenario(name, args.workdir, args.repeats, args.scale, args.seed)
+        except ImportError as ex:
+            print(f"{name:<22} {'skipped':>10}  ({ex})")
+            continue
+        results[name] = result
+        ratio, verdict = compare(name, result, baseline)
+        if verdict == "REGRESSION":
+            regressions += 1
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<22} {result['median_s']:>9.3f}s {result['items_per_s']:>12.1f} {ratio_text:>12}  {verdict}")
+
+    if args.save_baseline and results:
+        save_baseline(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.fail_on_regression and regressions:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
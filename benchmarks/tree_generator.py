@@ -0,0 +1,200 @@
+import os, random, math, time, json, logging
+
+# Default shape of a generated tree. Every key can be overridden by passing a
+# partial dict to generate_tree(); anything missing falls back to these values.
+DEFAULT_SPEC = {
+    "files": 2000,
+    "max_depth": 4,
+    "dirs_per_level": 4,
+    # "lognormal", "pareto", "uniform" or "fixed"
+    "size_distribution": "lognormal",
+    "size_median": 16 * 1024,
+    "size_sigma": 1.5,
+    "size_min": 0,
+    "size_max": 8 * 1024 * 1024,
+    # Fraction of files whose content is copied from an earlier file elsewhere in the tree
+    "duplicate_ratio": 0.2,
+    # Fraction of files that get a 'name (N).ext' copy next to them
+    "numbered_copy_ratio": 0.05,
+    # Chains of nested folders containing nothing but more folders
+    "empty_chains": 20,
+    "empty_chain_depth": 6,
+    # Relative weights of extensions; "" means no extension
+    "extension_mix": {
+        ".jpg": 25, ".png": 8, ".heic": 3, ".mp4": 4, ".mov": 2, ".mp3": 4,
+        ".pdf": 10, ".docx": 8, ".txt": 8, ".xlsx": 5, ".csv": 3, ".pptx": 2,
+        ".zip": 2, ".py": 3, ".json": 3, ".html": 2, ".exe": 1, ".log": 2,
+        ".tmp": 1, ".ttf": 1, ".xyz": 1, "": 1,
+    },
+    # Keywords embedded in a fraction of filenames, for the keyword organiser
+    "keywords": ["invoice", "report", "draft", "scan", "backup"],
+    "keyword_ratio": 0.2,
+    # Range of modification years stamped onto generated files
+    "year_range": [2012, 2024],
+}
+
+# Random bytes shared by every generated file. Each file prefixes a unique
+# header onto a slice of this pool, so content is distinct without paying
+# for a fresh random stream per file.
+_POOL_SIZE = 4 * 1024 * 1024
+
+WORDS = ["alpha", "budget", "client", "delta", "event", "family", "garden", "holiday",
+         "import", "journal", "kitchen", "ledger", "meeting", "notes", "office", "project",
+         "quarter", "receipt", "summary", "travel", "update", "vendor", "weekly", "year"]
+
+
+def merge_spec(overrides=None):
+    spec = dict(DEFAULT_SPEC)
+    if overrides:
+        spec.update(overrides)
+    return spec
+
+
+def sample_size(rng, spec):
+    dist = spec["size_distribution"]
+    if dist == "fixed":
+        size = spec["size_median"]
+    elif dist == "uniform":
+        size = rng.randint(spec["size_min"], spec["size_max"])
+    elif dist == "pareto":
+        # Heavy tail: most files are small, a few are huge
+        size = spec["size_median"] * (rng.paretovariate(1.2) - 0.5)
+    else:
+        size = rng.lognormvariate(math.log(max(spec["size_median"], 1)), spec["size_sigma"])
+    return int(min(max(size, spec["size_min"]), spec["size_max"]))
+
+
+def _pick_extension(rng, spec):
+    mix = spec["extension_mix"]
+    exts = list(mix.keys())
+    return rng.choices(exts, weights=[mix[e] for e in exts], k=1)[0]
+
+
+def _make_dirs(rng, root, spec):
+    """
+    Builds the folder skeleton and returns the list of folders files can live in.
+    """
+    dirs = [root]
+    frontier = [root]
+    for depth in range(spec["max_depth"]):
+        next_frontier = []
+        for parent in frontier:
+            for _ in range(rng.randint(1, spec["dirs_per_level"])):
+                name = f"{rng.choice(WORDS)}_{depth}_{len(dirs)}"
+                path = os.path.join(parent, name)
+                os.makedirs(path, exist_ok=True)
+                dirs.append(path)
+                next_frontier.append(path)
+        frontier = next_frontier
+    return dirs
+
+
+def _write(path, header, size, pool, rng, mtime):
+    with open(path, "wb") as f:
+        if size > 0:
+            data = header[:size]
+            remaining = size - len(data)
+            f.write(data)
+            while remaining > 0:
+                n = min(remaining, len(pool))
+                offset = rng.randrange(0, len(pool) - n + 1)
+                f.write(pool[offset:offset + n])
+                remaining -= n
+    os.utime(path, (mtime, mtime))
+
+
+def _mtime_for(rng, spec):
+    first, last = spec["year_range"]
+    year = rng.randint(first, last)
+    start = time.mktime((year, 1, 1, 0, 0, 0, 0, 0, -1))
+    return start + rng.uniform(0, 364 * 24 * 3600)
+
+
+def generate_tree(root, spec=None, seed=0):
+    """
+    Generates a reproducible file tree under root. The same spec and seed always
+    produce the same names, sizes, contents and mtimes.
+    Returns a dict of statistics describing what was written.
+    """
+    spec = merge_spec(spec)
+    rng = random.Random(seed)
+    pool = random.Random(seed ^ 0x5EED).randbytes(_POOL_SIZE)
+    os.makedirs(root, exist_ok=True)
+
+    dirs = _make_dirs(rng, root, spec)
+    stats = {
+        "seed": seed,
+        "files": 0,
+        "bytes": 0,
+        "unique_files": 0,
+        "duplicate_files": 0,
+        "numbered_copies": 0,
+        "empty_dirs": 0,
+        "dirs": len(dirs) - 1,
+    }
+    # (stem, ext, header, size, content_seed) of every unique file written so far,
+    # so duplicates can reproduce the exact same bytes
+    originals = []
+    used_names = set()
+
+    for i in range(spec["files"]):
+        folder = rng.choice(dirs)
+        stem = f"{rng.choice(WORDS)} {i}"
+        if spec["keywords"] and rng.random() < spec["keyword_ratio"]:
+            stem = f"{rng.choice(spec['keywords'])} {stem}"
+
+        if originals and rng.random() < spec["duplicate_ratio"]:
+            orig_stem, ext, header, size, content_seed = rng.choice(originals)
+            # Half of the duplicates keep the original name, like a copied folder would
+            if rng.random() < 0.5:
+                stem = orig_stem
+            is_duplicate = True
+        else:
+            ext = _pick_extension(rng, spec)
+            size = sample_size(rng, spec)
+            header = f"fw-bench {seed} {i}\n".encode()
+            content_seed = rng.random()
+            is_duplicate = False
+
+        path = os.path.join(folder, stem + ext)
+        if path in used_names:
+            continue
+        used_names.add(path)
+        if is_duplicate:
+            stats["duplicate_files"] += 1
+        else:
+            originals.append((stem, ext, header, size, content_seed))
+            stats["unique_files"] += 1
+
+        mtime = _mtime_for(rng, spec)
+        _write(path, header, size, pool, random.Random(content_seed), mtime)
+        stats["files"] += 1
+        stats["bytes"] += size
+
+        if rng.random() < spec["numbered_copy_ratio"]:
+            copies = rng.randint(1, 3)
+            for n in range(1, copies + 1):
+                copy_path = os.path.join(folder, f"{stem} ({n}){ext}")
+                _write(copy_path, header, size, pool, random.Random(content_seed), mtime)
+                used_names.add(copy_path)
+                stats["files"] += 1
+                stats["bytes"] += size
+                stats["numbered_copies"] += 1
+
+    for c in range(spec["empty_chains"]):
+        path = rng.choice(dirs)
+        for depth in range(spec["empty_chain_depth"]):
+            path = os.path.join(path, f"empty_{c}_{depth}")
+        os.makedirs(path, exist_ok=True)
+        stats["empty_dirs"] += spec["empty_chain_depth"]
+
+    logging.info("Generated benchmark tree at %s: %s", root, json.dumps(stats))
+    return stats
+
+
+def list_files(root):
+    paths = []
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            paths.append(os.path.join(dirpath, name))
+    return paths
@@ -1,8 +1,10 @@
 import sys
 from PyQt5.QtWidgets import QApplication
+from organiser.section1_logging import configure_logging
 from organiser.section10_gui import OrganiseGUI
 
 def main():
+    configure_logging()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     dark_style = """
@@ -2,19 +2,53 @@ import sys, os
 from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QPushButton, QFileDialog,
                              QComboBox, QLineEdit, QListWidget, QListWidgetItem,
                              QAbstractItemView, QVBoxLayout, QHBoxLayout, QMessageBox,
-                             QProgressBar, QTextEdit, QDialog, QFormLayout, QDialogButtonBox,
+                             QProgressBar, QDialog, QFormLayout, QDialogButtonBox,
                              QGridLayout, QShortcut, QRadioButton)
 from PyQt5.QtGui import QKeySequence, QDesktopServices
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QUrl
 
 from organiser.section2_configuration import CONFIG, save_config
 from organiser.section3_helpers import categorised_dir, duplicates_dir, to_be_deleted_dir
-from organiser.section7_processing_thread import ProcessingThread
+from organiser.section7_processing_thread import ProcessingThread, DEFAULT_OUT_OF_CORE_THRESHOLD
 from organiser.section8_extension_dialog import ExtensionOrganizerDialog
 from organiser.section9_keyword_dialog import KeywordOrganizerDialog
 from organiser.section11_summary import SummaryDialog, compute_directory_summary
 from organiser.section12_admin_dialog import FolderAdminOperationDialog
 from organiser.section13_merge_dialog import MergeFoldersDialog
+from organiser.section15_event_log import EventLogView
+from organiser.section17_watch import WatchThread
+from organiser.section21_link_dedup import LinkDedupDialog
+from organiser.section22_quarantine import QuarantineDialog
+from organiser.section23_io_scheduler import any_rotational, DEFAULT_HDD_WORKERS
+from organiser.section24_scanner import scan_summary, scan_files, DEFAULT_SCAN_THREADS
+from organiser.section36_throttle_dialog import ThrottleDialog
+from organiser.section34_estimator import DuplicateSampler, format_estimate, DEFAULT_ESTIMATE_SECONDS
+
+class SourceSurveyThread(QThread):
+    """
+    Counts the source folders and estimates their duplicates before the confirm dialog,
+    off the GUI thread; both touch every directory and can take minutes on big trees.
+    """
+    result_signal = pyqtSignal(int, int, object, object, object)  # files, folders, bytes, file list or None, estimate
+
+    def __init__(self, target_folders, collect_limit, threads_per_device, sampler, estimate_seconds):
+        super().__init__()
+        self.target_folders = target_folders
+        self.collect_limit = collect_limit
+        self.threads_per_device = threads_per_device
+        self.sampler = sampler
+        self.estimate_seconds = estimate_seconds
+
+    def run(self):
+        sampler = self.sampler
+        files, folders, size, all_files = scan_summary(
+            self.target_folders, collect_limit=self.collect_limit, threads_per_device=self.threads_per_device,
+            observer=sampler.add if sampler is not None else None)
+        estimate = None
+        if sampler is not None and files:
+            estimate = sampler.estimate(seconds=self.estimate_seconds)
+        self.result_signal.emit(files, folders, size, all_files, estimate)
+
 
 class OrganiseGUI(QWidget):
     def __init__(self):
@@ -22,6 +56,7 @@ class OrganiseGUI(QWidget):
         self.setWindowTitle("File Wizard")
         self.setGeometry(100, 100, 900, 600)  # Increased initial width by 100px
         self.processing_thread = None
+        self.survey_thread = None
         self.init_ui()
         # Initialize folders from config
         for folder in CONFIG["target_folders"]:
@@ -81,6 +116,9 @@ class OrganiseGUI(QWidget):
         control_layout.addWidget(self.start_btn)
         control_layout.addWidget(self.stop_btn)
         folder_section.addLayout(control_layout)
+        self.watch_btn = QPushButton("Start Watch Mode")
+        self.watch_btn.setMinimumWidth(540)
+        folder_section.addWidget(self.watch_btn, alignment=Qt.AlignCenter)
         config_layout.addLayout(folder_section)
 
         # Destination Section
@@ -138,9 +176,11 @@ class OrganiseGUI(QWidget):
         progress_section = QVBoxLayout()
         self.progress_bar = QProgressBar()
         self.status_label = QLabel("")
+        self.rate_label = QLabel("")
         progress_section.addWidget(QLabel("<b>Progress:</b>"))
         progress_section.addWidget(self.progress_bar)
         progress_section.addWidget(self.status_label)
+        progress_section.addWidget(self.rate_label)
         action_layout.addLayout(progress_section)
 
         # Organizer Buttons
@@ -149,15 +189,18 @@ class OrganiseGUI(QWidget):
         self.keyword_btn = QPushButton("Organize by Keyword")
         self.admin_btn = QPushButton("Administrative Folder Controls")
         self.merge_btn = QPushButton("Merge Folders")
+        self.dedup_btn = QPushButton("Deduplicate In Place")
+        self.quarantine_btn = QPushButton("Quarantine")
+        self.throttle_btn = QPushButton("Throttling")
         organizer_layout.addWidget(self.merge_btn)
-        for btn in [self.extension_btn, self.keyword_btn, self.admin_btn]:
+        for btn in [self.extension_btn, self.keyword_btn, self.admin_btn, self.dedup_btn, self.quarantine_btn,
+                    self.throttle_btn]:
             btn.setMinimumWidth(150)
             organizer_layout.addWidget(btn)
         action_layout.addLayout(organizer_layout)
 
         # Error Display
-        self.error_display = QTextEdit()
-        self.error_display.setReadOnly(True)
+        self.error_display = EventLogView(capacity=CONFIG.get("event_log_capacity", 100000))
         action_layout.addWidget(QLabel("<b>Activity Report:</b>"))
         action_layout.addWidget(self.error_display)
 
@@ -175,16 +218,39 @@ class OrganiseGUI(QWidget):
         self.root_browse_btn.clicked.connect(self.browse_root)
         self.start_btn.clicked.connect(self.start_processing)
         self.stop_btn.clicked.connect(self.stop_processing)
+        self.watch_btn.clicked.connect(self.start_watch)
         self.exit_btn.clicked.connect(self.close)
         self.extension_btn.clicked.connect(self.show_extension_organizer)
         self.keyword_btn.clicked.connect(self.show_keyword_organizer)
         self.admin_btn.clicked.connect(self.show_admin_controls)
         self.merge_btn.clicked.connect(self.show_merge_dialog)
+        self.dedup_btn.clicked.connect(self.show_dedup_dialog)
+        self.quarantine_btn.clicked.connect(self.show_quarantine_dialog)
+        self.throttle_btn.clicked.connect(self.show_throttle_dialog)
 
     def show_merge_dialog(self):
         dialog = MergeFoldersDialog(self)
         dialog.exec_()
 
+    def show_dedup_dialog(self):
+        dialog = LinkDedupDialog(self)
+        dialog.exec_()
+
+    def show_quarantine_dialog(self):
+        if not CONFIG["organised_folder"]:
+            QMessageBox.warning(self, "No Organised Folder", "Set the organised folder first.")
+            return
+        dialog = QuarantineDialog(CONFIG["organised_folder"], CONFIG["hash_algorithm"], self)
+        dialog.exec_()
+
+    def show_throttle_dialog(self):
+        # A running job picks up the new limits straight away
+        throttle = None
+        if self.processing_thread and self.processing_thread.isRunning():
+            throttle = self.processing_thread.throttle
+        dialog = ThrottleDialog(throttle, self)
+        dialog.exec_()
+
     def add_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select a target folder")
         if folder:
@@ -211,27 +277,19 @@ class OrganiseGUI(QWidget):
             CONFIG["organised_folder"] = folder
             save_config(CONFIG)  # Save the updated configuration
 
-    def compute_multiple_directories_summary(self, dirs):
-        files_total = 0
-        folders_total = 0
-        size_total = 0
-        for d in dirs:
-            f_count, d_count, s_count = compute_directory_summary(d)
-            files_total += f_count
-            folders_total += d_count
-            size_total += s_count
-        return files_total, folders_total, size_total
-
-    def start_processing(self):
-        # Gather inputs and start the ProcessingThread
+    def save_settings_from_ui(self):
+        """
+        Validates the folder inputs and saves the settings to config.json.
+        Returns (target_folders, organised_folder), or (None, None) if something is missing.
+        """
         target_folders = [self.folder_list.item(i).text() for i in range(self.folder_list.count())]
         if not target_folders:
             QMessageBox.warning(self, "No Folders", "Please add at least one folder to organise.")
-            return
+            return None, None
         organised_folder = self.root_input.text().strip()
         if not organised_folder:
             QMessageBox.warning(self, "No Organised Folder", "Please specify the organised folder.")
-            return
+            return None, None
         
         # Convert skip_input from MB to bytes
         try:
@@ -247,35 +305,69 @@ class OrganiseGUI(QWidget):
         CONFIG["skip_larger_than"] = skip_size_bytes
         CONFIG["multiprocessing_cores"] = int(self.cores_input.text().strip())
         save_config(CONFIG)
+        return target_folders, organised_folder
+
+    def start_processing(self):
+        # Gather inputs, then survey the source in the background before asking to proceed
+        if self.survey_thread and self.survey_thread.isRunning():
+            return
+        target_folders, organised_folder = self.save_settings_from_ui()
+        if not target_folders:
+            return
+
+        # One parallel pass counts the source and, below the out-of-core threshold,
+        # lists its files as well; the sampler sees every file as it goes by
+        threshold = CONFIG.get("out_of_core_threshold", DEFAULT_OUT_OF_CORE_THRESHOLD)
+        sampler = DuplicateSampler(CONFIG["skip_larger_than"]) if CONFIG.get("estimate_duplicates", True) else None
+        self.start_btn.setEnabled(False)
+        self.progress_bar.setMaximum(0)  # Busy indicator until the survey is in
+        self.status_label.setText("Scanning source folders...")
+        self.survey_thread = SourceSurveyThread(
+            target_folders,
+            collect_limit=threshold if threshold > 0 else None,
+            threads_per_device=CONFIG.get("scan_threads_per_device", DEFAULT_SCAN_THREADS),
+            sampler=sampler,
+            estimate_seconds=CONFIG.get("estimate_seconds", DEFAULT_ESTIMATE_SECONDS)
+        )
+        self.survey_thread.result_signal.connect(
+            lambda files, folders, size, all_files, estimate:
+            self.on_survey_done(target_folders, organised_folder, files, folders, size, all_files, estimate))
+        self.survey_thread.start()
 
-        # Summarise the source before we proceed
-        self.source_files, self.source_folders, self.source_size = self.compute_multiple_directories_summary(target_folders)
+    def on_survey_done(self, target_folders, organised_folder, files, folders, size, all_files, estimate):
+        self.start_btn.setEnabled(True)
+        self.progress_bar.setMaximum(100)
+        self.status_label.setText("")
+        self.source_files, self.source_folders, self.source_size = files, folders, size
         size_gb = self.source_size / (1024 * 1024 * 1024)
+        estimate_msg = ""
+        if estimate is not None:
+            estimate_msg = format_estimate(estimate, self.hashing_parallelism(target_folders)) + "\n\n"
 
         # Ask for confirmation
         confirm_msg = (f"Found {self.source_files} files in {self.source_folders} folders.\n"
                        f"Total size: {size_gb:.2f} GB.\n\n"
+                       f"{estimate_msg}"
                        "Do you want to proceed?")
         reply = QMessageBox.question(self, "Confirm Organise", confirm_msg,
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.No:
             return
 
-        # Collect all files
-        all_files = []
-        for folder in target_folders:
-            for root, _, files in os.walk(folder):
-                for file in files:
-                    full_path = os.path.join(root, file)
-                    all_files.append(full_path)
-        if not all_files:
+        if not self.source_files:
             QMessageBox.information(self, "No Files", "No files found in the specified folders.")
             return
 
+        if all_files is None:
+            # Too many to list up front; the thread streams them from a fresh scan instead
+            all_files = scan_files(target_folders,
+                                   threads_per_device=CONFIG.get("scan_threads_per_device", DEFAULT_SCAN_THREADS))
+
         # Prepare UI
         self.progress_bar.setValue(0)
         self.progress_bar.setMaximum(100)
         self.status_label.setText("Starting...")
+        self.rate_label.setText("")
         self.error_display.clear()
 
         # Start thread
@@ -285,12 +377,47 @@ class OrganiseGUI(QWidget):
             categories=CONFIG["categories"],
             skip_size=CONFIG["skip_larger_than"],
             organised_folder=organised_folder,
-            target_folders=target_folders
+            target_folders=target_folders,
+            total_bytes=self.source_size,
+            total_files=self.source_files
         )
         self.processing_thread.progress_signal.connect(self.on_progress_hashing)
         self.processing_thread.progress_cat_signal.connect(self.on_progress_moving)
+        self.processing_thread.telemetry_signal.connect(self.on_telemetry)
         self.processing_thread.done_signal.connect(self.on_done)
-        self.processing_thread.error_signal.connect(self.on_error)
+        self.processing_thread.errors_signal.connect(self.on_errors)
+        self.processing_thread.start()
+
+    def hashing_parallelism(self, target_folders):
+        # Files read at once during hashing: a few per spinning disk, otherwise one per process
+        if CONFIG.get("io_scheduling", True) and any_rotational(target_folders):
+            return CONFIG.get("hdd_workers_per_device", DEFAULT_HDD_WORKERS)
+        cores = CONFIG["multiprocessing_cores"]
+        return cores if cores > 0 else os.cpu_count() or 1
+
+    def start_watch(self):
+        if self.processing_thread and self.processing_thread.isRunning():
+            QMessageBox.information(self, "Already Running", "Stop the current process first.")
+            return
+        target_folders, organised_folder = self.save_settings_from_ui()
+        if not target_folders:
+            return
+
+        self.progress_bar.setMaximum(0)  # Busy indicator; watch mode has no end
+        self.status_label.setText("Watching for new files...")
+        self.rate_label.setText("")
+        self.error_display.clear()
+
+        self.processing_thread = WatchThread(
+            algo=CONFIG["hash_algorithm"],
+            categories=CONFIG["categories"],
+            skip_size=CONFIG["skip_larger_than"],
+            organised_folder=organised_folder,
+            target_folders=target_folders
+        )
+        self.processing_thread.telemetry_signal.connect(self.on_telemetry)
+        self.processing_thread.done_signal.connect(self.on_done)
+        self.processing_thread.errors_signal.connect(self.on_errors)
         self.processing_thread.start()
 
     def stop_processing(self):
@@ -316,16 +443,29 @@ class OrganiseGUI(QWidget):
         self.progress_bar.setValue(pct)
         self.status_label.setText(f"Moving files... {current}/{total} ({pct}%)")
 
+    def on_telemetry(self, snapshot):
+        done_gb = snapshot["bytes"] / (1024 * 1024 * 1024)
+        text = f"{snapshot['stage']}: {snapshot['files']} files, {done_gb:.2f} GB"
+        if snapshot["total_bytes"] > 0:
+            text += f" of {snapshot['total_bytes'] / (1024 * 1024 * 1024):.2f} GB"
+        if snapshot["mb_per_s"] > 0:
+            text += f" | {snapshot['mb_per_s']:.1f} MB/s"
+        if snapshot["stage"] != "Hashing" and snapshot["eta"] > 0:
+            text += f" | ETA: {snapshot['eta']:.1f}s"
+        self.rate_label.setText(text)
+
     def on_done(self, status, dup_count, nondup_count):
         if status == "success":
             self.status_label.setText("Completed successfully!")
-            self.show_final_summary(dup_count, nondup_count)
+            self.show_final_summary(dup_count, nondup_count,
+                                    self.processing_thread.dest_counters.summaries())
         else:
+            self.progress_bar.setMaximum(100)
             self.status_label.setText(f"Process {status}")
         self.processing_thread = None
 
-    def on_error(self, stage, filepath, message):
-        self.error_display.append(f"[{stage} ERROR] {filepath}: {message}")
+    def on_errors(self, errors):
+        self.error_display.extend(errors)
 
     def show_extension_organizer(self):
         dialog = ExtensionOrganizerDialog(self)
@@ -339,10 +479,19 @@ class OrganiseGUI(QWidget):
         dialog = FolderAdminOperationDialog(self)
         dialog.exec_()
 
-    def show_final_summary(self, dup_count, nondup_count):
-        cat_files, cat_folders, cat_size = compute_directory_summary(categorised_dir(CONFIG["organised_folder"]))
-        dup_files, dup_folders, dup_size = compute_directory_summary(duplicates_dir(CONFIG["organised_folder"]))
-        tbd_files, tbd_folders, tbd_size = compute_directory_summary(to_be_deleted_dir(CONFIG["organised_folder"]))
+    def show_final_summary(self, dup_count, nondup_count, counters=None):
+        # counters: live {name: (files, folders, size)} from the processing thread.
+        # Without them, fall back to walking the destination folders.
+        verify_dirs = {
+            "Categorised": categorised_dir(CONFIG["organised_folder"]),
+            "Duplicates": duplicates_dir(CONFIG["organised_folder"]),
+            "To Be Deleted": to_be_deleted_dir(CONFIG["organised_folder"]),
+        }
+        if counters is None:
+            counters = {name: compute_directory_summary(path) for name, path in verify_dirs.items()}
+        cat_files, cat_folders, cat_size = counters["Categorised"]
+        dup_files, dup_folders, dup_size = counters["Duplicates"]
+        tbd_files, tbd_folders, tbd_size = counters["To Be Deleted"]
 
         # Calculate "new folder size" and reduction
         new_folder_size = cat_size  # The organised folder is the "new" folder
@@ -382,5 +531,7 @@ class OrganiseGUI(QWidget):
             "Process complete."
         )
 
-        dialog = SummaryDialog(summary_text, CONFIG["organised_folder"], parent=self)
+        dialog = SummaryDialog(summary_text, CONFIG["organised_folder"], parent=self,
+                               verify_dirs=verify_dirs, expected=counters,
+                               auto_verify=CONFIG.get("verify_summary", False))
         dialog.exec_()
\ No newline at end of file
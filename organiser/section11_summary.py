@@ -1,7 +1,7 @@
 import os
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QPushButton, QDialogButtonBox
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QTextEdit, QPushButton, QDialogButtonBox
 from PyQt5.QtGui import QDesktopServices
-from PyQt5.QtCore import QUrl
+from PyQt5.QtCore import QUrl, QThread, pyqtSignal
 
 def compute_directory_summary(directory):
     total_files = 0
@@ -19,13 +19,104 @@ def compute_directory_summary(directory):
                 pass
     return total_files, total_folders, total_size
 
+class DirectoryCounters:
+    """
+    Running (files, folders, bytes) totals for one destination folder, kept up
+    to date as the pipeline moves files so the summary needs no re-walk.
+    Folders are counted the way compute_directory_summary does: every
+    directory below root, not root itself.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.normpath(root)
+        self.files = 0
+        self.bytes = 0
+        self.dirs = set()
+        self.extra_folders = 0
+
+    def contains(self, path):
+        return path == self.root or path.startswith(self.root + os.sep)
+
+    def add_dir(self, path):
+        path = os.path.normpath(path)
+        while path not in self.dirs and path != self.root and self.contains(path):
+            self.dirs.add(path)
+            path = os.path.dirname(path)
+
+    def add_file(self, path, size):
+        self.files += 1
+        self.bytes += size
+        self.add_dir(os.path.dirname(path))
+
+    def add_folders(self, count):
+        # Folders moved in wholesale (e.g. swept empty folders) whose insides we never list
+        self.extra_folders += count
+
+    def summary(self):
+        return self.files, len(self.dirs) + self.extra_folders, self.bytes
+
+
+class DestinationCounters:
+    """
+    DirectoryCounters for each destination folder, looked up by path.
+    """
+
+    def __init__(self, roots):
+        # roots: {name: path}
+        self.counters = {name: DirectoryCounters(path) for name, path in roots.items()}
+
+    def __getitem__(self, name):
+        return self.counters[name]
+
+    def counter_for(self, path):
+        path = os.path.normpath(path)
+        for counter in self.counters.values():
+            if counter.contains(path):
+                return counter
+        return None
+
+    def add_dir(self, path):
+        counter = self.counter_for(path)
+        if counter is not None:
+            counter.add_dir(path)
+
+    def add_file(self, path, size):
+        counter = self.counter_for(path)
+        if counter is not None:
+            counter.add_file(path, size)
+
+    def summaries(self):
+        return {name: counter.summary() for name, counter in self.counters.items()}
+
+
+class SummaryVerifyThread(QThread):
+    """
+    Walks the destination folders in the background to double-check the live counters.
+    """
+    result_signal = pyqtSignal(dict)  # {name: (files, folders, size)}
+
+    def __init__(self, directories):
+        super().__init__()
+        self.directories = directories
+
+    def run(self):
+        self.result_signal.emit({name: compute_directory_summary(path)
+                                 for name, path in self.directories.items()})
+
+
 class SummaryDialog(QDialog):
-    def __init__(self, summary_text, folder_path, parent=None):
+    def __init__(self, summary_text, folder_path, parent=None, verify_dirs=None, expected=None, auto_verify=False):
         super().__init__(parent)
         self.setWindowTitle("Organisation Summary")
         self.setGeometry(300, 300, 600, 400)
         self.folder_path = folder_path
+        # {name: path} to walk and {name: (files, folders, size)} to compare against
+        self.verify_dirs = verify_dirs or {}
+        self.expected = expected or {}
+        self.verify_thread = None
         self.init_ui(summary_text)
+        if auto_verify and self.verify_dirs:
+            self.start_verification()
     
     def init_ui(self, summary_text):
         layout = QVBoxLayout()
@@ -33,13 +124,47 @@ class SummaryDialog(QDialog):
         self.summary_display.setReadOnly(True)
         self.summary_display.setText(summary_text)
         layout.addWidget(self.summary_display)
+        button_layout = QHBoxLayout()
         self.open_folder_btn = QPushButton("Open Organised Folder")
         self.open_folder_btn.clicked.connect(self.open_folder)
-        layout.addWidget(self.open_folder_btn)
+        button_layout.addWidget(self.open_folder_btn)
+        if self.verify_dirs:
+            self.verify_btn = QPushButton("Verify Totals")
+            self.verify_btn.clicked.connect(self.start_verification)
+            button_layout.addWidget(self.verify_btn)
+        layout.addLayout(button_layout)
         self.button_box = QDialogButtonBox(QDialogButtonBox.Ok)
         self.button_box.accepted.connect(self.accept)
         layout.addWidget(self.button_box)
         self.setLayout(layout)
     
     def open_folder(self):
-        QDesktopServices.openUrl(QUrl.fromLocalFile(self.folder_path))
\ No newline at end of file
+        QDesktopServices.openUrl(QUrl.fromLocalFile(self.folder_path))
+
+    def start_verification(self):
+        if self.verify_thread is not None:
+            return
+        self.verify_btn.setEnabled(False)
+        self.summary_display.append("\nVerifying totals on disk...")
+        self.verify_thread = SummaryVerifyThread(self.verify_dirs)
+        self.verify_thread.result_signal.connect(self.on_verified)
+        self.verify_thread.start()
+
+    def on_verified(self, results):
+        mismatches = []
+        for name, actual in results.items():
+            expected = self.expected.get(name)
+            if expected is not None and tuple(expected) != tuple(actual):
+                mismatches.append(f" - {name}: counted {expected[0]} files / {expected[1]} folders / "
+                                  f"{expected[2]} bytes, on disk {actual[0]} / {actual[1]} / {actual[2]}")
+        if mismatches:
+            self.summary_display.append("Verification found differences:\n" + "\n".join(mismatches))
+        else:
+            self.summary_display.append("Verification complete: totals match the disk.")
+        self.verify_btn.setEnabled(True)
+        self.verify_thread = None
+
+    def done(self, result):
+        if self.verify_thread is not None:
+            self.verify_thread.wait()
+        super().done(result)
\ No newline at end of file
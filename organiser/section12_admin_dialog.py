@@ -5,6 +5,8 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdi
 
 from organiser.section3_helpers import ensure_dir_exists
 
+logger = logging.getLogger(__name__)
+
 class FolderAdminOperationDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -130,12 +132,12 @@ class FolderAdminOperationDialog(QDialog):
             try:
                 os.rmdir(d)
             except Exception as e:
-                logging.error(f"Error deleting directory {d}: {e}")
+                logger.error("Error deleting directory %s: %s", d, e)
         # Finally, delete the top folder
         try:
             os.rmdir(folder)
         except Exception as e:
-            logging.error(f"Error deleting folder {folder}: {e}")
+            logger.error("Error deleting folder %s: %s", folder, e)
         
         self.progress_bar.setVisible(False)
         
@@ -4,6 +4,8 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdi
                              QFileDialog, QApplication, QProgressBar)
 from organiser.section3_helpers import ensure_dir_exists
 
+logger = logging.getLogger(__name__)
+
 class MergeFoldersDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -77,7 +79,7 @@ class MergeFoldersDialog(QDialog):
                         content = f.read()
                     file_hash = hashlib.sha256(content).hexdigest()
                 except Exception as e:
-                    logging.error(f"Error reading file {full_path}: {e}")
+                    logger.error("Error reading file %s: %s", full_path, e)
                     continue
                 rel_path = os.path.relpath(full_path, folder)
                 if file_hash not in file_dict:
@@ -142,7 +144,7 @@ class MergeFoldersDialog(QDialog):
                         self.status_text.append(f"Deleted duplicate: {src_full}")
                         QApplication.processEvents()
                     except Exception as e:
-                        logging.error(f"Error deleting file {src_full}: {e}")
+                        logger.error("Error deleting file %s: %s", src_full, e)
         
         # Move unique files to destination
         for src_full, rel in to_move:
@@ -157,7 +159,7 @@ class MergeFoldersDialog(QDialog):
                 self.status_text.append(f"Moved: {src_full} -> {dest_path}")
                 QApplication.processEvents()
             except Exception as e:
-                logging.error(f"Error moving file {src_full}: {e}")
+                logger.error("Error moving file %s: %s", src_full, e)
         
         self.progress_bar.setVisible(False)
         self.status_text.append("Merge completed successfully!")
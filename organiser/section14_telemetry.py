@@ -0,0 +1,124 @@
+import time
+
+# How often (seconds) coalesced progress is published to the GUI
+DEFAULT_INTERVAL = 0.25
+# Errors are flushed early once this many are waiting, whatever the interval
+DEFAULT_ERROR_BATCH = 500
+# Weight of the newest throughput sample in the moving average
+EWMA_ALPHA = 0.3
+# Samples over shorter windows than this are too noisy to feed the average
+MIN_SAMPLE_WINDOW = 0.05
+
+
+class StageProgress:
+    """
+    Counts files and bytes for one pipeline stage and keeps an exponentially
+    weighted moving average of throughput for the ETA.
+    """
+    __slots__ = ("name", "total_files", "total_bytes", "files", "bytes", "started",
+                 "_last_time", "_last_files", "_last_bytes", "files_rate", "bytes_rate")
+
+    def __init__(self, name, total_files=0, total_bytes=0):
+        self.name = name
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_time = self.started
+        self._last_files = 0
+        self._last_bytes = 0
+        self.files_rate = 0.0
+        self.bytes_rate = 0.0
+
+    def sample(self, now):
+        elapsed = now - self._last_time
+        if elapsed < MIN_SAMPLE_WINDOW:
+            return
+        files_rate = (self.files - self._last_files) / elapsed
+        bytes_rate = (self.bytes - self._last_bytes) / elapsed
+        if self._last_time == self.started:
+            # First sample seeds the average instead of decaying from zero
+            self.files_rate = files_rate
+            self.bytes_rate = bytes_rate
+        else:
+            self.files_rate = EWMA_ALPHA * files_rate + (1 - EWMA_ALPHA) * self.files_rate
+            self.bytes_rate = EWMA_ALPHA * bytes_rate + (1 - EWMA_ALPHA) * self.bytes_rate
+        self._last_time = now
+        self._last_files = self.files
+        self._last_bytes = self.bytes
+
+    def eta(self):
+        """
+        Seconds remaining, estimated from bytes when the stage total is known
+        (file sizes vary too much for file counts to be reliable), else files.
+        Returns 0.0 when there is nothing to base an estimate on.
+        """
+        if self.total_bytes > 0 and self.bytes_rate > 0:
+            return max(self.total_bytes - self.bytes, 0) / self.bytes_rate
+        if self.total_files > 0 and self.files_rate > 0:
+            return max(self.total_files - self.files, 0) / self.files_rate
+        return 0.0
+
+    def snapshot(self):
+        return {
+            "stage": self.name,
+            "files": self.files,
+            "total_files": self.total_files,
+            "bytes": self.bytes,
+            "total_bytes": self.total_bytes,
+            "mb_per_s": self.bytes_rate / (1024 * 1024),
+            "files_per_s": self.files_rate,
+            "eta": self.eta(),
+            "elapsed": time.monotonic() - self.started,
+        }
+
+
+class Telemetry:
+    """
+    Rate-limited progress and error channel for the processing thread.
+
+    The worker calls advance() and error() as often as it likes; they only
+    return True when a publish is due, so the thread emits a handful of Qt
+    signals per second however many files go past.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, error_batch=DEFAULT_ERROR_BATCH):
+        self.interval = interval
+        self.error_batch = error_batch
+        self.stage = None
+        self.errors = []
+        self.error_count = 0
+        self._next_publish = 0.0
+
+    def start_stage(self, name, total_files=0, total_bytes=0):
+        self.stage = StageProgress(name, total_files, total_bytes)
+        # Publish the new stage straight away so the GUI label changes
+        self._next_publish = 0.0
+        return self.stage
+
+    def advance(self, files=1, nbytes=0):
+        stage = self.stage
+        stage.files += files
+        stage.bytes += nbytes
+        return time.monotonic() >= self._next_publish
+
+    def error(self, stage, filepath, message):
+        self.errors.append((stage, filepath, message))
+        self.error_count += 1
+        return len(self.errors) >= self.error_batch or time.monotonic() >= self._next_publish
+
+    def flush(self):
+        """
+        Returns (snapshot, errors) for publishing and resets the throttle.
+        Either part may be empty/None when there is nothing new.
+        """
+        now = time.monotonic()
+        self._next_publish = now + self.interval
+        snapshot = None
+        if self.stage is not None:
+            self.stage.sample(now)
+            snapshot = self.stage.snapshot()
+        errors = self.errors
+        self.errors = []
+        return snapshot, errors
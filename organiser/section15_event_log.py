@@ -0,0 +1,274 @@
+import csv, errno, re, time
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
+                             QTableView, QHeaderView, QAbstractItemView, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QSortFilterProxyModel, QModelIndex, pyqtSignal
+
+ALL_FILTER = "All"
+COLUMNS = ["Time", "Stage", "Type", "Path", "Message"]
+DEFAULT_CAPACITY = 100000
+
+_TYPE_PREFIX = re.compile(r"^([A-Z][A-Za-z]+): ")
+_ERRNO = re.compile(r"\[Errno (\d+)\]")
+
+
+def classify_error(stage, message):
+    """
+    Derives a short error type for filtering: the errno name of an OSError
+    message (EACCES, ENOENT...), else the 'Type: detail' prefix the hashing
+    worker uses, else the stage.
+    """
+    match = _ERRNO.search(message)
+    if match:
+        return errno.errorcode.get(int(match.group(1)), f"Errno {match.group(1)}")
+    match = _TYPE_PREFIX.match(message)
+    if match:
+        return match.group(1)
+    return stage
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer with O(1) append and O(1) indexed access.
+    Once full, each append overwrites the oldest entry; drop_oldest() frees
+    room up front when the caller needs to announce the eviction first.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._start = 0
+        self._len = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self._len:
+            raise IndexError(i)
+        return self._items[(self._start + i) % self.capacity]
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self[i]
+
+    def append(self, item):
+        if self._len < self.capacity:
+            self._items[(self._start + self._len) % self.capacity] = item
+            self._len += 1
+        else:
+            self._items[self._start] = item
+            self._start = (self._start + 1) % self.capacity
+            self.dropped += 1
+
+    def drop_oldest(self, count):
+        count = min(count, self._len)
+        for i in range(count):
+            self._items[(self._start + i) % self.capacity] = None
+        self._start = (self._start + count) % self.capacity
+        self._len -= count
+        self.dropped += count
+
+    def clear(self):
+        self._items = [None] * self.capacity
+        self._start = 0
+        self._len = 0
+        self.dropped = 0
+
+
+class EventLogModel(QAbstractTableModel):
+    """
+    Table model over a RingBuffer of (time, stage, type, path, message) rows.
+    Views only ask for the rows on screen, so rendering cost does not grow with the log.
+    """
+    filters_changed = pyqtSignal()
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.events = RingBuffer(capacity)
+        self.stages = set()
+        self.types = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.events)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole or role == Qt.ToolTipRole:
+            row = self.events[index.row()]
+            if index.column() == 0:
+                return time.strftime("%H:%M:%S", time.localtime(row[0]))
+            return row[index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def add_events(self, errors):
+        """
+        Appends a batch of (stage, filepath, message) tuples, evicting the oldest rows when full.
+        """
+        if not errors:
+            return
+        capacity = self.events.capacity
+        if len(errors) > capacity:
+            self.events.dropped += len(errors) - capacity
+            errors = errors[-capacity:]
+        now = time.time()
+        overflow = len(self.events) + len(errors) - capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            self.events.drop_oldest(overflow)
+            self.endRemoveRows()
+        first = len(self.events)
+        known = len(self.stages) + len(self.types)
+        self.beginInsertRows(QModelIndex(), first, first + len(errors) - 1)
+        for stage, filepath, message in errors:
+            error_type = classify_error(stage, message)
+            self.stages.add(stage)
+            self.types.add(error_type)
+            self.events.append((now, stage, error_type, filepath, message))
+        self.endInsertRows()
+        # Re-filtering is only safe once the insert has finished
+        if len(self.stages) + len(self.types) != known:
+            self.filters_changed.emit()
+
+    def clear(self):
+        self.beginResetModel()
+        self.events.clear()
+        self.stages.clear()
+        self.types.clear()
+        self.endResetModel()
+        self.filters_changed.emit()
+
+
+class EventFilterProxy(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.stage = ALL_FILTER
+        self.error_type = ALL_FILTER
+
+    def set_filters(self, stage, error_type):
+        self.stage = stage
+        self.error_type = error_type
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.stage == ALL_FILTER and self.error_type == ALL_FILTER:
+            return True
+        row = self.sourceModel().events[source_row]
+        if self.stage != ALL_FILTER and row[1] != self.stage:
+            return False
+        if self.error_type != ALL_FILTER and row[2] != self.error_type:
+            return False
+        return True
+
+
+class EventLogView(QWidget):
+    """
+    Activity report widget: a virtualised table of pipeline errors with stage
+    and type filters and CSV export.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.model = EventLogModel(capacity, self)
+        self.proxy = EventFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.init_ui()
+        self.model.filters_changed.connect(self.refresh_filter_choices)
+        self.model.rowsInserted.connect(self.update_count)
+        self.model.modelReset.connect(self.update_count)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        filter_layout = QHBoxLayout()
+        self.stage_combo = QComboBox()
+        self.stage_combo.addItem(ALL_FILTER)
+        self.type_combo = QComboBox()
+        self.type_combo.addItem(ALL_FILTER)
+        self.export_btn = QPushButton("Export CSV")
+        self.count_label = QLabel("")
+        filter_layout.addWidget(QLabel("Stage:"))
+        filter_layout.addWidget(self.stage_combo)
+        filter_layout.addWidget(QLabel("Type:"))
+        filter_layout.addWidget(self.type_combo)
+        filter_layout.addWidget(self.count_label, 1)
+        filter_layout.addWidget(self.export_btn)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setWordWrap(False)
+        self.table.setShowGrid(False)
+        # Fixed row heights let the view skip measuring rows it is not drawing
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(20)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+        self.stage_combo.currentTextChanged.connect(self.apply_filters)
+        self.type_combo.currentTextChanged.connect(self.apply_filters)
+        self.export_btn.clicked.connect(self.export_csv)
+
+    def append(self, stage, filepath, message):
+        self.model.add_events([(stage, filepath, message)])
+
+    def extend(self, errors):
+        self.model.add_events(errors)
+
+    def clear(self):
+        self.model.clear()
+
+    def refresh_filter_choices(self):
+        for combo, values in ((self.stage_combo, self.model.stages), (self.type_combo, self.model.types)):
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem(ALL_FILTER)
+            combo.addItems(sorted(values))
+            combo.setCurrentText(current if current in values else ALL_FILTER)
+            combo.blockSignals(False)
+        self.apply_filters()
+
+    def apply_filters(self):
+        self.proxy.set_filters(self.stage_combo.currentText(), self.type_combo.currentText())
+        self.update_count()
+
+    def update_count(self):
+        shown = self.proxy.rowCount()
+        total = len(self.model.events)
+        text = f"{shown} of {total} events" if shown != total else f"{total} events"
+        if self.model.events.dropped:
+            text += f" ({self.model.events.dropped} older dropped)"
+        self.count_label.setText(text)
+
+    def export_csv(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Activity Report", "activity_report.csv",
+                                              "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(COLUMNS)
+                events = self.model.events
+                for proxy_row in range(self.proxy.rowCount()):
+                    source_row = self.proxy.mapToSource(self.proxy.index(proxy_row, 0)).row()
+                    timestamp, stage, error_type, filepath, message = events[source_row]
+                    writer.writerow([time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)),
+                                     stage, error_type, filepath, message])
+        except Exception as ex:
+            QMessageBox.critical(self, "Export Failed", f"Could not write {path}: {ex}")
@@ -0,0 +1,102 @@
+import os, sqlite3, logging
+from organiser.section3_helpers import ensure_dir_exists, state_dir
+
+logger = logging.getLogger(__name__)
+
+
+class DestinationIndex:
+    """
+    Persistent digest index of the organised folder, stored in SQLite under
+    the state folder. Entries carry size and mtime so a later session can tell
+    which files changed on disk without re-hashing the rest.
+    """
+
+    def __init__(self, organised_folder, algo):
+        self.organised_folder = organised_folder
+        self.algo = algo.lower()
+        self.path = os.path.join(ensure_dir_exists(state_dir(organised_folder)), "destination_index.sqlite")
+        # The processing thread opens the index, so allow use from the thread that runs it
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS files ("
+                          "path TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER, mtime REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_digest ON files(digest)")
+        row = self.conn.execute("SELECT value FROM meta WHERE key='algo'").fetchone()
+        if row is not None and row[0] != self.algo:
+            # Digests from another algorithm can never match; start over
+            logger.info("Destination index algorithm changed from %s to %s; clearing", row[0], self.algo)
+            self.conn.execute("DELETE FROM files")
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('algo', ?)", (self.algo,))
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def lookup(self, digest):
+        """
+        Returns the path of an indexed file with this digest, or None. Rows
+        whose file has since been deleted, renamed or changed on disk are
+        dropped rather than returned, so a new file is never judged a
+        duplicate of one that is gone.
+        """
+        rows = self.conn.execute("SELECT path, size, mtime FROM files WHERE digest=?", (digest,)).fetchall()
+        stale = []
+        found = None
+        for path, size, mtime in rows:
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append(path)
+                continue
+            if st.st_size != size or abs(st.st_mtime - mtime) >= 0.001:
+                stale.append(path)
+                continue
+            found = path
+            break
+        if stale:
+            logger.info("Destination index: dropping %d stale entries for %s", len(stale), digest)
+            self.remove_many(stale)
+        return found
+
+    def add(self, path, digest, size, mtime):
+        self.conn.execute("INSERT OR REPLACE INTO files (path, digest, size, mtime) VALUES (?, ?, ?, ?)",
+                          (path, digest, size, mtime))
+
+    def add_many(self, rows):
+        # rows: iterable of (path, digest, size, mtime)
+        self.conn.executemany("INSERT OR REPLACE INTO files (path, digest, size, mtime) VALUES (?, ?, ?, ?)",
+                              rows)
+
+    def remove_many(self, paths):
+        self.conn.executemany("DELETE FROM files WHERE path=?", ((p,) for p in paths))
+
+    def entries(self):
+        """
+        Yields (path, size, mtime) for every indexed file.
+        """
+        yield from self.conn.execute("SELECT path, size, mtime FROM files")
+
+    def stale_paths(self, on_disk):
+        """
+        Compares the index with on_disk ({path: (size, mtime)}) and returns
+        (changed_or_new, missing) path lists.
+        """
+        missing = []
+        unchanged = set()
+        for path, size, mtime in self.entries():
+            current = on_disk.get(path)
+            if current is None:
+                missing.append(path)
+            elif current[0] == size and abs(current[1] - mtime) < 0.001:
+                unchanged.add(path)
+        changed = [p for p in on_disk if p not in unchanged]
+        return changed, missing
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
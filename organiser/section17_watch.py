@@ -0,0 +1,350 @@
+import os, sys, time, errno, select, struct, ctypes, ctypes.util, logging, multiprocessing
+from functools import partial
+from organiser.section2_configuration import CONFIG
+from organiser.section3_helpers import ensure_dir_exists, categorised_dir, duplicates_dir, to_be_deleted_dir, state_dir, quarantine_dir
+from organiser.section4_hashing import worker_hash_file
+from organiser.section7_processing_thread import ProcessingThread
+from organiser.section16_destination_index import DestinationIndex
+from organiser.section25_throttle import install_throttle, init_throttled_worker, throttled_worker_args
+
+logger = logging.getLogger(__name__)
+
+# inotify event bits (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+# Seconds a file must stay unchanged before it is organised
+DEFAULT_SETTLE_SECONDS = 5.0
+# How often the polling fallback rescans the target folders
+DEFAULT_POLL_SECONDS = 30.0
+
+
+def walk_files(folder):
+    for root, _, files in os.walk(folder):
+        for name in files:
+            yield os.path.join(root, name)
+
+
+class InotifyWatcher:
+    """
+    Recursive watch over the target folders using Linux inotify through ctypes.
+    poll() returns the file paths that were written, created or moved in.
+    """
+
+    def __init__(self, folders):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = folders
+        self.watches = {}  # wd -> directory
+        self.overflowed = False
+        try:
+            for folder in folders:
+                self.watch_tree(folder)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def watch_tree(self, folder):
+        for root, _, _ in os.walk(folder):
+            wd = self._add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    # Out of inotify watches; the caller falls back to polling
+                    raise OSError(err, "inotify watch limit reached (fs.inotify.max_user_watches)")
+                logger.warning("Cannot watch %s: %s", root, os.strerror(err))
+                continue
+            self.watches[wd] = root
+
+    def poll(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; rescan everything
+                self.overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land before the new watch exists, so list them too
+                    try:
+                        self.watch_tree(path)
+                    except OSError as ex:
+                        logger.warning("Not watching new folder %s: %s", path, ex)
+                    paths.extend(walk_files(path))
+            else:
+                paths.append(path)
+        if self.overflowed:
+            self.overflowed = False
+            for folder in self.folders:
+                paths.extend(walk_files(folder))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Fallback for platforms or mounts without inotify: rescans the target
+    folders every interval and reports files whose size or mtime changed.
+    """
+
+    def __init__(self, folders, interval=DEFAULT_POLL_SECONDS):
+        self.folders = folders
+        self.interval = interval
+        self.seen = {}
+        self.next_scan = 0.0
+
+    def poll(self, timeout):
+        now = time.monotonic()
+        if now < self.next_scan:
+            time.sleep(min(timeout, self.next_scan - now))
+            return []
+        self.next_scan = now + self.interval
+        changed = []
+        current = {}
+        for folder in self.folders:
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    sig = (st.st_size, st.st_mtime_ns)
+                    current[path] = sig
+                    if self.seen.get(path) != sig:
+                        changed.append(path)
+        self.seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(folders):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folders)
+        except (OSError, AttributeError) as ex:
+            logger.warning("inotify unavailable (%s); falling back to polling", ex)
+    return PollingWatcher(folders, CONFIG.get("watch_poll_seconds", DEFAULT_POLL_SECONDS))
+
+
+class FileDebouncer:
+    """
+    Holds changed files until they have stopped changing: a file is ready
+    once no event arrived for settle seconds and two stats that far apart agree.
+    """
+
+    def __init__(self, settle=DEFAULT_SETTLE_SECONDS):
+        self.settle = settle
+        self.pending = {}  # path -> [last event time, (size, mtime_ns) or None]
+
+    def __len__(self):
+        return len(self.pending)
+
+    def touch(self, path, now=None):
+        self.pending[path] = [now if now is not None else time.monotonic(), None]
+
+    def ready(self, now=None):
+        now = now if now is not None else time.monotonic()
+        done = []
+        for path, entry in list(self.pending.items()):
+            if now - entry[0] < self.settle:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Deleted or moved away before it settled
+                del self.pending[path]
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if entry[1] == sig:
+                del self.pending[path]
+                done.append(path)
+            else:
+                entry[0] = now
+                entry[1] = sig
+        return done
+
+
+class WatchThread(ProcessingThread):
+    """
+    Long-running variant of ProcessingThread: watches the target folders and
+    sends each new file through the same duplicate/categorisation decision
+    once it has finished being written, checking it against a persistent
+    destination index instead of re-hashing the organised folder.
+    """
+
+    def __init__(self, algo, categories, skip_size, organised_folder, target_folders, settle=None):
+        super().__init__([], algo, categories, skip_size, organised_folder, target_folders)
+        self.settle = settle if settle is not None else CONFIG.get("watch_settle_seconds", DEFAULT_SETTLE_SECONDS)
+        self.index = None
+        self.batch_hashes = {}
+
+    def run(self):
+        install_throttle(self.throttle)
+        try:
+            self._watch()
+        except Exception as ex:
+            logger.error("WatchThread error: %s", ex)
+            self.publish_progress()
+            self.done_signal.emit("aborted", self.duplicate_files_count, self.nonduplicate_files_count)
+        finally:
+            install_throttle(None)
+            self.close_quarantine()
+            if self.index is not None:
+                self.index.close()
+
+    def _watch(self):
+        cat_path = ensure_dir_exists(categorised_dir(self.organised_folder))
+        dup_path = ensure_dir_exists(duplicates_dir(self.organised_folder))
+        tbd_path = ensure_dir_exists(to_be_deleted_dir(self.organised_folder))
+        hashes_in_dup = set()
+
+        pool = multiprocessing.Pool(
+            processes=(
+                multiprocessing.cpu_count() if CONFIG['multiprocessing_cores'] <= 0
+                else CONFIG['multiprocessing_cores']
+            ),
+            initializer=init_throttled_worker,
+            initargs=throttled_worker_args(self.throttle)
+        )
+        watcher = None
+        try:
+            self.index = DestinationIndex(self.organised_folder, self.algo)
+            self.open_quarantine()
+            self.sync_index(pool)
+
+            watcher = create_watcher(self.target_folders)
+            debouncer = FileDebouncer(self.settle)
+            # Anything already sitting in the targets has not been organised yet
+            for folder in self.target_folders:
+                for path in walk_files(folder):
+                    debouncer.touch(path)
+
+            self.telemetry.start_stage("Watching")
+            while not self.stop_event.is_set():
+                for path in watcher.poll(1.0):
+                    debouncer.touch(path)
+                ready = debouncer.ready()
+                if ready:
+                    self.organise_batch(pool, ready, cat_path, dup_path, tbd_path, hashes_in_dup)
+                self.publish_progress()
+        finally:
+            if watcher is not None:
+                watcher.close()
+            pool.terminate()
+            pool.join()
+
+        self.publish_progress()
+        self.done_signal.emit("stopped", self.duplicate_files_count, self.nonduplicate_files_count)
+
+    def sync_index(self, pool):
+        """
+        Brings the persistent index up to date with the organised folder:
+        a stat-only walk, re-hashing only files that are new or changed.
+        """
+        skip_dirs = {state_dir(self.organised_folder), quarantine_dir(self.organised_folder)}
+        on_disk = {}
+        for root, dirs, files in os.walk(self.organised_folder):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) not in skip_dirs]
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                on_disk[path] = (st.st_size, st.st_mtime)
+        changed, missing = self.index.stale_paths(on_disk)
+        logger.info("Destination index: %d files on disk, %d to hash, %d removed",
+                    len(on_disk), len(changed), len(missing))
+        self.index.remove_many(missing)
+        self.telemetry.start_stage("Indexing destination", len(changed))
+        worker = partial(worker_hash_file, algo=self.algo, skip_size=self.skip_size)
+        rows = []
+        for fpath, fhash, err, size, _ in pool.imap_unordered(worker, changed, chunksize=16):
+            if self.stop_event.is_set():
+                break
+            self.advance(1, size)
+            if err is None:
+                rows.append((fpath, fhash, on_disk[fpath][0], on_disk[fpath][1]))
+            else:
+                self.report_error("Hashing", fpath, f"{err[0]}: {err[1]}")
+        self.index.add_many(rows)
+        self.index.commit()
+
+    def organise_batch(self, pool, paths, cat_path, dup_path, tbd_path, hashes_in_dup):
+        worker = partial(worker_hash_file, algo=self.algo, skip_size=self.skip_size,
+                         sniff_dates=CONFIG.get("capture_dates", True))
+        self.batch_hashes = {}
+        # Only this batch's files are organised next, so only their years are kept
+        self.capture_years = {}
+        for result in pool.imap_unordered(worker, paths):
+            fpath, fhash, err, size, mtime_ns = result[:5]
+            if len(result) > 5 and result[5] is not None:
+                self.capture_years[fhash] = result[5]
+            self.advance(1, size)
+            if err is not None:
+                self.report_error("Hashing", fpath, f"{err[0]}: {err[1]}")
+            else:
+                self.batch_hashes[fpath] = fhash
+                self.file_sizes[fpath] = size
+                self.file_digests[fpath] = (fhash, size, mtime_ns)
+        for filepath, file_hash in self.batch_hashes.items():
+            if self.stop_event.is_set():
+                break
+            self.organise_file(filepath, file_hash, self.index, cat_path, dup_path, tbd_path,
+                               hashes_in_dup, self.batch_hashes)
+            self.file_sizes.pop(filepath, None)
+            self.file_digests.pop(filepath, None)
+        self.index.commit()
+
+    def move_file(self, src, dest):
+        final_dest = super().move_file(src, dest)
+        hashed = self.file_digests.get(src)
+        if hashed is not None:
+            digest, size, mtime_ns = hashed
+            try:
+                st = os.stat(final_dest)
+                # A file that changed since it was hashed is left for the next walk to index
+                if (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+                    self.index.add(final_dest, digest, st.st_size, st.st_mtime)
+            except OSError as ex:
+                logger.error("Could not index %s: %s", final_dest, ex)
+        return final_dest
@@ -0,0 +1,214 @@
+import os, heapq, mmap, shutil, struct, tempfile, logging
+
+logger = logging.getLogger(__name__)
+
+# Records held in memory before a sorted run is written out
+DEFAULT_RUN_RECORDS = 500000
+# Bytes read at a time from each run while merging
+MERGE_BUFFER = 1024 * 1024
+_PATH_LEN = struct.Struct(">I")
+
+
+class PathTable:
+    """
+    Append-only file of length-prefixed UTF-8 paths. A path's id is its byte
+    offset in the file, so nothing per path has to stay in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = open(path, "ab")
+        self._reader = None
+
+    def append(self, filepath):
+        data = os.fsencode(filepath)
+        path_id = self._writer.tell()
+        self._writer.write(_PATH_LEN.pack(len(data)))
+        self._writer.write(data)
+        return path_id
+
+    def get(self, path_id):
+        if self._reader is None:
+            self._writer.flush()
+            self._reader = open(self.path, "rb")
+        self._reader.seek(path_id)
+        (length,) = _PATH_LEN.unpack(self._reader.read(_PATH_LEN.size))
+        return os.fsdecode(self._reader.read(length))
+
+    def flush(self):
+        self._writer.flush()
+
+    def close(self):
+        self._writer.close()
+        if self._reader is not None:
+            self._reader.close()
+
+
+def record_struct(digest_size):
+    # Big-endian fields so sorting the raw record bytes sorts by (digest, size, path id);
+    # the capture year and hash-time mtime_ns (0 for none) ride along so they need not be kept in memory
+    return struct.Struct(f">{digest_size}sQQHq")
+
+
+def _read_records(path, record_size):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(MERGE_BUFFER - MERGE_BUFFER % record_size)
+            if not block:
+                return
+            for offset in range(0, len(block), record_size):
+                yield block[offset:offset + record_size]
+
+
+class ExternalDigestSorter:
+    """
+    Collects (digest, size, path, year, mtime_ns) records with bounded memory: records are
+    buffered up to run_records, sorted and spilled to disk as runs, then
+    streamed back in digest order through a k-way merge.
+    """
+
+    def __init__(self, workdir, digest_size, name="records", run_records=DEFAULT_RUN_RECORDS):
+        self.workdir = workdir
+        self.name = name
+        self.digest_size = digest_size
+        self.record = record_struct(digest_size)
+        self.run_records = run_records
+        self.paths = PathTable(os.path.join(workdir, f"{name}.paths"))
+        self.runs = []
+        self.count = 0
+        self._buffer = []
+
+    def add(self, hexdigest, size, filepath, year=None, mtime_ns=None):
+        path_id = self.paths.append(filepath)
+        self._buffer.append(self.record.pack(bytes.fromhex(hexdigest), size, path_id, year or 0, mtime_ns or 0))
+        self.count += 1
+        if len(self._buffer) >= self.run_records:
+            self._spill()
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        run_path = os.path.join(self.workdir, f"{self.name}.run{len(self.runs)}")
+        with open(run_path, "wb") as f:
+            f.write(b"".join(self._buffer))
+        self.runs.append(run_path)
+        self._buffer = []
+
+    def finish(self):
+        self._spill()
+        self.paths.flush()
+
+    def iter_sorted(self):
+        """
+        Yields (filepath, hexdigest, size, year or None, mtime_ns or None) in digest order.
+        """
+        streams = [_read_records(run, self.record.size) for run in self.runs]
+        for raw in heapq.merge(*streams):
+            digest, size, path_id, year, mtime_ns = self.record.unpack(raw)
+            yield self.paths.get(path_id), digest.hex(), size, year or None, mtime_ns or None
+
+    def iter_groups(self, min_size=2, max_files=None):
+        """
+        Yields lists of (filepath, hexdigest, size, year, mtime_ns) sharing a digest, for
+        groups of at least min_size files. Only one group is held at a time;
+        with max_files, a bigger group comes out as consecutive lists of at
+        most that many files, so not even one group has to fit in memory.
+        """
+        group = []
+        split = False
+        for item in self.iter_sorted():
+            if group and group[0][1] != item[1]:
+                if split or len(group) >= min_size:
+                    yield group
+                group = []
+                split = False
+            elif max_files is not None and len(group) >= max_files:
+                yield group
+                group = []
+                split = True
+            group.append(item)
+        if group and (split or len(group) >= min_size):
+            yield group
+
+    def write_sorted(self, out_path):
+        """
+        Merges all runs into one sorted file, for SortedDigestIndex.
+        """
+        streams = [_read_records(run, self.record.size) for run in self.runs]
+        with open(out_path, "wb") as f:
+            pending = []
+            for raw in heapq.merge(*streams):
+                pending.append(raw)
+                if len(pending) >= 65536:
+                    f.write(b"".join(pending))
+                    pending = []
+            f.write(b"".join(pending))
+        for run in self.runs:
+            os.remove(run)
+        self.runs = [out_path]
+        return out_path
+
+    def close(self):
+        self.paths.close()
+
+
+class SortedDigestIndex:
+    """
+    Memory-mapped, digest-sorted record file with binary-search lookups.
+    The OS pages in only the parts touched, so lookups stay cheap however
+    many files the destination holds.
+    """
+
+    def __init__(self, sorter):
+        self.sorter = sorter
+        self.record = sorter.record
+        self.digest_size = sorter.digest_size
+        sorted_path = sorter.write_sorted(os.path.join(sorter.workdir, f"{sorter.name}.sorted"))
+        self._file = open(sorted_path, "rb")
+        self.count = os.path.getsize(sorted_path) // self.record.size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, hexdigest):
+        """
+        Returns the path of a file with this digest, or None.
+        """
+        if not self.count:
+            return None
+        target = bytes.fromhex(hexdigest)
+        size = self.record.size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = mid * size
+            if self._map[offset:offset + self.digest_size] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            raw = self._map[lo * size:(lo + 1) * size]
+            digest, _, path_id, _, _ = self.record.unpack(raw)
+            if digest == target:
+                return self.sorter.paths.get(path_id)
+        return None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class SpillDirectory:
+    """
+    Scratch folder for sorter runs, removed again when the run ends.
+    """
+
+    def __init__(self, parent):
+        os.makedirs(parent, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix="spill-", dir=parent)
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,114 @@
+import os
+from array import array
+
+
+class Manifest:
+    """
+    Compact per-file table for a hashing run. Paths are split into a shared
+    directory table and a basename table, digests are stored raw in one
+    packed bytearray and sizes and mtimes in typed arrays, so millions of
+    entries cost a few dozen bytes each instead of several Python objects apiece.
+    """
+    __slots__ = ("digest_size", "dirs", "names", "dir_ids", "name_ids", "digests", "sizes", "mtimes",
+                 "incomplete_dirs", "_dir_index", "_name_index")
+
+    def __init__(self, digest_size):
+        self.digest_size = digest_size
+        self.dirs = []
+        self.names = []
+        self.dir_ids = array("I")
+        self.name_ids = array("I")
+        self.digests = bytearray()
+        self.sizes = array("Q")
+        # mtime_ns each digest was taken at, 0 when unknown
+        self.mtimes = array("q")
+        # Directories holding a file that could not be hashed
+        self.incomplete_dirs = set()
+        self._dir_index = {}
+        self._name_index = {}
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def _intern(self, table, index, value):
+        value_id = index.get(value)
+        if value_id is None:
+            value_id = index[value] = len(table)
+            table.append(value)
+        return value_id
+
+    def add(self, filepath, hexdigest, size, mtime_ns=None):
+        directory, name = os.path.split(filepath)
+        self.dir_ids.append(self._intern(self.dirs, self._dir_index, directory))
+        self.name_ids.append(self._intern(self.names, self._name_index, name))
+        self.digests += bytes.fromhex(hexdigest)
+        self.sizes.append(size)
+        self.mtimes.append(mtime_ns or 0)
+        return len(self.sizes) - 1
+
+    def mark_incomplete(self, filepath):
+        self.incomplete_dirs.add(os.path.dirname(filepath))
+
+    def path(self, i):
+        return os.path.join(self.dirs[self.dir_ids[i]], self.names[self.name_ids[i]])
+
+    def raw_digest(self, i):
+        start = i * self.digest_size
+        return bytes(self.digests[start:start + self.digest_size])
+
+    def digest(self, i):
+        start = i * self.digest_size
+        return self.digests[start:start + self.digest_size].hex()
+
+    def entries(self, skip_dirs=None):
+        """
+        Yields (filepath, hexdigest, size, mtime_ns or None) in insertion
+        order, leaving out files whose directory id is in skip_dirs.
+        """
+        for i in range(len(self.sizes)):
+            if skip_dirs and self.dir_ids[i] in skip_dirs:
+                continue
+            yield self.path(i), self.digest(i), self.sizes[i], self.mtimes[i] or None
+
+    def items(self):
+        # Same shape as the {filepath: hash} dicts this replaces
+        for i in range(len(self.sizes)):
+            yield self.path(i), self.digest(i)
+
+    def compact(self):
+        """
+        Drops the interning dicts once no more entries will be added.
+        """
+        self._dir_index = {}
+        self._name_index = {}
+
+
+class ManifestDigestLookup:
+    """
+    Digest -> path lookups over a Manifest through an array of entry numbers
+    sorted by digest, searched with bisection. The first entry added wins
+    when several share a digest.
+    """
+    __slots__ = ("manifest", "order")
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        # Sort is stable, so equal digests keep insertion order
+        self.order = array("I", sorted(range(len(manifest)), key=manifest.raw_digest))
+
+    def __len__(self):
+        return len(self.order)
+
+    def lookup(self, hexdigest):
+        target = bytes.fromhex(hexdigest)
+        raw_digest = self.manifest.raw_digest
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if raw_digest(self.order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.order) and raw_digest(self.order[lo]) == target:
+            return self.manifest.path(self.order[lo])
+        return None
@@ -1,11 +1,134 @@
-import logging
+import logging, logging.handlers, json, queue, atexit, multiprocessing
 
-def configure_logging():
-    logging.basicConfig(
-        filename='organise.log',
-        level=logging.DEBUG,
-        format='%(asctime)s [%(levelname)s] %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+DEFAULT_LOG_SETTINGS = {
+    "log_file": "organise.log",
+    "log_level": "INFO",
+    # Per-logger overrides, e.g. {"organiser.section3_helpers": "DEBUG"}
+    "log_module_levels": {},
+    # "text" or "json" (one compact JSON object per line)
+    "log_format": "text",
+    # "size" rotates at log_max_mb, "time" rotates on log_rotate_when
+    "log_rotation": "size",
+    "log_max_mb": 10,
+    "log_backup_count": 5,
+    "log_rotate_when": "midnight",
+}
 
-configure_logging()
\ No newline at end of file
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_listener = None
+_worker_listener = None
+_worker_queue = None
+_settings = dict(DEFAULT_LOG_SETTINGS)
+_shutdown_registered = False
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Compact structured format: one JSON object per record, short keys.
+    """
+
+    def format(self, record):
+        entry = {
+            "t": round(record.created, 3),
+            "lvl": record.levelname,
+            "log": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.processName != "MainProcess":
+            entry["proc"] = record.processName
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+
+
+def _build_file_handler(settings):
+    if settings["log_rotation"] == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            settings["log_file"], when=settings["log_rotate_when"],
+            backupCount=settings["log_backup_count"], encoding="utf-8", delay=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            settings["log_file"], maxBytes=int(settings["log_max_mb"] * 1024 * 1024),
+            backupCount=settings["log_backup_count"], encoding="utf-8", delay=True)
+    if settings["log_format"] == "json":
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+    return handler
+
+
+def _apply_levels(settings):
+    logging.getLogger().setLevel(settings["log_level"].upper())
+    for name, level in settings["log_module_levels"].items():
+        logging.getLogger(name).setLevel(level.upper())
+
+
+def configure_logging(settings=None):
+    """
+    Routes all logging through a queue to a background thread that owns the
+    rotating log file, so a log call only costs an enqueue on the caller's thread.
+    Settings default to the log_* keys in config.json.
+    """
+    global _listener, _settings, _shutdown_registered
+    if settings is None:
+        from organiser.section2_configuration import CONFIG
+        settings = CONFIG
+    _settings = dict(DEFAULT_LOG_SETTINGS)
+    _settings.update({k: v for k, v in settings.items() if k in DEFAULT_LOG_SETTINGS})
+
+    shutdown_logging()
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _apply_levels(_settings)
+
+    _listener = logging.handlers.QueueListener(log_queue, _build_file_handler(_settings),
+                                               respect_handler_level=True)
+    _listener.start()
+    if not _shutdown_registered:
+        atexit.register(shutdown_logging)
+        _shutdown_registered = True
+
+
+def worker_logging_args():
+    """
+    initargs for a multiprocessing.Pool initializer of init_worker_logging.
+    Worker records travel back over a multiprocessing queue and are written by
+    the parent's file handler, so processes never write to the log concurrently.
+    """
+    global _worker_queue, _worker_listener
+    if _worker_queue is None:
+        _worker_queue = multiprocessing.Queue()
+        handlers = _listener.handlers if _listener is not None else ()
+        _worker_listener = logging.handlers.QueueListener(_worker_queue, *handlers,
+                                                          respect_handler_level=True)
+        _worker_listener.start()
+    return (_worker_queue, _settings["log_level"], _settings["log_module_levels"])
+
+
+def init_worker_logging(log_queue, level, module_levels):
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _apply_levels({"log_level": level, "log_module_levels": module_levels})
+
+
+def shutdown_logging():
+    """
+    Flushes anything still queued and stops the background writers.
+    """
+    global _listener, _worker_listener, _worker_queue
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_listener = None
+        _worker_queue = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,119 @@
+import os
+from array import array
+from organiser.section4_hashing import new_hasher
+
+# Identical folders with fewer files than this are left to the per-file pass
+DEFAULT_MIN_FILES = 2
+
+
+def _depth(path):
+    return path.count(os.sep)
+
+
+def _under_root(path, roots):
+    for root in roots:
+        if path.startswith(root + os.sep):
+            return True
+    return False
+
+
+def directory_digests(manifest, roots, algo):
+    """
+    Merkle digests for every directory below roots, computed bottom-up from
+    the file names and digests in manifest and the names and digests of
+    subdirectories. Returns {directory: (hexdigest, file_count)}. A directory
+    with a file that could not be hashed gets no digest, nor does any folder
+    above it. The roots themselves are never included. Directories come back
+    normalised (os.path.normpath), whatever separators the manifest holds.
+    """
+    roots = [os.path.normpath(r) for r in roots]
+    # Qt dialogs hand over forward slashes on Windows; compare like with like
+    incomplete_dirs = {os.path.normpath(d) for d in manifest.incomplete_dirs}
+
+    # Digest each directory's own files, one directory at a time
+    order = array("I", sorted(range(len(manifest)), key=manifest.dir_ids.__getitem__))
+    file_parts = {}
+    start = 0
+    while start < len(order):
+        dir_id = manifest.dir_ids[order[start]]
+        end = start
+        while end < len(order) and manifest.dir_ids[order[end]] == dir_id:
+            end += 1
+        entries = sorted((manifest.names[manifest.name_ids[i]], i) for i in order[start:end])
+        h = new_hasher(algo)
+        for name, i in entries:
+            h.update(b"f\0" + os.fsencode(name) + b"\0" + manifest.raw_digest(i))
+        file_parts[os.path.normpath(manifest.dirs[dir_id])] = (h.digest(), end - start)
+        start = end
+
+    # Every directory between the files and the roots, including ones holding only folders
+    subdirs = {}
+    for directory in list(file_parts) + list(incomplete_dirs):
+        while _under_root(directory, roots):
+            parent = os.path.dirname(directory)
+            children = subdirs.setdefault(parent, set())
+            if directory in children:
+                break
+            children.add(directory)
+            directory = parent
+
+    digests = {}
+    raw = {}
+    for directory in sorted(set(file_parts) | set(subdirs) | incomplete_dirs, key=_depth, reverse=True):
+        if not _under_root(directory, roots):
+            continue
+        children = sorted(subdirs.get(directory, ()))
+        if directory in incomplete_dirs or any(child not in raw for child in children):
+            continue
+        own, count = file_parts.get(directory, (b"", 0))
+        h = new_hasher(algo)
+        h.update(b"F\0" + own)
+        for child in children:
+            h.update(b"d\0" + os.fsencode(os.path.basename(child)) + b"\0" + raw[child])
+            count += digests[child][1]
+        raw[directory] = h.digest()
+        digests[directory] = (raw[directory].hex(), count)
+    return digests
+
+
+def find_duplicate_directories(source_digests, dest_digests=None, min_files=DEFAULT_MIN_FILES):
+    """
+    Picks the source directories that can be set aside as a whole: those whose
+    digest matches a destination directory, and all but one copy of each set of
+    identical source directories. Only the topmost duplicate is returned, and
+    the copy that is kept is never inside a folder that is set aside.
+    Returns a list of (directory, file_count, copy it duplicates).
+    """
+    dest_dirs = {}
+    for directory, (digest, _) in (dest_digests or {}).items():
+        dest_dirs.setdefault(digest, directory)
+    groups = {}
+    for directory, (digest, count) in source_digests.items():
+        if count >= min_files:
+            groups.setdefault(digest, []).append(directory)
+
+    moved = set()
+
+    def covered(directory):
+        parent = os.path.dirname(directory)
+        while parent != directory:
+            if parent in moved:
+                return True
+            directory, parent = parent, os.path.dirname(parent)
+        return False
+
+    duplicates = []
+    # Shallow groups first, so a kept copy is settled before anything above it could move
+    for digest, members in sorted(groups.items(), key=lambda g: min(_depth(d) for d in g[1])):
+        if len(members) < 2 and digest not in dest_dirs:
+            continue
+        members = sorted((d for d in members if not covered(d)), key=lambda d: (_depth(d), d))
+        if not members:
+            continue
+        original = dest_dirs.get(digest)
+        if original is None:
+            original, members = members[0], members[1:]
+        for directory in members:
+            moved.add(directory)
+            duplicates.append((directory, source_digests[directory][1], original))
+    return duplicates
@@ -0,0 +1,159 @@
+import os, time, multiprocessing
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox,
+                             QPushButton, QTextEdit, QMessageBox, QFileDialog, QProgressBar)
+from PyQt5.QtCore import QThread, pyqtSignal
+from organiser.section2_configuration import CONFIG
+from organiser.section14_telemetry import DEFAULT_INTERVAL
+from organiser.section37_link_plan import (plan_link_dedup, apply_link_plan, MODE_AUTO, MODE_REFLINK,
+                                           MODE_HARDLINK)
+
+
+class LinkDedupThread(QThread):
+    """
+    Runs the dry-run scan, or applies a plan, off the GUI thread.
+    """
+    progress_signal = pyqtSignal(int, int)  # (done, total)
+    plan_signal = pyqtSignal(object)  # LinkPlan
+    applied_signal = pyqtSignal(int, object, list)  # (linked, bytes reclaimed, [(path, message)])
+
+    def __init__(self, folders, mode, plan=None):
+        super().__init__()
+        self.folders = folders
+        self.mode = mode
+        self.plan = plan
+        self.stop_event = multiprocessing.Event()
+        self.next_progress = 0.0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def report_progress(self, done, total):
+        # Called for every file; pass on a few updates a second, and the last one
+        now = time.monotonic()
+        if done == total or now >= self.next_progress:
+            self.next_progress = now + DEFAULT_INTERVAL
+            self.progress_signal.emit(done, total)
+
+    def run(self):
+        if self.plan is None:
+            self.plan_signal.emit(plan_link_dedup(self.folders, CONFIG["hash_algorithm"], CONFIG["skip_larger_than"],
+                                                  self.stop_event, self.report_progress))
+            return
+        self.applied_signal.emit(*apply_link_plan(self.plan, self.mode, self.stop_event, self.report_progress))
+
+
+class LinkDedupDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Deduplicate In Place")
+        self.setGeometry(300, 300, 700, 500)
+        self.plan = None
+        self.thread = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        folder_layout = QHBoxLayout()
+        self.folder_input = QLineEdit()
+        folder_browse = QPushButton("Browse")
+        folder_browse.clicked.connect(self.browse_folder)
+        folder_layout.addWidget(QLabel("Folder:"))
+        folder_layout.addWidget(self.folder_input)
+        folder_layout.addWidget(folder_browse)
+        layout.addLayout(folder_layout)
+
+        mode_layout = QHBoxLayout()
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("Reflink, else hardlink", MODE_AUTO)
+        self.mode_combo.addItem("Reflink only (copy-on-write)", MODE_REFLINK)
+        self.mode_combo.addItem("Hardlink only", MODE_HARDLINK)
+        mode_layout.addWidget(QLabel("Link Type:"))
+        mode_layout.addWidget(self.mode_combo)
+        layout.addLayout(mode_layout)
+
+        self.report_text = QTextEdit()
+        self.report_text.setReadOnly(True)
+        layout.addWidget(self.report_text)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        btn_layout = QHBoxLayout()
+        self.scan_btn = QPushButton("Scan (Dry Run)")
+        self.apply_btn = QPushButton("Replace Duplicates With Links")
+        self.apply_btn.setEnabled(False)
+        close_btn = QPushButton("Close")
+        btn_layout.addWidget(self.scan_btn)
+        btn_layout.addWidget(self.apply_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+        self.scan_btn.clicked.connect(self.start_scan)
+        self.apply_btn.clicked.connect(self.apply_plan)
+        close_btn.clicked.connect(self.reject)
+
+    def browse_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder to Deduplicate")
+        if folder:
+            self.folder_input.setText(folder)
+
+    def start_thread(self, plan=None):
+        folder = os.path.normpath(self.folder_input.text().strip())
+        self.thread = LinkDedupThread([folder], self.mode_combo.currentData(), plan)
+        self.thread.progress_signal.connect(self.on_progress)
+        self.thread.plan_signal.connect(self.on_plan)
+        self.thread.applied_signal.connect(self.on_applied)
+        self.scan_btn.setEnabled(False)
+        self.apply_btn.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.thread.start()
+
+    def start_scan(self):
+        folder = self.folder_input.text().strip()
+        if not folder or not os.path.isdir(folder):
+            QMessageBox.warning(self, "Invalid Folder", "Please select an existing folder.")
+            return
+        self.plan = None
+        self.report_text.setPlainText("Scanning...")
+        self.start_thread()
+
+    def apply_plan(self):
+        if not self.plan or not self.plan.groups:
+            return
+        reply = QMessageBox.question(
+            self, "Confirm Deduplicate",
+            f"Replace {self.plan.duplicate_count()} duplicate files with links to their kept copy?\n"
+            f"About {self.plan.reclaimable / (1024 * 1024):.2f} MB will be reclaimed.\n\n"
+            "Linked files share their content: with hardlinks, editing one changes all of them.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.start_thread(self.plan)
+
+    def on_progress(self, done, total):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+
+    def on_plan(self, plan):
+        self.plan = plan
+        self.progress_bar.setVisible(False)
+        self.scan_btn.setEnabled(True)
+        self.apply_btn.setEnabled(bool(plan.groups))
+        self.report_text.setPlainText(plan.report())
+
+    def on_applied(self, linked, reclaimed, errors):
+        self.progress_bar.setVisible(False)
+        self.scan_btn.setEnabled(True)
+        self.plan = None
+        lines = [f"Linked {linked} files, reclaimed {reclaimed / (1024 * 1024):.2f} MB."]
+        lines.extend(f"[Error] {path}: {message}" for path, message in errors)
+        self.report_text.setPlainText("\n".join(lines))
+
+    def reject(self):
+        if self.thread is not None and self.thread.isRunning():
+            self.thread.stop()
+            self.thread.wait()
+        super().reject()
@@ -0,0 +1,142 @@
+import time
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox,
+                             QTableView, QHeaderView, QAbstractItemView, QMessageBox)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from organiser.section38_quarantine_store import QuarantineStore
+
+# Entries the dialog reads from the index per scroll step
+PAGE_SIZE = 500
+COLUMNS = ["Original Path", "Size", "Quarantined"]
+
+
+class QuarantineModel(QAbstractTableModel):
+    """
+    Table model over a QuarantineStore. Rows are read PAGE_SIZE at a time as
+    the view scrolls down, so opening the dialog costs the same however many
+    files the store holds.
+    """
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = []
+        self.exhausted = False
+
+    def reload(self):
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        page = self.store.entries(PAGE_SIZE, self.rows[-1] if self.rows else None)
+        self.exhausted = len(page) < PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        _, original_path, size, quarantined_at = self.rows[index.row()]
+        if index.column() == 0:
+            return original_path
+        if index.column() == 1:
+            return f"{size / (1024 * 1024):.2f} MB"
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(quarantined_at))
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+
+class QuarantineDialog(QDialog):
+    def __init__(self, organised_folder, algo, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Quarantine")
+        self.setGeometry(300, 300, 800, 450)
+        self.store = QuarantineStore(organised_folder, algo)
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.count_label = QLabel("")
+        layout.addWidget(self.count_label)
+
+        self.model = QuarantineModel(self.store, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        self.restore_btn = QPushButton("Restore Selected")
+        self.purge_days = QSpinBox()
+        self.purge_days.setRange(0, 3650)
+        self.purge_days.setValue(30)
+        self.purge_days.setSuffix(" days")
+        self.purge_btn = QPushButton("Purge Older Than")
+        close_btn = QPushButton("Close")
+        btn_layout.addWidget(self.restore_btn)
+        btn_layout.addStretch(1)
+        btn_layout.addWidget(self.purge_btn)
+        btn_layout.addWidget(self.purge_days)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+        self.restore_btn.clicked.connect(self.restore_selected)
+        self.purge_btn.clicked.connect(self.purge)
+        close_btn.clicked.connect(self.reject)
+
+    def refresh(self):
+        self.model.reload()
+        self.count_label.setText(f"{self.store.count()} quarantined files")
+
+    def restore_selected(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        if not rows:
+            return
+        failed = []
+        for row in rows:
+            entry_id, original_path, _, _ = self.model.rows[row]
+            try:
+                self.store.restore(entry_id)
+            except Exception as ex:
+                failed.append(f"{original_path}: {ex}")
+        self.refresh()
+        if failed:
+            QMessageBox.warning(self, "Restore Failed", "\n".join(failed))
+
+    def purge(self):
+        days = self.purge_days.value()
+        reply = QMessageBox.question(self, "Confirm Purge",
+                                     f"Permanently delete quarantined files older than {days} days?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.No:
+            return
+        purged, freed = self.store.purge(days)
+        self.refresh()
+        QMessageBox.information(self, "Purged", f"Purged {purged} entries, freed {freed / (1024 * 1024):.2f} MB.")
+
+    def done(self, result):
+        self.store.close()
+        super().done(result)
@@ -0,0 +1,190 @@
+import os, time, struct, queue, logging, threading, multiprocessing
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Concurrent readers per spinning disk; more than this and the heads start seeking between files
+DEFAULT_HDD_WORKERS = 2
+# ioctl number of FS_IOC_FIEMAP (linux/fs.h) and the fiemap structs it fills in
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = struct.Struct("=QQIIII")  # start, length, flags, mapped extents, extent count, reserved
+FIEMAP_EXTENT = struct.Struct("=QQQQQIIII")  # logical, physical, length, reserved x2, flags, reserved x3
+# Extent flags meaning the physical offset is not known yet (delayed allocation and the like)
+FIEMAP_EXTENT_UNKNOWN = 0x2 | 0x4
+
+_rotational_cache = {}
+
+
+def is_rotational(dev):
+    """
+    True if the block device behind st_dev is a spinning disk, False for SSDs,
+    None when unknown (network and virtual filesystems, non-Linux systems).
+    """
+    if dev in _rotational_cache:
+        return _rotational_cache[dev]
+    result = None
+    base = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+    # Partitions have no queue folder of their own; their parent disk does
+    for candidate in (os.path.join(base, "queue", "rotational"), os.path.join(base, "..", "queue", "rotational")):
+        try:
+            with open(candidate) as f:
+                result = f.read().strip() == "1"
+            break
+        except OSError:
+            continue
+    _rotational_cache[dev] = result
+    return result
+
+
+def physical_offset(path):
+    """
+    Disk offset of the first extent of path via FIEMAP, or None when the
+    filesystem or platform does not support it or the extent has no place
+    on disk yet. No FIEMAP_FLAG_SYNC: a read-only pass must not force writeback.
+    """
+    if not FCNTL_AVAILABLE:
+        return None
+    request = bytearray(FIEMAP_HEADER.size + FIEMAP_EXTENT.size)
+    FIEMAP_HEADER.pack_into(request, 0, 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.ioctl(fd, FS_IOC_FIEMAP, request)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    if FIEMAP_HEADER.unpack_from(request, 0)[3] == 0:
+        return None
+    extent = FIEMAP_EXTENT.unpack_from(request, FIEMAP_HEADER.size)
+    return None if extent[5] & FIEMAP_EXTENT_UNKNOWN else extent[1]
+
+
+def any_rotational(folders):
+    """
+    Cheap check on the roots alone, so SSD-only runs skip the per-file planning.
+    """
+    for folder in folders:
+        try:
+            if is_rotational(os.stat(folder).st_dev):
+                return True
+        except OSError:
+            continue
+    return False
+
+
+class DeviceBatch:
+    """
+    Files on one spinning device, or with dev None everything else, in the
+    order they should be read, and how many workers may read them at once.
+    """
+    __slots__ = ("dev", "rotational", "paths", "workers")
+
+    def __init__(self, dev, rotational, paths, workers):
+        self.dev = dev
+        self.rotational = rotational
+        self.paths = paths
+        self.workers = workers
+
+
+def plan_batches(paths, wide_workers, hdd_workers=DEFAULT_HDD_WORKERS, use_fiemap=True):
+    """
+    Groups paths by device. Spinning disks get a batch each, their files
+    sorted by physical extent (falling back to inode number), and a small
+    worker count. Everything else, unstattable paths included so the hashing
+    stage reports their errors as usual, shares one batch of wide_workers in
+    the order given: extra pools per SSD would only oversubscribe the CPUs.
+    """
+    stats = []
+    by_dev = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            stats.append((path, None))
+            continue
+        stats.append((path, st.st_dev))
+        by_dev.setdefault(st.st_dev, []).append((path, st.st_ino))
+
+    batches = []
+    spinning = set()
+    for dev, files in by_dev.items():
+        if not is_rotational(dev):
+            continue
+        spinning.add(dev)
+        keyed = []
+        for path, ino in files:
+            offset = physical_offset(path) if use_fiemap else None
+            # Extent offsets and inode numbers are not comparable; keep them in separate runs
+            keyed.append((0, offset, path) if offset is not None else (1, ino, path))
+        keyed.sort()
+        batches.append(DeviceBatch(dev, True, [path for _, _, path in keyed], hdd_workers))
+    wide = [path for path, dev in stats if dev not in spinning]
+    if wide:
+        batches.append(DeviceBatch(None, False, wide, wide_workers))
+    for batch in batches:
+        logger.info("I/O plan: device %s, rotational=%s, %d files, %d workers",
+                    batch.dev, batch.rotational, len(batch.paths), batch.workers)
+    return batches
+
+
+def run_batches(batches, func, initializer=None, initargs=(), stop_event=None):
+    """
+    Runs func over every batch, each with its own pool of batch.workers
+    processes so spinning disks proceed in parallel without exceeding their limit.
+    Results are yielded as they arrive, from any device.
+    """
+    results = queue.Queue(maxsize=1024)
+    done = object()
+    pools = []
+
+    def feed(pool, batch):
+        try:
+            # imap dispatches in order, which is what keeps a spinning disk's reads sequential
+            for result in pool.imap(func, batch.paths, chunksize=1 if batch.rotational else 16):
+                results.put(result)
+        except Exception as ex:
+            logger.error("I/O batch for device %s failed: %s", batch.dev, ex)
+        finally:
+            results.put(done)
+
+    threads = []
+    for batch in batches:
+        pool = multiprocessing.Pool(processes=batch.workers, initializer=initializer, initargs=initargs)
+        pools.append(pool)
+        thread = threading.Thread(target=feed, args=(pool, batch), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    remaining = len(threads)
+    try:
+        while remaining:
+            if stop_event is not None and stop_event.is_set():
+                return
+            try:
+                item = results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+    finally:
+        for pool in pools:
+            pool.terminate()
+        # Unblock feeders stuck on a full queue; give up on any left waiting on a dead pool
+        deadline = time.monotonic() + 2.0
+        while any(t.is_alive() for t in threads) and time.monotonic() < deadline:
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for pool in pools:
+            pool.join()
@@ -0,0 +1,161 @@
+import os, queue, logging, threading
+
+logger = logging.getLogger(__name__)
+
+# Directory listings in flight per device; high enough to hide NFS round trips
+DEFAULT_SCAN_THREADS = 8
+# Entries buffered between the scanner threads and the consumer
+OUTPUT_BUFFER = 10000
+
+ENTRY_DIR = "dir"
+ENTRY_FILE = "file"
+ENTRY_ERROR = "error"
+
+
+def group_roots_by_device(roots):
+    """
+    {st_dev: [root, ...]} for the roots that exist; missing roots are left out.
+    """
+    groups = {}
+    for root in roots:
+        try:
+            groups.setdefault(os.stat(root).st_dev, []).append(root)
+        except OSError as ex:
+            logger.warning("Cannot scan %s: %s", root, ex)
+    return groups
+
+
+class _DeviceScan:
+    """
+    Work queue of directories on one device, drained by its own thread pool.
+    """
+
+    def __init__(self, roots, threads, output, skip_dirs, with_sizes, stop_events):
+        self.work = queue.Queue()
+        self.output = output
+        self.skip_dirs = skip_dirs
+        self.with_sizes = with_sizes
+        self.stop_events = stop_events
+        self.pending = len(roots)
+        self.lock = threading.Lock()
+        for root in roots:
+            self.work.put(root)
+        self.threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(threads)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def finish_one(self):
+        with self.lock:
+            self.pending -= 1
+            if self.pending == 0:
+                # Wake every worker so they see the device is done
+                for _ in self.threads:
+                    self.work.put(None)
+
+    def worker(self):
+        while True:
+            directory = self.work.get()
+            if directory is None:
+                self.output.put(None)
+                return
+            if not any(event.is_set() for event in self.stop_events):
+                self.list_directory(directory)
+            self.finish_one()
+
+    def list_directory(self, directory):
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        # Same rules as os.walk: symlinked folders count as folders but are not entered
+                        if entry.is_dir():
+                            if entry.path in self.skip_dirs:
+                                continue
+                            self.output.put((ENTRY_DIR, entry.path, 0))
+                            if not entry.is_symlink():
+                                with self.lock:
+                                    self.pending += 1
+                                self.work.put(entry.path)
+                        else:
+                            size = 0
+                            if self.with_sizes:
+                                try:
+                                    size = entry.stat().st_size
+                                except OSError:
+                                    pass
+                            self.output.put((ENTRY_FILE, entry.path, size))
+                    except OSError as ex:
+                        self.output.put((ENTRY_ERROR, entry.path, str(ex)))
+        except OSError as ex:
+            self.output.put((ENTRY_ERROR, directory, str(ex)))
+
+
+def scan(roots, threads_per_device=DEFAULT_SCAN_THREADS, skip_dirs=(), with_sizes=True, stop_event=None):
+    """
+    Streams (kind, path, size) for everything below roots as it is found:
+    kind is "dir", "file" or "error" (size then holds the message). Roots are
+    grouped by device and each device is listed by its own threads_per_device
+    threads, so slow mounts do not hold up fast ones. The roots themselves
+    are not reported, and folders in skip_dirs are neither reported nor entered.
+    Order is not deterministic.
+    """
+    # Our own event for an abandoned generator, so the caller's stop_event is only ever read
+    abandoned = threading.Event()
+    stop_events = (abandoned,) if stop_event is None else (abandoned, stop_event)
+    output = queue.Queue(maxsize=OUTPUT_BUFFER)
+    skip_dirs = set(skip_dirs)
+    devices = [_DeviceScan(roots_on_dev, threads_per_device, output, skip_dirs, with_sizes, stop_events)
+               for roots_on_dev in group_roots_by_device(roots).values()]
+    running = sum(len(device.threads) for device in devices)
+    for device in devices:
+        device.start()
+    try:
+        while running:
+            item = output.get()
+            if item is None:
+                running -= 1
+            else:
+                yield item
+    finally:
+        if running:
+            # Consumer stopped early; let the threads wind down without blocking on a full queue
+            abandoned.set()
+            while running:
+                if output.get() is None:
+                    running -= 1
+
+
+def scan_files(roots, **kwargs):
+    # Just the file paths, for callers that used to chain os.walk loops
+    for kind, path, _ in scan(roots, with_sizes=False, **kwargs):
+        if kind == ENTRY_FILE:
+            yield path
+
+
+def scan_summary(roots, collect_limit=None, observer=None, **kwargs):
+    """
+    One parallel pass over roots returning (files, folders, total size, [file paths]),
+    counted the way compute_directory_summary does. Once collect_limit files
+    have been seen the path list is dropped and None is returned in its place.
+    observer, if given, is called with (path, size) for every file.
+    """
+    files = folders = size = 0
+    paths = []
+    for kind, path, value in scan(roots, **kwargs):
+        if kind == ENTRY_FILE:
+            files += 1
+            size += value
+            if observer is not None:
+                observer(path, value)
+            if paths is not None:
+                if collect_limit is not None and files >= collect_limit:
+                    paths = None
+                else:
+                    paths.append(path)
+        elif kind == ENTRY_DIR:
+            folders += 1
+        else:
+            logger.warning("Scan error at %s: %s", path, value)
+    return files, folders, size, paths
@@ -0,0 +1,219 @@
+import os, time, shutil, logging, subprocess, multiprocessing
+from organiser.section1_logging import init_worker_logging, worker_logging_args
+from organiser.section2_configuration import CONFIG
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+# Reads are judged in windows of this many bytes, so one slow seek does not trigger a back-off
+LATENCY_WINDOW = MB
+# Weight of the newest window in the shared latency average
+LATENCY_SMOOTHING = 0.2
+# Back-off never slows the workers below this fraction of their full speed
+MIN_SCALE = 0.05
+BACKOFF_FACTOR = 0.7
+RECOVER_FACTOR = 1.1
+# Worker priority in background mode: nice increment and ionice class (3 = idle, 2 = best effort)
+DEFAULT_NICE = 10
+DEFAULT_IONICE_CLASS = 3
+
+# Throttle installed in this process, if any; see install_throttle
+_throttle = None
+
+
+class TokenBucket:
+    """
+    Bytes-per-second limit with one second of burst, shared by every process
+    it is handed to through Pool initargs. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate, lock):
+        self.lock = lock
+        self._rate = multiprocessing.RawValue("d", float(rate))
+        self._tokens = multiprocessing.RawValue("d", float(rate))
+        self._stamp = multiprocessing.RawValue("d", time.monotonic())
+
+    @property
+    def rate(self):
+        return self._rate.value
+
+    @rate.setter
+    def rate(self, value):
+        with self.lock:
+            self._rate.value = float(value)
+            self._tokens.value = min(self._tokens.value, float(value))
+
+    def consume(self, nbytes, scale=1.0):
+        """
+        Takes nbytes from the bucket, sleeping long enough to keep the
+        long-run rate at rate * scale. Callers queue up behind each other's debt.
+        """
+        if self._rate.value <= 0:
+            return
+        with self.lock:
+            rate = self._rate.value * scale
+            if rate <= 0:
+                return
+            now = time.monotonic()
+            tokens = min(rate, self._tokens.value + (now - self._stamp.value) * rate) - nbytes
+            self._tokens.value = tokens
+            self._stamp.value = now
+        if tokens < 0:
+            time.sleep(-tokens / rate)
+
+
+class Throttle:
+    """
+    Read and write limits for a run plus an adaptive back-off: workers report
+    how long their reads take, and when the average read latency climbs above
+    latency_ms (foreground load on the same disks) every worker slows down
+    until it falls again. All limits can be changed while the run is going.
+    """
+
+    def __init__(self, read_rate=0, write_rate=0, latency_ms=0, background=False,
+                 nice=DEFAULT_NICE, ionice_class=DEFAULT_IONICE_CLASS):
+        self.lock = multiprocessing.Lock()
+        self.reads = TokenBucket(read_rate, self.lock)
+        self.writes = TokenBucket(write_rate, self.lock)
+        self._latency_ms = multiprocessing.RawValue("d", float(latency_ms))
+        self._average_ms = multiprocessing.RawValue("d", 0.0)
+        self._scale = multiprocessing.RawValue("d", 1.0)
+        self.background = background
+        self.nice = nice
+        self.ionice_class = ionice_class
+        # Per-process latency window; each worker starts its own
+        self._window_bytes = self._window_reads = 0
+        self._window_seconds = 0.0
+
+    @classmethod
+    def from_config(cls):
+        return cls(read_rate=CONFIG.get("throttle_read_mb_s", 0) * MB,
+                   write_rate=CONFIG.get("throttle_write_mb_s", 0) * MB,
+                   latency_ms=CONFIG.get("throttle_latency_ms", 0),
+                   background=CONFIG.get("background_mode", False),
+                   nice=CONFIG.get("background_nice", DEFAULT_NICE),
+                   ionice_class=CONFIG.get("background_ionice_class", DEFAULT_IONICE_CLASS))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_window_bytes"] = state["_window_reads"] = 0
+        state["_window_seconds"] = 0.0
+        return state
+
+    @property
+    def scale(self):
+        return self._scale.value
+
+    @property
+    def average_latency_ms(self):
+        return self._average_ms.value
+
+    def set_limits(self, read_rate=None, write_rate=None, latency_ms=None):
+        """
+        Changes limits on the fly; None leaves a limit as it is. Rates are in bytes per second.
+        """
+        if read_rate is not None:
+            self.reads.rate = read_rate
+        if write_rate is not None:
+            self.writes.rate = write_rate
+        if latency_ms is not None:
+            with self.lock:
+                self._latency_ms.value = float(latency_ms)
+                if latency_ms <= 0:
+                    self._scale.value = 1.0
+        logger.info("Throttle limits: read %.1f MB/s, write %.1f MB/s, latency target %.0f ms",
+                    self.reads.rate / MB, self.writes.rate / MB, self._latency_ms.value)
+
+    def read(self, nbytes, seconds):
+        """
+        Called after each read with its size and duration.
+        """
+        if self._latency_ms.value > 0:
+            self._window_bytes += nbytes
+            self._window_reads += 1
+            self._window_seconds += seconds
+            if self._window_bytes >= LATENCY_WINDOW:
+                self._end_window()
+        self.reads.consume(nbytes, self._scale.value)
+
+    def _end_window(self):
+        window_ms = self._window_seconds * 1000.0 / self._window_reads
+        busy = self._window_seconds
+        self._window_bytes = self._window_reads = 0
+        self._window_seconds = 0.0
+        with self.lock:
+            target = self._latency_ms.value
+            average = self._average_ms.value
+            average = window_ms if average == 0 else average + LATENCY_SMOOTHING * (window_ms - average)
+            self._average_ms.value = average
+            old_scale = scale = self._scale.value
+            if average > target:
+                scale = max(MIN_SCALE, scale * BACKOFF_FACTOR)
+            elif average < target / 2:
+                scale = min(1.0, scale * RECOVER_FACTOR)
+            self._scale.value = scale
+        if scale != old_scale:
+            logger.debug("Read latency %.1f ms (target %.0f ms); speed scaled to %.0f%%",
+                         average, target, scale * 100)
+        if scale < 1.0 and self.reads.rate <= 0:
+            # No byte limit to scale down, so idle for a share of the time spent reading instead
+            time.sleep(busy * (1.0 / scale - 1.0))
+
+    def write(self, src, dest_dir, nbytes):
+        """
+        Charges a move of nbytes from src into dest_dir against the write limit.
+        Renames within one filesystem write no data and are not charged.
+        """
+        if self.writes.rate <= 0:
+            return
+        try:
+            if os.stat(src).st_dev == os.stat(dest_dir).st_dev:
+                return
+        except OSError:
+            pass
+        self.writes.consume(nbytes, self._scale.value)
+
+    def lower_priority(self):
+        """
+        Drops the calling process to background CPU and I/O priority.
+        """
+        try:
+            os.nice(self.nice)
+        except (AttributeError, OSError) as ex:
+            logger.debug("Could not renice worker %d: %s", os.getpid(), ex)
+        ionice = shutil.which("ionice")
+        if ionice is None:
+            return
+        args = [ionice, "-c", str(self.ionice_class), "-p", str(os.getpid())]
+        if self.ionice_class == 2:
+            args[3:3] = ["-n", "7"]
+        try:
+            subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError) as ex:
+            logger.debug("Could not ionice worker %d: %s", os.getpid(), ex)
+
+
+def install_throttle(throttle):
+    """
+    Makes throttle the one worker_hash_file reports its reads to in this process.
+    """
+    global _throttle
+    _throttle = throttle
+
+
+def current_throttle():
+    return _throttle
+
+
+def init_throttled_worker(throttle, log_queue, level, module_levels):
+    init_worker_logging(log_queue, level, module_levels)
+    install_throttle(throttle)
+    if throttle.background:
+        throttle.lower_priority()
+
+
+def throttled_worker_args(throttle):
+    """
+    initargs for a multiprocessing.Pool initializer of init_throttled_worker.
+    """
+    return (throttle,) + worker_logging_args()
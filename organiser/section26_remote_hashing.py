@@ -0,0 +1,611 @@
+import os, sys, json, time, hmac, queue, socket, struct, sqlite3, logging, argparse, threading, socketserver, multiprocessing
+from functools import partial
+from organiser.section1_logging import configure_logging
+from organiser.section2_configuration import CONFIG
+from organiser.section3_helpers import ensure_dir_exists, state_dir
+from organiser.section4_hashing import worker_hash_file
+from organiser.section24_scanner import scan_files
+from organiser.section25_throttle import Throttle, init_throttled_worker, throttled_worker_args
+from organiser.section33_xattr_digests import UNDATED
+
+logger = logging.getLogger(__name__)
+
+# Every message is a 4-byte big-endian length followed by that many bytes of UTF-8 JSON
+HEADER = struct.Struct(">I")
+MAX_MESSAGE = 64 * 1024 * 1024
+DEFAULT_PORT = 7878
+# Paths sent per request; large enough to amortise the round trip, small enough to retry cheaply
+BATCH_SIZE = 256
+# Batches waiting per share before the coordinator stops reading ahead
+QUEUE_DEPTH = 64
+DEFAULT_CONNECTIONS = 2
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 120.0
+# Seconds between pings of workers that have been marked down
+HEALTH_INTERVAL = 5.0
+# Digests a daemon keeps in memory between requests
+WORKER_CACHE_LIMIT = 1000000
+CACHE_NAME = "digest_cache.sqlite"
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            raise ConnectionError("Connection closed by peer")
+        got += k
+    return bytes(buf)
+
+
+def recv_message(sock):
+    (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if length > MAX_MESSAGE:
+        raise ProtocolError(f"Message of {length} bytes exceeds the {MAX_MESSAGE} byte limit")
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+def parse_address(address):
+    """
+    "unix:/path/to/socket" or "host:port" (port defaults to DEFAULT_PORT).
+    Returns (socket family, address for connect/bind).
+    """
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    if not host:
+        host, port = port, DEFAULT_PORT
+    return socket.AF_INET, (host.strip("[]"), int(port))
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class HashWorkerServer:
+    """
+    Hashing daemon run on a file server, next to the data. Requests name paths
+    as the server sees them; it answers with digests, capture years and stat
+    metadata, hashing with a local process pool and skipping files whose size
+    and mtime match a digest it already holds or one the coordinator sent
+    along as a hint.
+    A TCP listener needs a token; a unix socket is guarded by its file permissions.
+    """
+
+    def __init__(self, address, processes=0, token=""):
+        family, bind_address = parse_address(address)
+        if family != socket.AF_UNIX and not token:
+            raise ValueError(f"Refusing to listen on {address} without a token")
+        self.token = token
+        self.processes = processes or multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(processes=self.processes, initializer=init_throttled_worker,
+                                         initargs=throttled_worker_args(Throttle.from_config()))
+        self.cache = {}  # (path, algo) -> (size, mtime_ns, digest, year)
+        self.lock = threading.Lock()
+        self.busy = 0
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):
+                os.remove(bind_address)
+            server_class = _UnixServer
+        else:
+            server_class = _TCPServer
+        owner = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                owner.serve_connection(self.request)
+
+        self.server = server_class(bind_address, Handler)
+
+    def serve_forever(self):
+        logger.info("Hash worker listening on %s with %d processes", self.server.server_address, self.processes)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def close(self):
+        self.server.server_close()
+        self.pool.terminate()
+        self.pool.join()
+
+    def serve_connection(self, sock):
+        while True:
+            try:
+                request = recv_message(sock)
+            except (ConnectionError, OSError):
+                return
+            except (ProtocolError, ValueError) as ex:
+                logger.warning("Bad request: %s", ex)
+                return
+            if not hmac.compare_digest(str(request.get("token", "")), self.token):
+                send_message(sock, {"ok": False, "error": "Authentication failed"})
+                return
+            try:
+                self.dispatch(sock, request)
+            except (ConnectionError, OSError):
+                return
+            except Exception as ex:
+                logger.error("Request %s failed: %s", request.get("op"), ex)
+                send_message(sock, {"ok": False, "error": str(ex)})
+
+    def dispatch(self, sock, request):
+        op = request.get("op")
+        if op == "ping":
+            send_message(sock, {"ok": True, "pid": os.getpid(), "processes": self.processes,
+                                "busy": self.busy, "cached": len(self.cache)})
+        elif op == "hash":
+            rows = self.hash_paths(request["paths"], request.get("hints"), request["algo"],
+                                   request.get("skip_size", 0), request.get("dates", False))
+            send_message(sock, {"ok": True, "results": rows, "more": False})
+        elif op == "hash_tree":
+            # Results go back in batches as the subtree is walked
+            batch = []
+            for path in scan_files([request["root"]]):
+                batch.append(path)
+                if len(batch) >= BATCH_SIZE:
+                    rows = self.hash_paths(batch, None, request["algo"], request.get("skip_size", 0),
+                                           request.get("dates", False))
+                    send_message(sock, {"ok": True, "results": rows, "more": True})
+                    batch = []
+            rows = self.hash_paths(batch, None, request["algo"], request.get("skip_size", 0),
+                                   request.get("dates", False))
+            send_message(sock, {"ok": True, "results": rows, "more": False})
+        else:
+            send_message(sock, {"ok": False, "error": f"Unknown op {op!r}"})
+
+    def hash_paths(self, paths, hints, algo, skip_size, dates=False):
+        """
+        Returns [path, hexdigest, error, size, mtime_ns, year] per path, in request order.
+        hints, when given, holds [size, mtime_ns, hexdigest, year] or None per path.
+        With dates, photo/video capture years are read while hashing; year is
+        UNDATED for a file that has none, and None when dates were not read.
+        A known digest without a year does not count when dates are wanted.
+        """
+        rows = [None] * len(paths)
+        misses = []
+        for i, path in enumerate(paths):
+            try:
+                st = os.stat(path)
+            except OSError as ex:
+                rows[i] = [path, None, ["HashError", str(ex)], 0, 0, None]
+                continue
+            with self.lock:
+                cached = self.cache.get((path, algo))
+            known_digests = ((hints[i] if hints else None), cached)
+            if skip_size > 0 and st.st_size > skip_size:
+                # Let worker_hash_file report the skip
+                known_digests = ()
+            for known in known_digests:
+                year = known[3] if known and len(known) > 3 else None
+                if known and known[0] == st.st_size and known[1] == st.st_mtime_ns and (year is not None or not dates):
+                    rows[i] = [path, known[2], None, st.st_size, st.st_mtime_ns, year]
+                    break
+            else:
+                misses.append((i, st.st_mtime_ns))
+        if not misses:
+            return rows
+
+        with self.lock:
+            self.busy += 1
+        try:
+            worker = partial(worker_hash_file, algo=algo, skip_size=skip_size, sniff_dates=True)
+            hashed = self.pool.imap(worker, [paths[i] for i, _ in misses], chunksize=4)
+            for (i, mtime_ns), (path, digest, err, size, _, year) in zip(misses, hashed):
+                # Dates are read whenever a file is, so the cached year is always known
+                year = (year or UNDATED) if digest is not None else None
+                rows[i] = [path, digest, list(err) if err else None, size, mtime_ns, year]
+                if digest is not None:
+                    with self.lock:
+                        if len(self.cache) >= WORKER_CACHE_LIMIT:
+                            self.cache.clear()
+                        self.cache[(path, algo)] = (size, mtime_ns, digest, year)
+        finally:
+            with self.lock:
+                self.busy -= 1
+        return rows
+
+
+class RemoteWorker:
+    """
+    One hashing daemon, and how paths under local_prefix here map to
+    remote_prefix on its side. An empty local_prefix means it sees the same
+    paths we do and can take any of them.
+    """
+
+    def __init__(self, address, local_prefix="", remote_prefix="", connections=DEFAULT_CONNECTIONS,
+                 token="", timeout=DEFAULT_TIMEOUT):
+        self.address = address
+        self.local_prefix = os.path.normpath(local_prefix) if local_prefix else ""
+        self.remote_prefix = remote_prefix or self.local_prefix
+        self.connections = connections
+        self.token = token
+        self.timeout = timeout
+        self.healthy = True
+
+    def owns(self, path):
+        if not self.local_prefix:
+            return True
+        return path == self.local_prefix or path.startswith(self.local_prefix.rstrip(os.sep) + os.sep)
+
+    def to_remote(self, path):
+        if not self.local_prefix:
+            return path
+        return self.remote_prefix + path[len(self.local_prefix):]
+
+    def connect(self):
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def request(self, sock, message):
+        message["token"] = self.token
+        send_message(sock, message)
+        response = recv_message(sock)
+        if not response.get("ok"):
+            raise ProtocolError(response.get("error", "Request failed"))
+        return response
+
+    def ping(self):
+        """
+        Returns the daemon's status, or None when it cannot be reached.
+        """
+        try:
+            sock = self.connect()
+        except OSError:
+            return None
+        try:
+            sock.settimeout(min(self.timeout, 5.0))
+            return self.request(sock, {"op": "ping"})
+        except (OSError, ProtocolError, ValueError):
+            return None
+        finally:
+            sock.close()
+
+    def hash_batch(self, sock, paths, hints, algo, skip_size, dates=False):
+        response = self.request(sock, {"op": "hash", "paths": [self.to_remote(p) for p in paths],
+                                       "hints": hints, "algo": algo, "skip_size": skip_size, "dates": dates})
+        rows = response["results"]
+        if len(rows) != len(paths):
+            raise ProtocolError(f"Sent {len(paths)} paths, got {len(rows)} results")
+        return rows
+
+    def hash_tree(self, root, algo, skip_size=0, dates=False):
+        """
+        Yields [remote path, hexdigest, error, size, mtime_ns, year] for every
+        file below root, a path on the daemon's side.
+        """
+        sock = self.connect()
+        try:
+            send_message(sock, {"op": "hash_tree", "root": root, "algo": algo, "skip_size": skip_size,
+                                "dates": dates, "token": self.token})
+            while True:
+                response = recv_message(sock)
+                if not response.get("ok"):
+                    raise ProtocolError(response.get("error", "Request failed"))
+                yield from response["results"]
+                if not response["more"]:
+                    return
+        finally:
+            sock.close()
+
+
+class DigestCache:
+    """
+    Digests and capture years returned by the hashing daemons, kept in the
+    state folder with the size and mtime they were taken at. They are sent
+    back as hints, so a daemon only reads files that changed since any worker
+    last hashed them.
+    """
+
+    def __init__(self, organised_folder, algo):
+        self.algo = algo.lower()
+        self.path = os.path.join(ensure_dir_exists(state_dir(organised_folder)), CACHE_NAME)
+        # Looked up from the dispatch thread, filled from the processing thread
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS digests ("
+                          "path TEXT NOT NULL, algo TEXT NOT NULL, size INTEGER, mtime_ns INTEGER, "
+                          "digest TEXT NOT NULL, year INTEGER, PRIMARY KEY (path, algo))")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(digests)")]
+        if "year" not in columns:
+            # Caches from before years were kept; their rows count as not dated yet
+            self.conn.execute("ALTER TABLE digests ADD COLUMN year INTEGER")
+        self.conn.commit()
+
+    def hints(self, paths):
+        """
+        [size, mtime_ns, hexdigest, year] or None for each path.
+        """
+        marks = ",".join("?" * len(paths))
+        with self.lock:
+            rows = self.conn.execute(f"SELECT path, size, mtime_ns, digest, year FROM digests "
+                                     f"WHERE algo=? AND path IN ({marks})", (self.algo, *paths)).fetchall()
+        found = {path: [size, mtime_ns, digest, year] for path, size, mtime_ns, digest, year in rows}
+        return [found.get(path) for path in paths]
+
+    def store(self, rows):
+        # rows: iterable of (path, hexdigest, size, mtime_ns, year)
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO digests (path, algo, size, mtime_ns, digest, year) "
+                                  "VALUES (?, ?, ?, ?, ?, ?)",
+                                  ((path, self.algo, size, mtime_ns, digest, year)
+                                   for path, digest, size, mtime_ns, year in rows))
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+class _Share:
+    """
+    Workers that serve one local prefix and the batches waiting for them.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.workers = []
+        self.batches = queue.Queue(maxsize=QUEUE_DEPTH)
+        # Batches handed back by a failing worker; taken before new ones
+        self.retries = queue.Queue()
+
+    def any_healthy(self):
+        return any(worker.healthy for worker in self.workers)
+
+
+class RemoteHashPool:
+    """
+    Fans hashing out to daemons near the data. Each path goes to the workers
+    whose local_prefix covers it; paths no worker covers, and the batches of
+    a share whose workers are all down, are hashed by the local pool instead.
+    Failed requests are retried on a fresh connection before a worker is
+    marked down, and down workers are pinged until they come back.
+    """
+
+    def __init__(self, workers, algo, skip_size, cache=None, retries=DEFAULT_RETRIES, stop_event=None,
+                 sniff_dates=False):
+        self.algo = algo
+        self.skip_size = skip_size
+        self.sniff_dates = sniff_dates
+        self.cache = cache
+        self.retries = retries
+        self.stop_event = stop_event
+        shares = {}
+        for worker in workers:
+            shares.setdefault(worker.local_prefix, _Share(worker.local_prefix)).workers.append(worker)
+        # Longest prefix first, so nested shares win over the ones around them
+        self.shares = sorted(shares.values(), key=lambda s: len(s.prefix), reverse=True)
+
+    @classmethod
+    def from_config(cls, organised_folder, algo, skip_size, stop_event=None):
+        """
+        A pool for the workers listed under remote_workers, or None when there are none.
+        """
+        specs = CONFIG.get("remote_workers", [])
+        if not specs:
+            return None
+        token = CONFIG.get("remote_token", "")
+        timeout = CONFIG.get("remote_timeout", DEFAULT_TIMEOUT)
+        workers = [RemoteWorker(spec["address"], spec.get("local_prefix", ""), spec.get("remote_prefix", ""),
+                                spec.get("connections", DEFAULT_CONNECTIONS), token, timeout)
+                   for spec in specs]
+        return cls(workers, algo, skip_size, DigestCache(organised_folder, algo),
+                   CONFIG.get("remote_retries", DEFAULT_RETRIES), stop_event, CONFIG.get("capture_dates", True))
+
+    def share_for(self, path):
+        for share in self.shares:
+            if share.workers[0].owns(path):
+                return share
+        return None
+
+    def imap(self, paths, local_pool, local_worker):
+        """
+        Yields (path, hexdigest, error, size, mtime_ns, year) for every path,
+        in completion order, like local_pool.imap_unordered(local_worker, paths)
+        would with sniff_dates. With sniff_dates the daemons read capture
+        years too, and local_worker is expected to sniff them as well.
+        """
+        results = queue.Queue()
+        local_paths = queue.Queue()
+        finished = threading.Event()
+        dispatched = [0]
+        dispatch_done = threading.Event()
+
+        for share in self.shares:
+            for worker in share.workers:
+                worker.healthy = worker.ping() is not None
+                if not worker.healthy:
+                    logger.warning("Hash worker %s is not answering; its share is hashed locally", worker.address)
+
+        def hand_back(share, batch):
+            if share.any_healthy():
+                share.retries.put(batch)
+            else:
+                for path in batch:
+                    local_paths.put(path)
+
+        def dispatch():
+            batches = {id(share): [] for share in self.shares}
+            try:
+                for path in paths:
+                    if finished.is_set():
+                        return
+                    dispatched[0] += 1
+                    share = self.share_for(path)
+                    if share is None:
+                        local_paths.put(path)
+                        continue
+                    batch = batches[id(share)]
+                    batch.append(path)
+                    if len(batch) >= BATCH_SIZE:
+                        submit(share, batch)
+                        batches[id(share)] = []
+                for share in self.shares:
+                    if batches[id(share)]:
+                        submit(share, batches[id(share)])
+            finally:
+                dispatch_done.set()
+
+        def submit(share, batch):
+            while not finished.is_set():
+                if not share.any_healthy():
+                    hand_back(share, batch)
+                    return
+                try:
+                    share.batches.put(batch, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def connection(share, worker):
+            sock = None
+            try:
+                while not finished.is_set():
+                    if not worker.healthy:
+                        time.sleep(0.5)
+                        continue
+                    try:
+                        batch = share.retries.get_nowait()
+                    except queue.Empty:
+                        try:
+                            batch = share.batches.get(timeout=0.5)
+                        except queue.Empty:
+                            continue
+                    hints = self.cache.hints(batch) if self.cache is not None else None
+                    for attempt in range(self.retries):
+                        try:
+                            if sock is None:
+                                sock = worker.connect()
+                            rows = worker.hash_batch(sock, batch, hints, self.algo, self.skip_size,
+                                                     self.sniff_dates)
+                            break
+                        except (OSError, ProtocolError, ValueError) as ex:
+                            logger.warning("Hash worker %s failed (attempt %d/%d): %s",
+                                           worker.address, attempt + 1, self.retries, ex)
+                            if sock is not None:
+                                sock.close()
+                                sock = None
+                            time.sleep(min(0.5 * 2 ** attempt, 5.0))
+                    else:
+                        worker.healthy = False
+                        logger.error("Marking hash worker %s down", worker.address)
+                        hand_back(share, batch)
+                        continue
+                    for path, (_, digest, err, size, mtime_ns, year) in zip(batch, rows):
+                        results.put(((path, digest, tuple(err) if err else None, size, mtime_ns), year))
+            finally:
+                if sock is not None:
+                    sock.close()
+
+        def health():
+            while not finished.wait(HEALTH_INTERVAL):
+                for share in self.shares:
+                    for worker in share.workers:
+                        if not worker.healthy and worker.ping() is not None:
+                            logger.info("Hash worker %s is back", worker.address)
+                            worker.healthy = True
+                    if not share.any_healthy():
+                        # Nobody left to take these; hash them here
+                        for pending in (share.retries, share.batches):
+                            while True:
+                                try:
+                                    batch = pending.get_nowait()
+                                except queue.Empty:
+                                    break
+                                for path in batch:
+                                    local_paths.put(path)
+
+        def local():
+            for result in local_pool.imap_unordered(local_worker, iter(local_paths.get, None), chunksize=1):
+                # worker_hash_file adds the capture year as a sixth item when it sniffs dates;
+                # for the cache, a file it found no date in is UNDATED, like the daemons report it
+                year = result[5] if len(result) > 5 else None
+                results.put((result[:5], (year or UNDATED) if self.sniff_dates and result[1] is not None else year))
+
+        threads = [threading.Thread(target=dispatch, daemon=True),
+                   threading.Thread(target=health, daemon=True),
+                   threading.Thread(target=local, daemon=True)]
+        for share in self.shares:
+            for worker in share.workers:
+                for _ in range(worker.connections):
+                    threads.append(threading.Thread(target=connection, args=(share, worker), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        received = 0
+        fresh = []
+        try:
+            while not (dispatch_done.is_set() and received >= dispatched[0]):
+                if self.stop_event is not None and self.stop_event.is_set():
+                    return
+                try:
+                    (path, digest, err, size, mtime_ns), year = results.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                received += 1
+                if digest is not None and self.cache is not None and self.share_for(path) is not None:
+                    fresh.append((path, digest, size, mtime_ns, year))
+                    if len(fresh) >= BATCH_SIZE:
+                        self.cache.store(fresh)
+                        fresh = []
+                # The daemons always read dates; they are only passed on when asked for
+                yield (path, digest, err, size, mtime_ns, (year or None) if self.sniff_dates else None)
+        finally:
+            finished.set()
+            local_paths.put(None)
+            if self.cache is not None:
+                if fresh:
+                    self.cache.store(fresh)
+                self.cache.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a hashing worker for remote organiser runs.")
+    parser.add_argument("--listen", default=f"127.0.0.1:{DEFAULT_PORT}",
+                        help="host:port or unix:/path/to/socket (default loopback only)")
+    parser.add_argument("--processes", type=int, default=0, help="Hashing processes (0 = all cores)")
+    parser.add_argument("--token", default=os.environ.get("FILEWIZARD_WORKER_TOKEN", ""),
+                        help="Shared secret the coordinator must send (default $FILEWIZARD_WORKER_TOKEN)")
+    args = parser.parse_args(argv)
+    if not args.listen.startswith("unix:") and not args.token:
+        parser.error("--token (or $FILEWIZARD_WORKER_TOKEN) is required when listening on TCP")
+    configure_logging()
+    server = HashWorkerServer(args.listen, args.processes, args.token)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import os, re, shutil, fnmatch, logging, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from organiser.section3_helpers import ensure_dir_exists
+from organiser.section24_scanner import scan_files
+
+logger = logging.getLogger(__name__)
+
+KIND_KEYWORD = "keyword"
+KIND_EXTENSION = "extension"
+KIND_REGEX = "regex"
+KIND_GLOB = "glob"
+# Prefixes that turn a comma-separated rule into a regex or glob rule in the dialogs
+RULE_PREFIXES = {"re:": KIND_REGEX, "glob:": KIND_GLOB}
+# Moves in flight at once; renames are metadata-bound, so threads overlap the round trips
+DEFAULT_MOVE_THREADS = 8
+
+
+class AhoCorasick:
+    """
+    Finds which of many substrings occur in a text in one pass over it.
+    search() returns the smallest index of the patterns that occur, or None.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                state = nxt
+            if self.best[state] is None or index < self.best[state]:
+                self.best[state] = index
+
+        # Breadth-first, so every fail target is finished before it is inherited from
+        todo = deque(self.goto[0].values())
+        while todo:
+            state = todo.popleft()
+            for ch, nxt in self.goto[state].items():
+                todo.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                inherited = self.best[self.fail[nxt]]
+                if inherited is not None and (self.best[nxt] is None or inherited < self.best[nxt]):
+                    self.best[nxt] = inherited
+
+    def search(self, text):
+        goto, fail, best = self.goto, self.fail, self.best
+        state = 0
+        found = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = best[state]
+            if hit is not None and (found is None or hit < found):
+                found = hit
+                if found == 0:
+                    break
+        return found
+
+
+class PatternMatcher:
+    """
+    Compiled set of filename rules: substring keywords (Aho-Corasick),
+    extensions (a suffix table probed at each dot in the name), regular
+    expressions and globs. match() returns the rule of the first-added
+    pattern that fits a filename, or None.
+    """
+
+    def __init__(self, case_sensitive=False):
+        self.case_sensitive = case_sensitive
+        self.keywords = []  # (pattern, order)
+        self.extensions = {}  # ".ext" -> order
+        self.expressions = []  # (compiled, order)
+        self.rules = []
+        self.automaton = None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def add(self, kind, pattern, rule=None):
+        order = len(self.rules)
+        self.rules.append(pattern if rule is None else rule)
+        if kind == KIND_KEYWORD:
+            self.keywords.append((pattern if self.case_sensitive else pattern.lower(), order))
+        elif kind == KIND_EXTENSION:
+            ext = pattern.strip().lower()
+            if not ext.startswith('.'):
+                ext = '.' + ext
+            self.extensions.setdefault(ext, order)
+        elif kind == KIND_REGEX:
+            self.expressions.append((re.compile(pattern, 0 if self.case_sensitive else re.IGNORECASE), order))
+        elif kind == KIND_GLOB:
+            self.expressions.append((re.compile(fnmatch.translate(pattern), 0 if self.case_sensitive else re.IGNORECASE),
+                                     order))
+        else:
+            raise ValueError(f"Unknown rule kind {kind!r}")
+        self.automaton = None
+        return self
+
+    def add_text(self, text, default_kind):
+        """
+        Adds one comma-separated entry from a dialog: "re:..." and "glob:..."
+        give regex and glob rules, anything else is a default_kind rule.
+        """
+        for prefix, kind in RULE_PREFIXES.items():
+            if text.startswith(prefix):
+                return self.add(kind, text[len(prefix):], text)
+        return self.add(default_kind, text)
+
+    def compile(self):
+        self.automaton = AhoCorasick([pattern for pattern, _ in self.keywords])
+        return self
+
+    def match(self, filename):
+        if self.automaton is None:
+            self.compile()
+        found = None
+        if self.keywords:
+            hit = self.automaton.search(filename if self.case_sensitive else filename.lower())
+            if hit is not None:
+                found = self.keywords[hit][1]
+        if self.extensions:
+            lower = filename.lower()
+            dot = lower.find('.')
+            while dot != -1:
+                order = self.extensions.get(lower[dot:])
+                if order is not None and (found is None or order < found):
+                    found = order
+                dot = lower.find('.', dot + 1)
+        for expression, order in self.expressions:
+            if found is not None and order > found:
+                break
+            if expression.search(filename):
+                found = order
+                break
+        return None if found is None else self.rules[found]
+
+
+class ParallelMover:
+    """
+    Moves files on a thread pool. Destination names are reserved under a lock
+    before a move starts, so two files with the same name never race for it.
+    """
+
+    def __init__(self, threads=DEFAULT_MOVE_THREADS):
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.lock = threading.Lock()
+        # Bounds the moves queued ahead of the pool, so a huge sweep is not held in memory
+        self.slots = threading.BoundedSemaphore(threads * 4)
+        self.reserved = set()
+        self.moved = 0
+        self.errors = []
+
+    def reserve(self, target_folder, filename):
+        base, ext = os.path.splitext(filename)
+        dest_path = os.path.join(target_folder, filename)
+        counter = 1
+        with self.lock:
+            while dest_path in self.reserved or os.path.exists(dest_path):
+                dest_path = os.path.join(target_folder, f"{base} ({counter}){ext}")
+                counter += 1
+            self.reserved.add(dest_path)
+        return dest_path
+
+    def submit(self, src_path, target_folder):
+        dest_path = self.reserve(target_folder, os.path.basename(src_path))
+        self.slots.acquire()
+        self.executor.submit(self._move, src_path, dest_path)
+
+    def _move(self, src_path, dest_path):
+        """
+        Returns True when the file was moved.
+        """
+        try:
+            shutil.move(src_path, dest_path)
+            logger.info("Moved %s -> %s", src_path, dest_path)
+            with self.lock:
+                self.moved += 1
+            return True
+        except Exception as ex:
+            err_msg = f"Error moving {src_path}: {ex}"
+            logger.error(err_msg)
+            with self.lock:
+                self.errors.append(err_msg)
+            return False
+        finally:
+            self.slots.release()
+
+    def finish(self):
+        """
+        Waits for every move; returns (moved count, [error messages]).
+        """
+        self.executor.shutdown(wait=True)
+        return self.moved, self.errors
+
+
+def move_matching(source_folder, target_folder, matcher, threads=DEFAULT_MOVE_THREADS):
+    """
+    Streams the files below source_folder, matches each name once against the
+    compiled rules and moves the matches into target_folder in parallel.
+    Returns (moved count, [error messages]).
+    """
+    ensure_dir_exists(target_folder)
+    matcher.compile()
+    mover = ParallelMover(threads)
+    # The target may sit inside the source; never pick up what was just moved there
+    for src_path in scan_files([os.path.normpath(source_folder)], skip_dirs=(os.path.normpath(target_folder),)):
+        if matcher.match(os.path.basename(src_path)) is not None:
+            mover.submit(src_path, target_folder)
+    return mover.finish()
@@ -0,0 +1,137 @@
+import os, time, string, logging
+from organiser.section3_helpers import ensure_dir_exists
+from organiser.section24_scanner import scan_files
+from organiser.section27_pattern_matcher import PatternMatcher, ParallelMover, DEFAULT_MOVE_THREADS
+
+logger = logging.getLogger(__name__)
+
+# Separates a rule from its destination template in the routes box, e.g. "invoice => Finance/{year}"
+ROUTE_SEPARATOR = "=>"
+# Fields a destination template may use
+TEMPLATE_FIELDS = {"keyword", "ext", "year", "month", "name"}
+_DATE_FIELDS = {"year", "month"}
+
+
+def parse_routes(text):
+    """
+    Reads one "rule => template" per line; blank lines and lines starting with
+    # are skipped. A line without a template routes to a folder named after the rule.
+    Returns [(rule, template)] in order.
+    """
+    routes = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        rule, sep, template = line.partition(ROUTE_SEPARATOR)
+        rule = rule.strip()
+        template = template.strip() if sep else ""
+        if rule:
+            routes.append((rule, template or "{keyword}"))
+    return routes
+
+
+def template_fields(template):
+    fields = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+    unknown = fields - TEMPLATE_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown template field(s) {', '.join(sorted(unknown))} in {template!r}")
+    return fields
+
+
+def _clean(value):
+    # A field value is one path component; keep separators and dot-dot out of it
+    value = value.replace(os.sep, "_").replace("/", "_").strip()
+    return value if value not in ("", ".", "..") else "_"
+
+
+def render_destination(target_root, template, rule, src_path, needs_date):
+    """
+    Destination folder for src_path under target_root. Raises ValueError if
+    the template would leave target_root.
+    """
+    filename = os.path.basename(src_path)
+    base, ext = os.path.splitext(filename)
+    fields = {"keyword": _clean(rule), "ext": _clean(ext.lstrip(".").lower() or "no extension"),
+              "name": _clean(base)}
+    if needs_date:
+        stamp = time.localtime(os.path.getmtime(src_path))
+        fields["year"] = str(stamp.tm_year)
+        fields["month"] = f"{stamp.tm_mon:02d}"
+    dest = os.path.normpath(os.path.join(target_root, template.format(**fields)))
+    root = os.path.normpath(target_root)
+    if dest != root and not dest.startswith(root.rstrip(os.sep) + os.sep):
+        raise ValueError(f"Template {template!r} leaves the target folder")
+    return dest
+
+
+class RoutingMover(ParallelMover):
+    """
+    ParallelMover that also counts moves and errors per rule.
+    """
+
+    def __init__(self, threads=DEFAULT_MOVE_THREADS):
+        super().__init__(threads)
+        self.per_rule = {}  # rule -> [moved, errors]
+
+    def submit_for(self, rule, src_path, target_folder):
+        dest_path = self.reserve(target_folder, os.path.basename(src_path))
+        self.slots.acquire()
+        self.executor.submit(self._route, rule, src_path, dest_path)
+
+    def _route(self, rule, src_path, dest_path):
+        moved = self._move(src_path, dest_path)
+        with self.lock:
+            counts = self.per_rule.setdefault(rule, [0, 0])
+            counts[0 if moved else 1] += 1
+
+    def failed(self, rule, src_path, message):
+        err_msg = f"Error routing {src_path}: {message}"
+        logger.error(err_msg)
+        with self.lock:
+            self.errors.append(err_msg)
+            self.per_rule.setdefault(rule, [0, 0])[1] += 1
+
+
+def route_matching(source_folder, target_root, routes, default_kind, case_sensitive=False,
+                   threads=DEFAULT_MOVE_THREADS):
+    """
+    Sends every file below source_folder that matches one of routes to the
+    destination its template renders to, in a single traversal. Each file
+    goes to its first matching rule. Returns ({rule: (moved, errors)} in rule
+    order, [error messages]).
+    """
+    matcher = PatternMatcher(case_sensitive)
+    templates = {}
+    for rule, template in routes:
+        templates[rule] = (template, bool(template_fields(template) & _DATE_FIELDS))
+        matcher.add_text(rule, default_kind)
+    matcher.compile()
+
+    ensure_dir_exists(target_root)
+    mover = RoutingMover(threads)
+    created = set()
+    skip = (os.path.normpath(target_root),)
+    for src_path in scan_files([os.path.normpath(source_folder)], skip_dirs=skip):
+        rule = matcher.match(os.path.basename(src_path))
+        if rule is None:
+            continue
+        template, needs_date = templates[rule]
+        try:
+            dest_dir = render_destination(target_root, template, rule, src_path, needs_date)
+            if dest_dir not in created:
+                ensure_dir_exists(dest_dir)
+                created.add(dest_dir)
+        except (OSError, ValueError) as ex:
+            mover.failed(rule, src_path, str(ex))
+            continue
+        mover.submit_for(rule, src_path, dest_dir)
+    _, errors = mover.finish()
+    summary = {rule: tuple(mover.per_rule.get(rule, (0, 0))) for rule, _ in routes}
+    return summary, errors
+
+
+def format_route_summary(summary):
+    lines = [f"{rule}: moved {moved}" + (f", {failed} errors" if failed else "")
+             for rule, (moved, failed) in summary.items()]
+    return "\n".join(lines)
@@ -0,0 +1,225 @@
+import os, struct
+from datetime import datetime, timedelta
+
+# Bytes kept from the start of a file for the EXIF parser
+HEAD_BYTES = 64 * 1024
+# Bytes read from the start of a moov box; mvhd is its first child in practice
+MOOV_PEEK = 512
+EXIF_EXTENSIONS = {".jpg", ".jpeg", ".jpe", ".tif", ".tiff", ".cr2", ".nef", ".arw", ".dng", ".heic", ".heif"}
+BMFF_EXTENSIONS = {".mp4", ".mov", ".m4v", ".3gp", ".3g2"}
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+# TIFF tags: DateTimeOriginal and CreateDate in the Exif IFD, DateTime in IFD0
+EXIF_IFD_POINTER = 0x8769
+DATE_TIME_ORIGINAL = 0x9003
+CREATE_DATE = 0x9004
+DATE_TIME = 0x0132
+MAC_EPOCH = datetime(1904, 1, 1)
+
+
+def _plausible(year):
+    return year if MIN_YEAR < year < MAX_YEAR else None
+
+
+def _read_ifd(data, base, offset, order):
+    """
+    {tag: (type, count, raw 4-byte value field offset)} for the IFD at base + offset.
+    """
+    entries = {}
+    pos = base + offset
+    (count,) = struct.unpack_from(order + "H", data, pos)
+    for i in range(count):
+        tag, typ, n = struct.unpack_from(order + "HHI", data, pos + 2 + i * 12)
+        entries[tag] = (typ, n, pos + 2 + i * 12 + 8)
+    return entries
+
+
+def _ascii_year(data, base, order, entry):
+    typ, n, field = entry
+    if typ != 2 or n < 4:
+        return None
+    start = field if n <= 4 else base + struct.unpack_from(order + "I", data, field)[0]
+    text = data[start:start + 4]
+    return _plausible(int(text)) if text.isdigit() else None
+
+
+def tiff_year(data, base=0):
+    """
+    Capture year from a TIFF structure (an EXIF block or a whole TIFF/CR2 file)
+    starting at base, or None.
+    """
+    try:
+        marker = data[base:base + 2]
+        order = "<" if marker == b"II" else ">" if marker == b"MM" else None
+        if order is None or struct.unpack_from(order + "H", data, base + 2)[0] != 42:
+            return None
+        ifd0 = _read_ifd(data, base, struct.unpack_from(order + "I", data, base + 4)[0], order)
+        candidates = []
+        if EXIF_IFD_POINTER in ifd0:
+            exif_offset = struct.unpack_from(order + "I", data, ifd0[EXIF_IFD_POINTER][2])[0]
+            exif = _read_ifd(data, base, exif_offset, order)
+            candidates += [exif.get(DATE_TIME_ORIGINAL), exif.get(CREATE_DATE)]
+        candidates.append(ifd0.get(DATE_TIME))
+        for entry in candidates:
+            if entry is not None:
+                year = _ascii_year(data, base, order, entry)
+                if year is not None:
+                    return year
+    except (struct.error, ValueError):
+        pass
+    return None
+
+
+def jpeg_year(data):
+    pos = 2
+    try:
+        while pos + 4 <= len(data) and data[pos] == 0xFF:
+            marker = data[pos + 1]
+            if marker == 0xDA:  # Start of scan; no metadata after this
+                return None
+            (length,) = struct.unpack_from(">H", data, pos + 2)
+            if marker == 0xE1 and data[pos + 4:pos + 10] == b"Exif\0\0":
+                return tiff_year(data, pos + 10)
+            pos += 2 + length
+    except struct.error:
+        pass
+    return None
+
+
+def exif_year(data):
+    """
+    Capture year from the first HEAD_BYTES of a JPEG, TIFF-based raw or HEIC file.
+    """
+    if data[:2] == b"\xff\xd8":
+        return jpeg_year(data)
+    if data[:2] in (b"II", b"MM"):
+        return tiff_year(data)
+    # HEIC and friends keep a plain Exif block somewhere in the file; look for it near the start
+    marker = data.find(b"Exif\0\0")
+    return tiff_year(data, marker + 6) if marker != -1 else None
+
+
+def mvhd_year(moov):
+    """
+    Creation year from the start of a moov box (seconds since 1904 in mvhd).
+    """
+    at = moov.find(b"mvhd")
+    if at == -1:
+        return None
+    try:
+        version = moov[at + 4]
+        if version == 1:
+            (created,) = struct.unpack_from(">Q", moov, at + 8)
+        else:
+            (created,) = struct.unpack_from(">I", moov, at + 8)
+    except (IndexError, struct.error):
+        return None
+    if created == 0:
+        return None
+    try:
+        return _plausible((MAC_EPOCH + timedelta(seconds=created)).year)
+    except OverflowError:
+        return None
+
+
+class DateSniffer:
+    """
+    Picks the capture year out of a file while it is being read for hashing.
+    Photos keep their EXIF in the first HEAD_BYTES; for MP4/MOV the top-level
+    boxes are followed through the stream until moov turns up, wherever it is.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.head = bytearray()
+        self.offset = 0
+        self._year = None
+        self.done = False
+        # Top-level box walk: offset of the bytes we want, how many, and those collected so far
+        self.want_at = 0
+        self.want = 16
+        self.carry = bytearray()
+        self.in_moov = False
+
+    @classmethod
+    def for_path(cls, path):
+        """
+        A sniffer for path's type, or None when its extension carries no capture date.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext in EXIF_EXTENSIONS:
+            return cls("exif")
+        if ext in BMFF_EXTENSIONS:
+            return cls("bmff")
+        return None
+
+    def feed(self, chunk):
+        start = self.offset
+        self.offset += len(chunk)
+        if self.done:
+            return
+        if self.kind == "exif":
+            if len(self.head) < HEAD_BYTES:
+                self.head += chunk[:HEAD_BYTES - len(self.head)]
+            if len(self.head) >= HEAD_BYTES:
+                self.finish()
+        else:
+            self._walk(chunk, start)
+
+    def skip_to(self):
+        """
+        File offset of the next byte the box walk needs, when that lies past
+        everything fed so far (an mdat to jump over), else None. A reader that
+        only wants the date can seek there; see seek().
+        """
+        if self.done or self.kind != "bmff":
+            return None
+        wanted = self.want_at + len(self.carry)
+        return wanted if wanted > self.offset else None
+
+    def seek(self, offset):
+        # The reader jumped ahead; the next chunk fed starts at offset
+        self.offset = offset
+
+    def _walk(self, chunk, start):
+        while not self.done:
+            pos = self.want_at + len(self.carry) - start
+            if pos >= len(chunk):
+                return
+            self.carry += chunk[max(pos, 0):max(pos, 0) + self.want - len(self.carry)]
+            if len(self.carry) < self.want:
+                return
+            if self.in_moov:
+                self._year = mvhd_year(bytes(self.carry))
+                self.done = True
+                return
+            size, box = struct.unpack_from(">I4s", self.carry)
+            header = 8
+            if size == 1:
+                (size,) = struct.unpack_from(">Q", self.carry, 8)
+                header = 16
+            if size < header:
+                # Box runs to end of file, or the structure is not what we expect
+                self.done = True
+                return
+            consumed = header if box == b"moov" else size
+            self.in_moov = box == b"moov"
+            self.want_at += consumed
+            self.want = MOOV_PEEK if self.in_moov else 16
+            # Keep whatever was read past the next wanted offset
+            self.carry = self.carry[consumed:] if consumed < len(self.carry) else bytearray()
+
+    def finish(self):
+        if self.done:
+            return
+        self.done = True
+        if self.kind == "exif":
+            self._year = exif_year(bytes(self.head))
+            self.head = bytearray()
+        elif self.in_moov and self.carry:
+            # moov shorter than MOOV_PEEK at the end of the file
+            self._year = mvhd_year(bytes(self.carry))
+
+    def year(self):
+        self.finish()
+        return self._year
@@ -1,5 +1,7 @@
 import json, os, logging
 
+logger = logging.getLogger(__name__)
+
 def load_config():
     default_config = {
         "target_folders": [],
@@ -7,6 +9,43 @@ def load_config():
         "hash_algorithm": "sha256",
         "skip_larger_than": 0,
         "multiprocessing_cores": 0,
+        "event_log_capacity": 100000,
+        "verify_summary": False,
+        "watch_settle_seconds": 5.0,
+        "watch_poll_seconds": 30.0,
+        "out_of_core_threshold": 2000000,
+        "out_of_core_run_records": 500000,
+        "out_of_core_dir": "",
+        "directory_dedup": False,
+        "directory_dedup_min_files": 2,
+        "quarantine_store": False,
+        "verify_duplicates": False,
+        "io_scheduling": True,
+        "hdd_workers_per_device": 2,
+        "scan_threads_per_device": 8,
+        "throttle_read_mb_s": 0,
+        "throttle_write_mb_s": 0,
+        "throttle_latency_ms": 0,
+        "background_mode": False,
+        "background_nice": 10,
+        "background_ionice_class": 3,
+        "remote_workers": [],
+        "remote_token": "",
+        "remote_retries": 3,
+        "remote_timeout": 120.0,
+        "organiser_move_threads": 8,
+        "capture_dates": True,
+        "similar_images": False,
+        "similar_images_distance": 4,
+        "similar_documents": False,
+        "similar_documents_threshold": 0.8,
+        "archive_redundancy": False,
+        "archive_threads": 4,
+        "xattr_digests": False,
+        "estimate_duplicates": True,
+        "estimate_seconds": 10.0,
+        "snapshots": True,
+        "snapshot_keep": 10,
         "categories": []
     }
     if not os.path.exists("config.json"):
@@ -18,7 +57,7 @@ def load_config():
             with open("config.json", "r") as f:
                 return json.load(f)
         except json.JSONDecodeError:
-            logging.error("Failed to decode config.json. Using default config.")
+            logger.error("Failed to decode config.json. Using default config.")
             return default_config
 
 def save_config(cfg):
@@ -0,0 +1,230 @@
+import os, time, sqlite3, itertools, logging
+from organiser.section3_helpers import ensure_dir_exists, state_dir
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Formats Pillow opens without plugins
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".jpe", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+# dHash compares each pixel of a (HASH_SIZE + 1) x HASH_SIZE thumbnail with its right neighbour: 64 bits
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+# Differing bits up to which two images count as the same picture
+DEFAULT_MAX_DISTANCE = 4
+# Hash pairs compared per NumPy step inside one bucket, bounding the scratch arrays to a few tens of MB
+PAIR_CELLS = 1 << 22
+CACHE_NAME = "image_hashes.sqlite"
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _popcount64(x):
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(x)
+    # SWAR popcount on uint64 arrays
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def worker_image_hash(path):
+    """
+    Returns (path, dhash, pixel count, error). JPEGs are decoded at reduced
+    scale, which is most of the cost of hashing a photo.
+    """
+    try:
+        with Image.open(path) as img:
+            pixels = img.width * img.height
+            img.draft("L", ((HASH_SIZE + 1) * 8, HASH_SIZE * 8))
+            thumb = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+            data = thumb.tobytes()
+        value = 0
+        for row in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1)
+            for col in range(HASH_SIZE):
+                value = (value << 1) | (data[offset + col] > data[offset + col + 1])
+        return (path, value, pixels, None)
+    except Exception as ex:
+        return (path, None, 0, str(ex))
+
+
+class BKTree:
+    """
+    Metric tree over 64-bit hashes by Hamming distance; the fallback search
+    when NumPy is not installed.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = [value, item, {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            d = hamming(value, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def query(self, value, max_distance):
+        found = []
+        todo = [self.root] if self.root is not None else []
+        while todo:
+            node = todo.pop()
+            d = hamming(value, node[0])
+            if d <= max_distance:
+                found.append(node[1])
+            for edge, child in node[2].items():
+                if d - max_distance <= edge <= d + max_distance:
+                    todo.append(child)
+        return found
+
+
+def _bands(max_distance):
+    # max_distance + 1 bands: two hashes within max_distance agree exactly on at least one of them
+    count = min(max_distance + 1, HASH_BITS)
+    edges = [round(i * HASH_BITS / count) for i in range(count + 1)]
+    return [(edges[i], edges[i + 1] - edges[i]) for i in range(count)]
+
+
+def _similar_pairs_numpy(values, max_distance):
+    hashes = np.array(values, dtype=np.uint64)
+    for shift, width in _bands(max_distance):
+        keys = (hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
+            members = order[start:end]
+            block = hashes[members]
+            # Each row is compared with the ones after it, a slab of rows per vectorised step
+            step = max(1, PAIR_CELLS // len(block))
+            for top in range(0, len(block) - 1, step):
+                rows = block[top:top + step]
+                near = _popcount64(rows[:, None] ^ block[None, top + 1:]) <= max_distance
+                for r, c in zip(*(axis.tolist() for axis in np.nonzero(near))):
+                    r += top
+                    c += top + 1
+                    if r < c:
+                        yield int(members[r]), int(members[c])
+
+
+def _similar_pairs_bktree(values, max_distance):
+    tree = BKTree()
+    for i, value in enumerate(values):
+        for j in tree.query(value, max_distance):
+            yield j, i
+        tree.add(value, i)
+
+
+def group_pairs(count, pairs):
+    """
+    Connected components of range(count) joined by the (i, j) pairs, as lists
+    of indices. Only groups of two or more are returned.
+    """
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def group_similar(values, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Groups indices of values (64-bit hashes) that are within max_distance of
+    each other, directly or through a chain of such pairs. Only groups of two
+    or more are returned.
+    """
+    # Identical hashes are joined up front and searched once
+    first = {}
+    unique = []
+    same = []
+    for i, value in enumerate(values):
+        if value in first:
+            same.append((first[value], i))
+        else:
+            first[value] = i
+            unique.append(i)
+    unique_values = [values[i] for i in unique]
+    pairs = (_similar_pairs_numpy if NUMPY_AVAILABLE else _similar_pairs_bktree)(unique_values, max_distance)
+    return group_pairs(len(values), itertools.chain(same, ((unique[a], unique[b]) for a, b in pairs)))
+
+
+def is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+class ImageHashCache:
+    """
+    Perceptual hashes of organised images kept in the state folder with the
+    size and mtime they were taken at, so later runs only decode images that
+    are new or changed. Rows for images not seen in a run are dropped at the end of it.
+    """
+
+    def __init__(self, organised_folder):
+        self.path = os.path.join(ensure_dir_exists(state_dir(organised_folder)), CACHE_NAME)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS image_hashes ("
+                          "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, dhash TEXT, pixels INTEGER, "
+                          "seen REAL)")
+        self.conn.commit()
+        self.run = time.time()
+
+    def get(self, path, size, mtime_ns):
+        """
+        (dhash, pixel count) when path is cached unchanged, else None. The
+        dhash is None for an image that could not be decoded.
+        """
+        row = self.conn.execute("SELECT size, mtime_ns, dhash, pixels FROM image_hashes WHERE path=?",
+                                (path,)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        self.conn.execute("UPDATE image_hashes SET seen=? WHERE path=?", (self.run, path))
+        # Stored as text; SQLite integers are signed 64-bit
+        return (int(row[2], 16) if row[2] is not None else None), row[3]
+
+    def put(self, path, size, mtime_ns, dhash, pixels):
+        self.conn.execute("INSERT OR REPLACE INTO image_hashes (path, size, mtime_ns, dhash, pixels, seen) "
+                          "VALUES (?, ?, ?, ?, ?, ?)", (path, size, mtime_ns, None if dhash is None else f"{dhash:016x}", pixels, self.run))
+
+    def close(self, prune=True):
+        if prune:
+            self.conn.execute("DELETE FROM image_hashes WHERE seen < ?", (self.run,))
+        self.conn.commit()
+        self.conn.close()
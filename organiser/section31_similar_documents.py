@@ -0,0 +1,186 @@
+import os, re, zlib, time, sqlite3, zipfile, logging
+from organiser.section3_helpers import ensure_dir_exists, state_dir
+from organiser.section30_similar_images import group_pairs
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = "doc_signatures.sqlite"
+# Text formats read directly, and zipped XML formats with the members holding their text
+PLAIN_TEXT_EXTENSIONS = {".txt", ".md", ".tex", ".rtf"}
+ZIPPED_TEXT_MEMBERS = {".docx": ("word/document.xml",), ".odt": ("content.xml",), ".epub": None}
+TEXT_EXTENSIONS = PLAIN_TEXT_EXTENSIONS | set(ZIPPED_TEXT_MEMBERS)
+# Text read per document; drafts differ in their body, not in page 400
+MAX_TEXT_BYTES = 1024 * 1024
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.8
+# Shingles hashed per NumPy step, bounding memory for long documents
+SHINGLE_BATCH = 4096
+# Prime just above 2**32: (a * x + b) stays inside uint64 for 32-bit shingle hashes
+_PRIME = 4294967311
+_TAG = re.compile(r"<[^>]+>")
+_RTF_CONTROL = re.compile(r"\\[a-z]+-?\d* ?|[{}]")
+_WORD = re.compile(r"\w+")
+
+if NUMPY_AVAILABLE:
+    # Fixed seed: signatures must be comparable across runs for the cache to be any use
+    _rng = np.random.RandomState(20240611)
+    _PERM_A = _rng.randint(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+    _PERM_B = _rng.randint(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def is_text_document(path):
+    return os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS
+
+
+def extract_text(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PLAIN_TEXT_EXTENSIONS:
+        with open(path, "rb") as f:
+            text = f.read(MAX_TEXT_BYTES).decode("utf-8", errors="ignore")
+        return _RTF_CONTROL.sub(" ", text) if ext == ".rtf" else text
+    with zipfile.ZipFile(path) as archive:
+        members = ZIPPED_TEXT_MEMBERS[ext]
+        if members is None:
+            members = [n for n in archive.namelist() if n.lower().endswith((".xhtml", ".html", ".htm"))]
+        parts, budget = [], MAX_TEXT_BYTES
+        for name in members:
+            if budget <= 0:
+                break
+            with archive.open(name) as f:
+                data = f.read(budget)
+            budget -= len(data)
+            parts.append(_TAG.sub(" ", data.decode("utf-8", errors="ignore")))
+        return " ".join(parts)
+
+
+def shingle_hashes(text):
+    """
+    CRC32 of every run of SHINGLE_WORDS consecutive words, as a unique uint64 array.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    count = max(len(words) - SHINGLE_WORDS + 1, 1)
+    hashes = [zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8")) for i in range(count)]
+    return np.unique(np.array(hashes, dtype=np.uint64))
+
+
+def minhash(shingles):
+    """
+    NUM_PERM-value MinHash signature of a shingle hash array.
+    """
+    signature = np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    for start in range(0, len(shingles), SHINGLE_BATCH):
+        block = shingles[start:start + SHINGLE_BATCH, None]
+        np.minimum(signature, ((block * _PERM_A + _PERM_B) % np.uint64(_PRIME)).min(axis=0), out=signature)
+    return signature
+
+
+def worker_document_signature(path):
+    """
+    Returns (path, signature bytes, error); the signature is None for documents without words.
+    """
+    try:
+        shingles = shingle_hashes(extract_text(path))
+        return (path, minhash(shingles).tobytes() if len(shingles) else None, None)
+    except Exception as ex:
+        return (path, None, str(ex))
+
+
+def lsh_shape(threshold, num_perm=NUM_PERM):
+    """
+    (bands, rows) dividing num_perm whose S-curve midpoint (1/bands)**(1/rows)
+    sits closest below threshold, so pairs at the threshold are likely to share a band.
+    """
+    shapes = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [s for s in shapes if (1 / s[0]) ** (1 / s[1]) <= threshold] or shapes[:1]
+    return min(below, key=lambda s: threshold - (1 / s[0]) ** (1 / s[1]))
+
+
+def group_similar_documents(signatures, threshold=DEFAULT_THRESHOLD):
+    """
+    Groups indices of signatures (bytes from worker_document_signature) whose
+    estimated Jaccard similarity is at least threshold, directly or through a
+    chain of such pairs. Candidates come from LSH banding; each is checked on
+    the full signature. Returns [(indices, lowest similarity of the joining pairs)].
+    """
+    if not signatures:
+        return []
+    matrix = np.frombuffer(b"".join(signatures), dtype=np.uint64).reshape(len(signatures), -1)
+    bands, rows = lsh_shape(threshold, matrix.shape[1])
+    checked = {}
+    for band in range(bands):
+        buckets = {}
+        for i, key in enumerate(map(bytes, matrix[:, band * rows:(band + 1) * rows])):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # One vectorised comparison of each member against the rest of its bucket
+            block = matrix[members]
+            for n, i in enumerate(members[:-1]):
+                scores = (block[n + 1:] == block[n]).mean(axis=1)
+                for j, score in zip(members[n + 1:], scores.tolist()):
+                    if score >= threshold:
+                        checked[(i, j)] = score
+    groups = group_pairs(len(signatures), checked)
+    owner = {i: g for g, members in enumerate(groups) for i in members}
+    lowest = [1.0] * len(groups)
+    for (i, _), score in checked.items():
+        lowest[owner[i]] = min(lowest[owner[i]], score)
+    return list(zip(groups, lowest))
+
+
+class SignatureCache:
+    """
+    MinHash signatures kept in the state folder with the size and mtime they
+    were taken at, so later runs only read documents that are new or changed.
+    Rows for documents not seen in a run are dropped at the end of it.
+    """
+
+    def __init__(self, organised_folder):
+        self.path = os.path.join(ensure_dir_exists(state_dir(organised_folder)), CACHE_NAME)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS signatures ("
+                          "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, signature BLOB, seen REAL)")
+        self.conn.commit()
+        self.run = time.time()
+
+    def get(self, path, size, mtime_ns):
+        """
+        (True, signature bytes or None) when path is cached unchanged, else (False, None).
+        """
+        row = self.conn.execute("SELECT size, mtime_ns, signature FROM signatures WHERE path=?",
+                                (path,)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return False, None
+        self.conn.execute("UPDATE signatures SET seen=? WHERE path=?", (self.run, path))
+        return True, row[2]
+
+    def put(self, path, size, mtime_ns, signature):
+        self.conn.execute("INSERT OR REPLACE INTO signatures (path, size, mtime_ns, signature, seen) "
+                          "VALUES (?, ?, ?, ?, ?)", (path, size, mtime_ns, signature, self.run))
+
+    def close(self, prune=True):
+        if prune:
+            self.conn.execute("DELETE FROM signatures WHERE seen < ?", (self.run,))
+        self.conn.commit()
+        self.conn.close()
+
+
+def format_document_groups(groups):
+    lines = []
+    for number, (paths, similarity) in enumerate(groups, 1):
+        lines.append(f"Group {number} (estimated similarity at least {similarity:.0%})")
+        lines.extend(f"    {path}" for path in paths)
+        lines.append("")
+    return "\n".join(lines)
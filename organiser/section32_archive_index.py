@@ -0,0 +1,246 @@
+import os, time, zlib, tarfile, zipfile, threading, logging
+from concurrent.futures import ThreadPoolExecutor
+from organiser.section24_scanner import scan, ENTRY_FILE
+from organiser.section25_throttle import current_throttle
+
+logger = logging.getLogger(__name__)
+
+ZIP_EXTENSIONS = {".zip"}
+TAR_EXTENSIONS = {".tar", ".tgz", ".tbz2", ".txz", ".tar.gz", ".tar.bz2", ".tar.xz"}
+# Empty members match any empty file and say nothing about redundancy
+MIN_MEMBER_SIZE = 1
+CHUNK = 1024 * 1024
+# Loose candidates compared against one member at a time
+MAX_CANDIDATES = 64
+DEFAULT_ARCHIVE_THREADS = 4
+
+
+def archive_kind(path):
+    name = path.lower()
+    if any(name.endswith(ext) for ext in TAR_EXTENSIONS):
+        return "tar"
+    if os.path.splitext(name)[1] in ZIP_EXTENSIONS:
+        return "zip"
+    return None
+
+
+def _read(f, n, throttle):
+    # Streams from archives may return short reads; loop until n bytes or end of data
+    parts, wanted = [], n
+    while wanted:
+        started = time.monotonic()
+        data = f.read(wanted)
+        if not data:
+            break
+        if throttle is not None:
+            throttle.read(len(data), time.monotonic() - started)
+        parts.append(data)
+        wanted -= len(data)
+    return b"".join(parts)
+
+
+class LooseIndex:
+    """
+    Loose files by size, with their CRC32 worked out on first use and kept,
+    so a file shared by several archive members is read once.
+    """
+
+    def __init__(self):
+        self.by_size = {}
+        self.crcs = {}
+        self.lock = threading.Lock()
+
+    def add(self, path, size):
+        if size >= MIN_MEMBER_SIZE:
+            self.by_size.setdefault(size, []).append(path)
+
+    def crc(self, path):
+        with self.lock:
+            if path in self.crcs:
+                return self.crcs[path]
+        value = None
+        try:
+            throttle = current_throttle()
+            with open(path, "rb") as f:
+                value = 0
+                while True:
+                    chunk = _read(f, CHUNK, throttle)
+                    if not chunk:
+                        break
+                    value = zlib.crc32(chunk, value)
+        except OSError as ex:
+            logger.warning("Cannot read %s: %s", path, ex)
+        with self.lock:
+            self.crcs[path] = value
+        return value
+
+    def candidates(self, size, crc=None):
+        paths = self.by_size.get(size, ())
+        if crc is not None:
+            paths = [p for p in paths if self.crc(p) == crc]
+        return paths[:MAX_CANDIDATES]
+
+
+def confirm_member(stream, candidates):
+    """
+    Compares an archive member, read once from stream, against loose
+    candidate files of the same size. Returns the first identical path or None.
+    """
+    throttle = current_throttle()
+    live = []
+    for path in candidates:
+        try:
+            live.append((path, open(path, "rb")))
+        except OSError as ex:
+            logger.warning("Cannot read %s: %s", path, ex)
+    try:
+        while live:
+            chunk = _read(stream, CHUNK, throttle)
+            still = []
+            for path, f in live:
+                if _read(f, len(chunk) or 1, throttle) == chunk:
+                    still.append((path, f))
+                else:
+                    f.close()
+            live = still
+            if not chunk:
+                # Both ended together: identical
+                return live[0][0] if live else None
+        return None
+    finally:
+        for _, f in live:
+            f.close()
+
+
+class ArchiveResult:
+    """
+    What one archive holds relative to the loose files: member count and
+    {member name: identical loose path}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.members = 0
+        self.matched = {}
+        self.error = None
+
+    @property
+    def redundant(self):
+        return self.error is None and self.members > 0 and len(self.matched) == self.members
+
+
+def index_zip(path, loose, stop_event=None):
+    """
+    Only the central directory is read to list members; a member is
+    decompressed only when a loose file has its size and CRC32.
+    """
+    result = ArchiveResult(path)
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if stop_event is not None and stop_event.is_set():
+                break
+            if info.is_dir() or info.file_size < MIN_MEMBER_SIZE:
+                continue
+            result.members += 1
+            candidates = loose.candidates(info.file_size, info.CRC)
+            if candidates:
+                with archive.open(info) as member:
+                    match = confirm_member(member, candidates)
+                if match is not None:
+                    result.matched[info.filename] = match
+    return result
+
+
+def index_tar(path, loose, stop_event=None):
+    """
+    Tar has no central directory or checksums: headers are read as the
+    archive streams past, and a member whose size matches a loose file is
+    compared while it goes by. Members without candidates are skipped unread.
+    """
+    result = ArchiveResult(path)
+    with tarfile.open(path, "r|*") as archive:
+        for info in archive:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if not info.isfile() or info.size < MIN_MEMBER_SIZE:
+                continue
+            result.members += 1
+            candidates = loose.candidates(info.size)
+            if candidates:
+                match = confirm_member(archive.extractfile(info), candidates)
+                if match is not None:
+                    result.matched[info.name] = match
+    return result
+
+
+def index_archive(path, loose, stop_event=None):
+    try:
+        if archive_kind(path) == "tar":
+            return index_tar(path, loose, stop_event)
+        return index_zip(path, loose, stop_event)
+    except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError, RuntimeError) as ex:
+        # RuntimeError: encrypted zip members
+        result = ArchiveResult(path)
+        result.error = str(ex)
+        return result
+
+
+def find_redundant_archives(roots, skip_dirs=(), threads=DEFAULT_ARCHIVE_THREADS, stop_event=None):
+    """
+    Matches every zip/tar archive below roots against the loose files there.
+    Returns ([ArchiveResult], {folder: number of loose files directly in it}).
+    """
+    loose = LooseIndex()
+    archives, folder_files = [], {}
+    for kind, path, size in scan(roots, skip_dirs=skip_dirs, stop_event=stop_event):
+        if kind != ENTRY_FILE:
+            continue
+        if archive_kind(path) is not None:
+            archives.append(path)
+        else:
+            loose.add(path, size)
+            folder = os.path.dirname(path)
+            folder_files[folder] = folder_files.get(folder, 0) + 1
+    logger.info("Indexing %d archives against %d loose sizes", len(archives), len(loose.by_size))
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda p: index_archive(p, loose, stop_event), archives))
+    return results, folder_files
+
+
+def covered_folders(results, folder_files):
+    """
+    [(folder, archive path)] for loose folders whose every file (not counting
+    subfolders) has an identical copy inside a single archive.
+    """
+    covered = []
+    for result in results:
+        per_folder = {}
+        for loose_path in set(result.matched.values()):
+            folder = os.path.dirname(loose_path)
+            per_folder[folder] = per_folder.get(folder, 0) + 1
+        covered.extend((folder, result.path) for folder, count in per_folder.items()
+                       if count == folder_files.get(folder))
+    return sorted(covered)
+
+
+def format_archive_report(results, folder_files):
+    lines = []
+    redundant = [r for r in results if r.redundant]
+    if redundant:
+        lines.append("Archives whose every file is also stored loose:")
+        for result in sorted(redundant, key=lambda r: r.path):
+            lines.append(f"    {result.path} ({result.members} files)")
+        lines.append("")
+    covered = covered_folders(results, folder_files)
+    if covered:
+        lines.append("Folders whose every file is also inside an archive:")
+        for folder, archive in covered:
+            lines.append(f"    {folder} => {archive}")
+        lines.append("")
+    failed = [r for r in results if r.error is not None]
+    if failed:
+        lines.append("Archives that could not be read:")
+        for result in sorted(failed, key=lambda r: r.path):
+            lines.append(f"    {result.path}: {result.error}")
+        lines.append("")
+    return "\n".join(lines)
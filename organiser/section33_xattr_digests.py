@@ -0,0 +1,86 @@
+import os, errno, logging
+
+logger = logging.getLogger(__name__)
+
+# Linux only; elsewhere tagging is simply off
+XATTR_AVAILABLE = hasattr(os, "getxattr") and hasattr(os, "setxattr")
+XATTR_PREFIX = "user.filewizard."
+# Errors meaning the filesystem itself has no user xattrs, as opposed to this one file refusing
+_UNSUPPORTED = {errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS}
+# Year stored for files whose dates were read and found missing, as opposed to never read
+UNDATED = 0
+# Devices found not to support user xattrs, so they are not asked again in this process
+_unsupported_devices = set()
+
+
+def attribute_name(algo):
+    return XATTR_PREFIX + algo.lower()
+
+
+def _usable(st):
+    return XATTR_AVAILABLE and st.st_dev not in _unsupported_devices
+
+
+def _failed(path, st, ex):
+    if ex.errno in _UNSUPPORTED:
+        logger.debug("No user xattrs on device %s (%s); not tagging there", st.st_dev, path)
+        _unsupported_devices.add(st.st_dev)
+
+
+def read_digest(path, algo, st):
+    """
+    (digest, year) tagged on path for algo, or None. A tag is only trusted while
+    the size and mtime it was taken at still match st. year is the capture year
+    stored with the digest, UNDATED when the file was looked at and carries
+    none, or None when the tag was written without reading dates.
+    """
+    if not _usable(st):
+        return None
+    try:
+        value = os.getxattr(path, attribute_name(algo)).decode("ascii")
+        size, mtime_ns, digest, *year = value.split(" ")
+        year = int(year[0]) if year else None
+    except OSError as ex:
+        _failed(path, st, ex)
+        return None
+    except (ValueError, IndexError):
+        return None
+    if int(size) != st.st_size or int(mtime_ns) != st.st_mtime_ns:
+        return None
+    return digest, year
+
+
+def write_digest(path, algo, digest, st, year=None):
+    """
+    Tags path with digest and capture year (see read_digest), stamped with the
+    size and mtime in st. Files that cannot be tagged (read-only, unsupported
+    filesystem) are left alone. Returns True when the tag was written.
+    """
+    if not _usable(st):
+        return False
+    value = f"{st.st_size} {st.st_mtime_ns} {digest}" + (f" {year}" if year is not None else "")
+    try:
+        os.setxattr(path, attribute_name(algo), value.encode("ascii"))
+        return True
+    except OSError as ex:
+        _failed(path, st, ex)
+        return False
+
+
+def retag(path, algo, digest, size, mtime_ns, year=None):
+    """
+    After a move: tags path with digest and year, taken when the file had size
+    and mtime_ns, unless it already carries the digest, as when the move was a
+    rename that kept the attribute. A file that changed since it was hashed is not tagged.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+        logger.debug("%s changed since it was hashed; not tagging it", path)
+        return False
+    tagged = read_digest(path, algo, st)
+    if tagged is not None and tagged[0] == digest and (year is None or tagged[1] is not None):
+        return True
+    return write_digest(path, algo, digest, st, year)
@@ -0,0 +1,232 @@
+import math, time, random, hashlib, logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# Size buckets kept per size stratum; past this the stratum's sampling rate is halved
+STRATUM_BUDGET = 256
+# Paths kept from one size bucket; larger buckets are judged from a uniform sample of this many
+MAX_BUCKET_FILES = 512
+MAX_LEVEL = 40
+# Bytes read from each end of a sampled file
+PARTIAL_BYTES = 64 * 1024
+DEFAULT_ESTIMATE_THREADS = 16
+# Hashing stops here; buckets not reached count as not sampled
+DEFAULT_ESTIMATE_SECONDS = 10.0
+Z_95 = 1.96
+_MASK = (1 << 64) - 1
+
+
+def _size_hash(size):
+    # splitmix64 finaliser: every file of one size gets the same verdict
+    x = (size + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def partial_digest(path, size):
+    """
+    (digest of size, head and tail, seconds spent opening, seconds spent reading, bytes read).
+    """
+    h = hashlib.blake2b(str(size).encode("ascii"), digest_size=16)
+    started = time.monotonic()
+    with open(path, "rb") as f:
+        opened = time.monotonic()
+        head = f.read(PARTIAL_BYTES)
+        h.update(head)
+        nbytes = len(head)
+        if size > 2 * PARTIAL_BYTES:
+            f.seek(size - PARTIAL_BYTES)
+            tail = f.read(PARTIAL_BYTES)
+        else:
+            tail = f.read()
+        h.update(tail)
+        nbytes += len(tail)
+    return h.digest(), opened - started, time.monotonic() - opened, nbytes
+
+
+class _Stratum:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.level = 0
+        self.buckets = {}  # size -> [file count, [paths]]
+
+    def keeps(self, size):
+        return _size_hash(size) & ((1 << self.level) - 1) == 0
+
+    def add(self, path, size):
+        self.files += 1
+        self.bytes += size
+        if not self.keeps(size):
+            return
+        bucket = self.buckets.get(size)
+        if bucket is None:
+            bucket = self.buckets[size] = [0, []]
+            while len(self.buckets) > STRATUM_BUDGET and self.level < MAX_LEVEL:
+                self.level += 1
+                self.buckets = {s: b for s, b in self.buckets.items() if self.keeps(s)}
+            if size not in self.buckets:
+                return
+        bucket[0] += 1
+        # Empty files are all alike; no need to remember them
+        if size == 0:
+            return
+        if len(bucket[1]) < MAX_BUCKET_FILES:
+            bucket[1].append(path)
+        else:
+            slot = random.randrange(bucket[0])
+            if slot < MAX_BUCKET_FILES:
+                bucket[1][slot] = path
+
+
+class DuplicateEstimate:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.dup_files = 0.0
+        self.dup_files_ci = 0.0
+        self.dup_bytes = 0.0
+        self.dup_bytes_ci = 0.0
+        self.sampled_files = 0
+        self.seconds = 0.0
+        self.open_seconds = None  # Mean time to open a file
+        self.read_rate = None  # Bytes per second while reading
+
+    def hashing_seconds(self, parallelism=1):
+        """
+        Expected time to hash every file once, from the measured open latency and read rate.
+        """
+        if self.open_seconds is None or not self.read_rate:
+            return None
+        return (self.files * self.open_seconds + self.bytes / self.read_rate) / max(parallelism, 1)
+
+
+class DuplicateSampler:
+    """
+    Fed every (path, size) during the source scan, it keeps a bounded sample
+    of whole size buckets: files are split into strata by the power of two
+    of their size, and within a stratum a size is kept or dropped by its hash,
+    at a rate halved whenever the stratum's sample outgrows STRATUM_BUDGET.
+    Only files of equal size can be duplicates, so hashing the kept buckets
+    and scaling by the sampling rate gives unbiased totals.
+    """
+
+    def __init__(self, skip_size=0):
+        self.skip_size = skip_size
+        self.strata = {}
+
+    def add(self, path, size):
+        if self.skip_size > 0 and size > self.skip_size:
+            return
+        stratum = self.strata.get(size.bit_length())
+        if stratum is None:
+            stratum = self.strata[size.bit_length()] = _Stratum()
+        stratum.add(path, size)
+
+    def _hash_bucket(self, size, paths, deadline):
+        # Random order, so a bucket cut off by the deadline is still a uniform sample of it
+        results = []
+        for path in random.sample(paths, len(paths)):
+            if time.monotonic() >= deadline:
+                break
+            try:
+                results.append(partial_digest(path, size))
+            except OSError as ex:
+                logger.debug("Estimator could not read %s: %s", path, ex)
+        return results
+
+    def estimate(self, threads=DEFAULT_ESTIMATE_THREADS, seconds=DEFAULT_ESTIMATE_SECONDS):
+        started = time.monotonic()
+        result = DuplicateEstimate()
+        work = []
+        for key, stratum in self.strata.items():
+            result.files += stratum.files
+            result.bytes += stratum.bytes
+            work.extend((key, size, bucket) for size, bucket in stratum.buckets.items() if bucket[0] > 1)
+        # Random order, so buckets cut off by the deadline are a random subset
+        random.shuffle(work)
+        deadline = started + max(seconds, 0.0)
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [(executor.submit(self._hash_bucket, size, bucket[1], deadline) if size > 0 else None,
+                        key, size, bucket)
+                       for key, size, bucket in work]
+            _, pending = wait([f for f, _, _, _ in futures if f is not None], timeout=max(seconds, 0.0))
+            for future in pending:
+                future.cancel()
+        done = [(key, size, bucket, future.result() if future is not None else [])
+                for future, key, size, bucket in futures if future is None or not future.cancelled()]
+        # A bucket stopped before two of its files were hashed says nothing about pairs
+        done = [d for d in done if d[1] == 0 or len(d[3]) > 1 or len(d[3]) == len(d[2][1])]
+
+        # Per stratum, the share of its sampled buckets that were hashed in time
+        reached = {}
+        for key, _, _ in work:
+            reached.setdefault(key, [0, 0])[0] += 1
+        for key, _, _, _ in done:
+            reached[key][1] += 1
+
+        open_time = read_time = read_bytes = 0.0
+        var_files = var_bytes = 0.0
+        for key, size, bucket, hashed in done:
+            count = bucket[0]
+            # Spread from sampling inside the bucket, on top of the bucket's own inclusion
+            inner = 0.0
+            if size == 0:
+                dup = count - 1
+            elif hashed:
+                copies = {}
+                for digest, _, _, _ in hashed:
+                    copies[digest] = copies.get(digest, 0) + 1
+                k = len(hashed)
+                dup = k - len(copies)
+                if k < count:
+                    # Sampled from a bigger bucket: equal pairs grow with the square of the
+                    # sample, and with copies mostly in twos each pair is one duplicate
+                    pairs = sum(c * (c - 1) // 2 for c in copies.values())
+                    scale = count * (count - 1) / (k * (k - 1)) if k > 1 else 0
+                    dup = min(pairs * scale, count - 1)
+                    # Equal pairs found are roughly Poisson
+                    inner = max(pairs, 1) * scale * scale
+                result.sampled_files += len(hashed)
+                for _, opening, reading, nbytes in hashed:
+                    open_time += opening
+                    read_time += reading
+                    read_bytes += nbytes
+            else:
+                continue
+            total, hit = reached[key]
+            p = 2.0 ** -self.strata[key].level * hit / total
+            result.dup_files += dup / p
+            result.dup_bytes += dup * size / p
+            var_files += ((1 - p) * dup * dup + inner) / (p * p)
+            var_bytes += ((1 - p) * dup * dup + inner) * size * size / (p * p)
+        result.dup_files_ci = Z_95 * math.sqrt(var_files)
+        result.dup_bytes_ci = Z_95 * math.sqrt(var_bytes)
+        if result.sampled_files:
+            result.open_seconds = open_time / result.sampled_files
+            result.read_rate = read_bytes / read_time if read_time > 0 else None
+        result.seconds = time.monotonic() - started
+        return result
+
+
+def format_duration(seconds):
+    minutes = int(round(seconds / 60))
+    if minutes < 1:
+        return "under a minute"
+    if minutes < 60:
+        return f"about {minutes} min"
+    return f"about {minutes // 60} h {minutes % 60} min"
+
+
+def format_estimate(estimate, parallelism=1):
+    gb = 1024 * 1024 * 1024
+    lines = [f"Estimated duplicates: {estimate.dup_files:,.0f} files (± {estimate.dup_files_ci:,.0f}), "
+             f"{estimate.dup_bytes / gb:.2f} GB (± {estimate.dup_bytes_ci / gb:.2f} GB), 95% confidence.",
+             f"From {estimate.sampled_files} files sampled in {estimate.seconds:.1f} s."]
+    eta = estimate.hashing_seconds(parallelism)
+    if eta is not None:
+        rate = f" at {estimate.read_rate / (1024 * 1024):.0f} MB/s measured" if estimate.read_rate else ""
+        lines.append(f"Expected hashing time: {format_duration(eta)}{rate}.")
+    return "\n".join(lines)
@@ -0,0 +1,402 @@
+import os, sys, glob, mmap, heapq, struct, hashlib, argparse, logging
+from datetime import datetime
+from organiser.section3_helpers import ensure_dir_exists, state_dir
+from organiser.section18_external_sort import PathTable, DEFAULT_RUN_RECORDS, MERGE_BUFFER
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_SOURCES = "sources"
+SNAPSHOT_ORGANISED = "organised"
+DEFAULT_KEEP = 10
+_MAGIC = b"FWSNAP1\n"
+# Magic, digest size, hash algorithm (NUL padded)
+_HEADER = struct.Struct(">8sB15s")
+# Path id and path table offset of a file that left the tree; only lives in a writer's runs
+_REMOVAL = struct.Struct(">QQ")
+
+ADDED, REMOVED, MODIFIED, MOVED = "added", "removed", "modified", "moved"
+
+
+def path_id(filepath):
+    # Stable across runs, so the same path lines up in any two snapshots
+    return int.from_bytes(hashlib.blake2b(os.fsencode(filepath), digest_size=8).digest(), "big")
+
+
+def snapshot_record(digest_size):
+    # Big-endian path id first, so sorting the raw record bytes sorts by path id
+    return struct.Struct(f">QQqQQ{digest_size}s")
+
+
+class SnapshotEntry:
+    __slots__ = ("path", "size", "mtime_ns", "inode", "digest")
+
+    def __init__(self, path, size, mtime_ns, inode, digest):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.digest = digest  # hex, or None when the file was not hashed
+
+    def same_stat(self, st):
+        return (self.size, self.mtime_ns, self.inode) == (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def snapshot_dir(organised_folder):
+    return os.path.join(state_dir(organised_folder), SNAPSHOT_DIR)
+
+
+def list_snapshots(organised_folder, label):
+    """
+    Snapshot files for label, oldest first.
+    """
+    return sorted(glob.glob(os.path.join(snapshot_dir(organised_folder), f"{label}-*.snap")))
+
+
+def latest_snapshot(organised_folder, label):
+    snapshots = list_snapshots(organised_folder, label)
+    return snapshots[-1] if snapshots else None
+
+
+class SnapshotWriter:
+    """
+    Builds a snapshot file (records sorted by path id) plus its path table
+    with bounded memory: records are sorted in runs of run_records, spilled,
+    and merged into place when the snapshot is finished. A path added more
+    than once keeps its last record, and one removed after it was last added
+    is left out, so the snapshot shows the tree as the run left it.
+    """
+
+    def __init__(self, organised_folder, label, algo, digest_size, run_records=DEFAULT_RUN_RECORDS):
+        self.organised_folder = organised_folder
+        self.directory = ensure_dir_exists(snapshot_dir(organised_folder))
+        self.label = label
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.path = os.path.join(self.directory, f"{label}-{stamp}.snap")
+        self.algo = algo.lower()
+        self.digest_size = digest_size
+        self.record = snapshot_record(digest_size)
+        self.run_records = run_records
+        self.paths = PathTable(self.path[:-len(".snap")] + ".paths")
+        self.runs = []
+        self.removal_runs = []
+        self.count = 0
+        self._buffer = []
+        self._removed = []
+        self._empty_digest = bytes(digest_size)
+
+    def add(self, filepath, hexdigest, st=None):
+        """
+        Records filepath with its digest (or None); st is its stat result, taken here when not given.
+        """
+        if st is None:
+            try:
+                st = os.stat(filepath)
+            except OSError as ex:
+                logger.debug("Not in snapshot, cannot stat %s: %s", filepath, ex)
+                return
+        digest = bytes.fromhex(hexdigest) if hexdigest else self._empty_digest
+        self._buffer.append(self.record.pack(path_id(filepath), st.st_size, st.st_mtime_ns, st.st_ino,
+                                             self.paths.append(filepath), digest))
+        self.count += 1
+        if len(self._buffer) >= self.run_records:
+            self._spill()
+
+    def remove(self, filepath):
+        """
+        Records that filepath left the tree; an earlier add() of it is dropped.
+        """
+        self._removed.append(_REMOVAL.pack(path_id(filepath), self.paths.append(filepath)))
+        if len(self._removed) >= self.run_records:
+            self._spill_removed()
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        run_path = f"{self.path}.run{len(self.runs)}"
+        with open(run_path, "wb") as f:
+            f.write(b"".join(self._buffer))
+        self.runs.append(run_path)
+        self._buffer = []
+
+    def _spill_removed(self):
+        if not self._removed:
+            return
+        self._removed.sort()
+        run_path = f"{self.path}.removed{len(self.removal_runs)}"
+        with open(run_path, "wb") as f:
+            f.write(b"".join(self._removed))
+        self.removal_runs.append(run_path)
+        self._removed = []
+
+    def _latest(self, records, removals):
+        """
+        Sorted raw records left of one path id's records and removals: the
+        last added per path, unless it was removed after that.
+        """
+        latest = {}
+        for raw in records:
+            offset = self.record.unpack(raw)[4]
+            path = self.paths.get(offset)
+            if path not in latest or latest[path][0] < offset:
+                latest[path] = (offset, raw)
+        for offset in removals:
+            path = self.paths.get(offset)
+            if path in latest and latest[path][0] < offset:
+                del latest[path]
+        return sorted(raw for _, raw in latest.values())
+
+    def _merged(self):
+        """
+        Yields the final records in path-id order. Only the records and
+        removals of one path id are held at a time.
+        """
+        records = heapq.merge(*(iter_records(run, self.record.size) for run in self.runs))
+        removals = heapq.merge(*(iter_records(run, _REMOVAL.size) for run in self.removal_runs))
+        removal = next(removals, None)
+        raw = next(records, None)
+        while raw is not None:
+            key = raw[:8]
+            group = [raw]
+            raw = next(records, None)
+            while raw is not None and raw[:8] == key:
+                group.append(raw)
+                raw = next(records, None)
+            while removal is not None and removal[:8] < key:
+                removal = next(removals, None)
+            removed = []
+            while removal is not None and removal[:8] == key:
+                removed.append(_REMOVAL.unpack(removal)[1])
+                removal = next(removals, None)
+            if len(group) == 1 and not removed:
+                yield group[0]
+            else:
+                yield from self._latest(group, removed)
+
+    def finish(self, keep=DEFAULT_KEEP):
+        """
+        Writes the snapshot and drops all but the newest keep snapshots of this label (0 keeps all).
+        """
+        self._spill()
+        self._spill_removed()
+        self.paths.flush()
+        partial = self.path + ".part"
+        self.count = 0
+        with open(partial, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.digest_size, self.algo.encode("ascii")))
+            pending = []
+            for raw in self._merged():
+                pending.append(raw)
+                if len(pending) >= 65536:
+                    f.write(b"".join(pending))
+                    self.count += len(pending)
+                    pending = []
+            f.write(b"".join(pending))
+            self.count += len(pending)
+        self.paths.close()
+        for run in self.runs + self.removal_runs:
+            os.remove(run)
+        os.replace(partial, self.path)
+        logger.info("Snapshot of %d files written to %s", self.count, self.path)
+        for old in list_snapshots(self.organised_folder, self.label)[:-keep or None]:
+            remove_snapshot(old)
+        return self.path
+
+    def abandon(self):
+        self.paths.close()
+        for path in self.runs + self.removal_runs + [self.paths.path]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def remove_snapshot(snap_path):
+    for path in (snap_path, snap_path[:-len(".snap")] + ".paths"):
+        try:
+            os.remove(path)
+        except OSError as ex:
+            logger.warning("Could not remove %s: %s", path, ex)
+
+
+def iter_records(path, record_size, offset=0):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            block = f.read(MERGE_BUFFER - MERGE_BUFFER % record_size)
+            if not block:
+                return
+            for start in range(0, len(block), record_size):
+                yield block[start:start + record_size]
+
+
+class Snapshot:
+    """
+    A finished snapshot, read in path-id order or searched by path. The
+    record file is memory-mapped, so lookups page in only what they touch.
+    """
+
+    def __init__(self, snap_path):
+        self.path = snap_path
+        self._file = open(snap_path, "rb")
+        magic, self.digest_size, algo = _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != _MAGIC:
+            self._file.close()
+            raise ValueError(f"{snap_path} is not a snapshot")
+        self.algo = algo.rstrip(b"\0").decode("ascii")
+        self.record = snapshot_record(self.digest_size)
+        self.count = (os.path.getsize(snap_path) - _HEADER.size) // self.record.size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+        self.paths = PathTable(snap_path[:-len(".snap")] + ".paths")
+        self._empty_digest = bytes(self.digest_size)
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, raw):
+        _, size, mtime_ns, inode, path_offset, digest = self.record.unpack(raw)
+        return SnapshotEntry(self.paths.get(path_offset), size, mtime_ns, inode,
+                             digest.hex() if digest != self._empty_digest else None)
+
+    def iter_raw(self):
+        """
+        Yields (path id, raw record) in path-id order.
+        """
+        for raw in iter_records(self.path, self.record.size, _HEADER.size):
+            yield int.from_bytes(raw[:8], "big"), raw
+
+    def __iter__(self):
+        for _, raw in self.iter_raw():
+            yield self._entry(raw)
+
+    def lookup(self, filepath):
+        """
+        The SnapshotEntry recorded for filepath, or None.
+        """
+        if not self.count:
+            return None
+        target = path_id(filepath).to_bytes(8, "big")
+        size = self.record.size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = _HEADER.size + mid * size
+            if self._map[offset:offset + 8] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        # Equal ids are adjacent; compare the stored path in case two paths share an id
+        while lo < self.count:
+            offset = _HEADER.size + lo * size
+            if self._map[offset:offset + 8] != target:
+                return None
+            entry = self._entry(self._map[offset:offset + size])
+            if entry.path == filepath:
+                return entry
+            lo += 1
+        return None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+        self.paths.close()
+
+
+def _changed(old, new, same_algo):
+    if old.size != new.size:
+        return True
+    if same_algo and old.digest and new.digest:
+        return old.digest != new.digest
+    return old.mtime_ns != new.mtime_ns
+
+
+def diff_snapshots(old, new):
+    """
+    Streams two snapshots side by side in path-id order and yields
+    (kind, old entry, new entry) with kind one of added, removed, modified or
+    moved. A path that disappeared is paired with one that appeared when they
+    share an inode (same size and mtime) or, failing that, a digest; only
+    those unmatched entries are held in memory, so the work is linear in the
+    two snapshots and memory in the number of changes.
+    """
+    same_algo = old.algo == new.algo
+    removed, added = [], []
+    old_iter, new_iter = old.iter_raw(), new.iter_raw()
+    old_item, new_item = next(old_iter, None), next(new_iter, None)
+    while old_item is not None or new_item is not None:
+        if new_item is None or (old_item is not None and old_item[0] < new_item[0]):
+            removed.append(old._entry(old_item[1]))
+            old_item = next(old_iter, None)
+        elif old_item is None or new_item[0] < old_item[0]:
+            added.append(new._entry(new_item[1]))
+            new_item = next(new_iter, None)
+        else:
+            old_entry, new_entry = old._entry(old_item[1]), new._entry(new_item[1])
+            if old_entry.path != new_entry.path:
+                # Two paths sharing an id; treat them as unrelated
+                removed.append(old_entry)
+                added.append(new_entry)
+            elif _changed(old_entry, new_entry, same_algo):
+                yield MODIFIED, old_entry, new_entry
+            old_item, new_item = next(old_iter, None), next(new_iter, None)
+
+    by_inode, by_digest = {}, {}
+    for i, entry in enumerate(removed):
+        by_inode.setdefault((entry.inode, entry.size, entry.mtime_ns), []).append(i)
+        if same_algo and entry.digest:
+            by_digest.setdefault(entry.digest, []).append(i)
+    matched = set()
+
+    def take(candidates):
+        while candidates:
+            i = candidates.pop()
+            if i not in matched:
+                matched.add(i)
+                return removed[i]
+        return None
+
+    for entry in added:
+        source = take(by_inode.get((entry.inode, entry.size, entry.mtime_ns), []))
+        if source is None and same_algo and entry.digest:
+            source = take(by_digest.get(entry.digest, []))
+        if source is not None:
+            yield MOVED, source, entry
+        else:
+            yield ADDED, None, entry
+    for i, entry in enumerate(removed):
+        if i not in matched:
+            yield REMOVED, entry, None
+
+
+def format_change(kind, old, new):
+    if kind == ADDED:
+        return f"added     {new.path}"
+    if kind == REMOVED:
+        return f"removed   {old.path}"
+    if kind == MOVED:
+        return f"moved     {old.path} => {new.path}"
+    return f"modified  {new.path}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show how a tree changed between two organiser snapshots.")
+    parser.add_argument("old", help="Older .snap file")
+    parser.add_argument("new", help="Newer .snap file")
+    args = parser.parse_args(argv)
+    old, new = Snapshot(args.old), Snapshot(args.new)
+    counts = {}
+    try:
+        for kind, old_entry, new_entry in diff_snapshots(old, new):
+            counts[kind] = counts.get(kind, 0) + 1
+            print(format_change(kind, old_entry, new_entry))
+    finally:
+        old.close()
+        new.close()
+    print(", ".join(f"{counts.get(kind, 0)} {kind}" for kind in (ADDED, REMOVED, MODIFIED, MOVED)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+from PyQt5.QtWidgets import QDialog, QFormLayout, QSpinBox, QCheckBox, QDialogButtonBox, QLabel
+from organiser.section2_configuration import CONFIG, save_config
+from organiser.section25_throttle import MB
+
+
+class ThrottleDialog(QDialog):
+    """
+    Edits the throttle settings; with a run in progress they apply to it immediately.
+    """
+
+    def __init__(self, throttle=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Throttling")
+        self.throttle = throttle
+        layout = QFormLayout()
+
+        self.read_spin = QSpinBox()
+        self.read_spin.setRange(0, 100000)
+        self.read_spin.setSuffix(" MB/s")
+        self.read_spin.setSpecialValueText("Unlimited")
+        self.read_spin.setValue(CONFIG.get("throttle_read_mb_s", 0))
+        layout.addRow("Read limit:", self.read_spin)
+
+        self.write_spin = QSpinBox()
+        self.write_spin.setRange(0, 100000)
+        self.write_spin.setSuffix(" MB/s")
+        self.write_spin.setSpecialValueText("Unlimited")
+        self.write_spin.setValue(CONFIG.get("throttle_write_mb_s", 0))
+        layout.addRow("Write limit:", self.write_spin)
+
+        self.latency_spin = QSpinBox()
+        self.latency_spin.setRange(0, 10000)
+        self.latency_spin.setSuffix(" ms")
+        self.latency_spin.setSpecialValueText("Off")
+        self.latency_spin.setValue(int(CONFIG.get("throttle_latency_ms", 0)))
+        layout.addRow("Back off above read latency:", self.latency_spin)
+
+        self.background_check = QCheckBox("Run workers at background CPU and I/O priority")
+        self.background_check.setChecked(CONFIG.get("background_mode", False))
+        layout.addRow(self.background_check)
+
+        if throttle is not None:
+            layout.addRow(QLabel(f"Current read latency {throttle.average_latency_ms:.1f} ms, "
+                                 f"speed {throttle.scale * 100:.0f}%. "
+                                 "Priority changes apply from the next run."))
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+        self.setLayout(layout)
+
+    def accept(self):
+        CONFIG["throttle_read_mb_s"] = self.read_spin.value()
+        CONFIG["throttle_write_mb_s"] = self.write_spin.value()
+        CONFIG["throttle_latency_ms"] = self.latency_spin.value()
+        CONFIG["background_mode"] = self.background_check.isChecked()
+        save_config(CONFIG)
+        if self.throttle is not None:
+            self.throttle.set_limits(self.read_spin.value() * MB, self.write_spin.value() * MB,
+                                     self.latency_spin.value())
+        super().accept()
@@ -0,0 +1,214 @@
+import os, stat, errno, logging, multiprocessing
+from functools import partial
+from organiser.section1_logging import init_worker_logging, worker_logging_args
+from organiser.section2_configuration import CONFIG
+from organiser.section24_scanner import scan_files
+from organiser.section4_hashing import worker_hash_file, verify_identical
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# ioctl number of FICLONE (linux/fs.h): share src's extents with dest, copy-on-write
+FICLONE = 0x40049409
+MODE_AUTO = "auto"
+MODE_REFLINK = "reflink"
+MODE_HARDLINK = "hardlink"
+# errno values meaning "this filesystem cannot reflink", where auto mode falls back to a hardlink
+_NO_REFLINK = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.ENOSYS}
+
+
+def _stat_key(st):
+    # What must still hold at apply time for the scan's verdict to stand
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class LinkPlan:
+    """
+    Dry-run result: groups of verified identical files on one filesystem,
+    each with the copy that stays and the copies to be replaced by links.
+    """
+
+    def __init__(self):
+        self.groups = []  # [(keep, [duplicate, ...], size)]
+        self.stats = {}  # path -> (size, mtime_ns, inode) seen by the scan, for every path in groups
+        self.reclaimable = 0
+        self.already_linked = 0
+        self.errors = []  # [(path, message)]
+
+    def duplicate_count(self):
+        return sum(len(dups) for _, dups, _ in self.groups)
+
+    def report(self):
+        lines = [f"{len(self.groups)} groups, {self.duplicate_count()} duplicate files, "
+                 f"{self.reclaimable / (1024 * 1024):.2f} MB reclaimable"]
+        if self.already_linked:
+            lines.append(f"{self.already_linked} files are already links to a kept copy")
+        for keep, dups, size in self.groups:
+            lines.append(f"\n[{size} bytes] keep {keep}")
+            lines.extend(f"    link {dup}" for dup in dups)
+        for path, message in self.errors:
+            lines.append(f"\n[Error] {path}: {message}")
+        return "\n".join(lines)
+
+
+def plan_link_dedup(folders, algo, skip_size, stop_event=None, progress=None):
+    """
+    Finds identical files under folders: same size, then same digest, then the
+    same bytes. Returns a LinkPlan. Only files on the same device are grouped,
+    since links cannot cross filesystems, and files already sharing an inode
+    count as done.
+    """
+    plan = LinkPlan()
+    by_size = {}
+    for path in scan_files(folders):
+        try:
+            st = os.lstat(path)
+        except OSError as ex:
+            plan.errors.append((path, str(ex)))
+            continue
+        if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+            continue
+        by_size.setdefault((st.st_dev, st.st_size), []).append((path, _stat_key(st)))
+    candidates = [(key, files) for key, files in by_size.items() if len(files) > 1]
+    to_hash = [path for _, files in candidates for path, _ in files]
+
+    digests = {}
+    pool = multiprocessing.Pool(
+        processes=(
+            multiprocessing.cpu_count() if CONFIG['multiprocessing_cores'] <= 0
+            else CONFIG['multiprocessing_cores']
+        ),
+        initializer=init_worker_logging,
+        initargs=worker_logging_args()
+    )
+    try:
+        worker = partial(worker_hash_file, algo=algo, skip_size=skip_size)
+        for done, (fpath, fhash, err, _, _) in enumerate(pool.imap_unordered(worker, to_hash, chunksize=16), 1):
+            if stop_event is not None and stop_event.is_set():
+                return plan
+            if err is None:
+                digests[fpath] = fhash
+            elif err[0] != "SkipLargeFile":
+                plan.errors.append((fpath, f"{err[0]}: {err[1]}"))
+            if progress is not None:
+                progress(done, len(to_hash))
+    finally:
+        pool.terminate()
+        pool.join()
+
+    for (_, size), files in candidates:
+        by_digest = {}
+        for path, key in files:
+            if path in digests:
+                by_digest.setdefault(digests[path], []).append((path, key))
+        for members in by_digest.values():
+            if len(members) < 2:
+                continue
+            members.sort()
+            keep, keep_key = members[0]
+            others = [path for path, key in members[1:] if key[2] != keep_key[2]]
+            plan.already_linked += len(members) - 1 - len(others)
+            # One pass over the kept copy checks the whole group
+            dups, errors = verify_identical(keep, others)
+            plan.errors.extend(errors)
+            if dups:
+                plan.groups.append((keep, dups, size))
+                plan.stats.update((path, key) for path, key in members if path == keep or path in dups)
+                plan.reclaimable += size * len(dups)
+    return plan
+
+
+def reflink(src, dest):
+    """
+    Creates dest as a copy-on-write clone of src (btrfs, XFS, bcachefs...).
+    Raises OSError when the filesystem cannot do it.
+    """
+    if not FCNTL_AVAILABLE:
+        raise OSError(errno.ENOSYS, "reflinks are not supported on this platform")
+    with open(src, "rb") as s:
+        fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            fcntl.ioctl(fd, FICLONE, s.fileno())
+        except OSError:
+            os.close(fd)
+            os.unlink(dest)
+            raise
+        os.close(fd)
+
+
+def replace_with_link(keep, duplicate, mode=MODE_AUTO):
+    """
+    Atomically swaps duplicate for a link to keep: the link is made under a
+    temporary name next to duplicate and renamed over it, so the path always
+    holds either the old file or the new link. Returns the mode used.
+    """
+    st = os.stat(duplicate)
+    tmp = os.path.join(os.path.dirname(duplicate), f".{os.path.basename(duplicate)}.fwlink-{os.getpid()}")
+    used = mode
+    if mode in (MODE_AUTO, MODE_REFLINK):
+        try:
+            reflink(keep, tmp)
+            used = MODE_REFLINK
+        except OSError as ex:
+            if mode == MODE_REFLINK or ex.errno not in _NO_REFLINK:
+                raise
+            used = MODE_HARDLINK
+    if used == MODE_HARDLINK:
+        os.link(keep, tmp)
+    try:
+        if used == MODE_REFLINK:
+            # A clone is a new inode; keep the duplicate's own permissions and times
+            os.chmod(tmp, st.st_mode & 0o7777)
+            os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, duplicate)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return used
+
+
+def _unchanged(plan, path):
+    try:
+        return _stat_key(os.lstat(path)) == plan.stats.get(path)
+    except OSError:
+        return False
+
+
+def apply_link_plan(plan, mode=MODE_AUTO, stop_event=None, progress=None):
+    """
+    Replaces every duplicate in plan by a link to its kept copy. The plan may
+    be stale, so each file is checked against the size, mtime and inode the
+    scan saw (metadata only; the bytes were compared when planning) and any
+    that changed is skipped. Returns (linked, bytes reclaimed, [(path, message)]).
+    """
+    linked, reclaimed, errors = 0, 0, []
+    total = plan.duplicate_count()
+    for keep, dups, size in plan.groups:
+        if not _unchanged(plan, keep):
+            errors.extend((dup, f"{keep} changed since the scan, skipped") for dup in dups)
+            continue
+        for dup in dups:
+            if stop_event is not None and stop_event.is_set():
+                return linked, reclaimed, errors
+            if not _unchanged(plan, dup):
+                errors.append((dup, "changed since the scan, skipped"))
+            else:
+                try:
+                    used = replace_with_link(keep, dup, mode)
+                    logger.info("[Dedup %s] %s => %s", used, dup, keep)
+                    linked += 1
+                    reclaimed += size
+                except OSError as ex:
+                    logger.error("Could not link %s to %s: %s", dup, keep, ex)
+                    errors.append((dup, str(ex)))
+            if progress is not None:
+                progress(linked + len(errors), total)
+    return linked, reclaimed, errors
@@ -0,0 +1,131 @@
+import os, time, shutil, sqlite3, filecmp, logging
+from organiser.section3_helpers import ensure_dir_exists, move_with_collision, quarantine_dir, state_dir
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "quarantine.sqlite"
+
+
+class QuarantineStore:
+    """
+    Content-addressed holding area for files set aside as duplicates. Each
+    distinct content is kept once as blobs/<d[:2]>/<d[2:4]>/<digest>.<algo>; a SQLite
+    index in the state folder records every original path that pointed at it,
+    so files can be restored by name and old entries purged by age.
+    """
+
+    def __init__(self, organised_folder, algo):
+        self.root = ensure_dir_exists(quarantine_dir(organised_folder))
+        self.algo = algo.lower()
+        # Used from the processing thread as well as the dialog
+        self.path = os.path.join(ensure_dir_exists(state_dir(organised_folder)), INDEX_NAME)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                          "id INTEGER PRIMARY KEY, digest TEXT NOT NULL, algo TEXT NOT NULL, "
+                          "original_path TEXT NOT NULL, size INTEGER, quarantined_at REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries(digest)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_time ON entries(quarantined_at, id)")
+        self.conn.commit()
+
+    def blob_path(self, digest, algo=None):
+        # Algorithm in the name so xxhash and sha256 digests never collide
+        return os.path.join(self.root, "blobs", digest[:2], digest[2:4], f"{digest}.{algo or self.algo}")
+
+    def put(self, src, digest, size=None):
+        """
+        Moves src into the store. When the content is already held, src is
+        removed instead, after a byte comparison with the stored blob.
+        Returns (blob path, True if a new blob was written), or (None, False)
+        when a different file already holds this digest and src was left alone.
+        """
+        blob = self.blob_path(digest)
+        if size is None:
+            size = os.path.getsize(src)
+        is_new = not os.path.exists(blob)
+        if is_new:
+            ensure_dir_exists(os.path.dirname(blob))
+            shutil.move(src, blob)
+        else:
+            if not filecmp.cmp(src, blob, shallow=False):
+                logger.warning("Digest collision on %s for %s; not quarantined", digest, src)
+                return None, False
+            os.remove(src)
+        self.conn.execute("INSERT INTO entries (digest, algo, original_path, size, quarantined_at) "
+                          "VALUES (?, ?, ?, ?, ?)", (digest, self.algo, src, size, time.time()))
+        self.conn.commit()
+        return blob, is_new
+
+    def entries(self, limit=-1, after=None):
+        """
+        Returns [(id, original_path, size, quarantined_at)], newest first, at
+        most limit of them. after is the last row of the previous page; the
+        page continues from there without re-reading the rows before it.
+        """
+        if after is None:
+            return self.conn.execute("SELECT id, original_path, size, quarantined_at FROM entries "
+                                     "ORDER BY quarantined_at DESC, id DESC LIMIT ?", (limit,)).fetchall()
+        return self.conn.execute("SELECT id, original_path, size, quarantined_at FROM entries "
+                                 "WHERE (quarantined_at, id) < (?, ?) "
+                                 "ORDER BY quarantined_at DESC, id DESC LIMIT ?",
+                                 (after[3], after[0], limit)).fetchall()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _references(self, digest, algo):
+        return self.conn.execute("SELECT COUNT(*) FROM entries WHERE digest=? AND algo=?",
+                                 (digest, algo)).fetchone()[0]
+
+    def restore(self, entry_id, dest=None):
+        """
+        Puts an entry back at its original path (or dest), renaming on collision.
+        The blob is moved out if nothing else refers to it, otherwise copied.
+        Returns the restored path.
+        """
+        row = self.conn.execute("SELECT digest, algo, original_path FROM entries WHERE id=?",
+                                (entry_id,)).fetchone()
+        if row is None:
+            raise KeyError(entry_id)
+        digest, algo, original_path = row
+        blob = self.blob_path(digest, algo)
+        target = dest or original_path
+        ensure_dir_exists(os.path.dirname(target))
+        if self._references(digest, algo) > 1:
+            staged = target + ".fwrestore"
+            shutil.copy2(blob, staged)
+            final_path = move_with_collision(staged, target)
+        else:
+            final_path = move_with_collision(blob, target)
+        self.conn.execute("DELETE FROM entries WHERE id=?", (entry_id,))
+        self.conn.commit()
+        logger.info("[Quarantine => Restored] %s => %s", original_path, final_path)
+        return final_path
+
+    def purge(self, older_than_days):
+        """
+        Forgets entries quarantined more than older_than_days ago and deletes
+        blobs no remaining entry refers to. Returns (entries purged, bytes freed).
+        """
+        cutoff = time.time() - older_than_days * 86400
+        rows = self.conn.execute("SELECT DISTINCT digest, algo FROM entries WHERE quarantined_at < ?",
+                                 (cutoff,)).fetchall()
+        purged = self.conn.execute("DELETE FROM entries WHERE quarantined_at < ?", (cutoff,)).rowcount
+        freed = 0
+        for digest, algo in rows:
+            if self._references(digest, algo):
+                continue
+            blob = self.blob_path(digest, algo)
+            try:
+                freed += os.path.getsize(blob)
+                os.remove(blob)
+            except OSError as ex:
+                logger.error("Could not purge blob %s: %s", blob, ex)
+        self.conn.commit()
+        logger.info("[Quarantine] Purged %d entries, freed %d bytes", purged, freed)
+        return purged, freed
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -1,11 +1,13 @@
 import os, shutil, logging, ctypes
 
+logger = logging.getLogger(__name__)
+
 def ensure_dir_exists(path):
     try:
         os.makedirs(path, exist_ok=True)
-        logging.debug(f"Ensured directory exists: {path}")
+        logger.debug("Ensured directory exists: %s", path)
     except Exception as ex:
-        logging.error(f"Error creating directory {path}: {ex}")
+        logger.error("Error creating directory %s: %s", path, ex)
     return path
 
 def duplicates_dir(organised_folder):
@@ -17,6 +19,18 @@ def categorised_dir(organised_folder):
 def to_be_deleted_dir(organised_folder):
     return os.path.join(organised_folder, "To Be Deleted")
 
+def quarantine_dir(organised_folder):
+    # Content-addressed store inside To Be Deleted; skipped when the organised folder is scanned
+    return os.path.join(to_be_deleted_dir(organised_folder), "Quarantine")
+
+def review_dir(organised_folder):
+    # Files that look alike but are not identical; kept for a person to decide
+    return os.path.join(organised_folder, "Review")
+
+def state_dir(organised_folder):
+    # Indexes and caches kept alongside the organised files; never organised or hashed itself
+    return os.path.join(organised_folder, ".filewizard")
+
 def move_with_collision(src, dest):
     base, ext = os.path.splitext(dest)
     counter = 1
@@ -25,16 +39,20 @@ def move_with_collision(src, dest):
         final_dest = f"{base} ({counter}){ext}"
         counter += 1
     shutil.move(src, final_dest)
-    logging.debug(f"Moved '{src}' -> '{final_dest}'")
+    logger.debug("Moved '%s' -> '%s'", src, final_dest)
+    return final_dest
 
 def is_hidden(filepath):
     FILE_ATTRIBUTE_HIDDEN = 0x02
     FILE_ATTRIBUTE_SYSTEM = 0x04
+    if not hasattr(ctypes, "windll"):
+        # Hidden/system attributes only exist on Windows; don't log an error per file elsewhere
+        return False
     try:
         attrs = ctypes.windll.kernel32.GetFileAttributesW(str(filepath))
         if attrs == -1:
             return False
         return bool(attrs & (FILE_ATTRIBUTE_HIDDEN | FILE_ATTRIBUTE_SYSTEM))
     except Exception as ex:
-        logging.error(f"Error checking hidden attribute for {filepath}: {ex}")
+        logger.error("Error checking hidden attribute for %s: %s", filepath, ex)
         return False
\ No newline at end of file
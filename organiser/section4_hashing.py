@@ -1,5 +1,10 @@
-import hashlib, logging, os
+import hashlib, logging, os, time
 from organiser.section2_configuration import CONFIG
+from organiser.section25_throttle import current_throttle
+from organiser.section29_media_dates import DateSniffer
+from organiser.section33_xattr_digests import read_digest, write_digest, UNDATED
+
+logger = logging.getLogger(__name__)
 
 try:
     import xxhash
@@ -7,30 +12,168 @@ try:
 except ImportError:
     XXHASH_AVAILABLE = False
 
-def worker_hash_file(file_path, algo, skip_size):
+def new_hasher(algo):
+    if algo.lower() == 'xxhash' and XXHASH_AVAILABLE:
+        return xxhash.xxh64()
+    elif algo.lower() == 'md5':
+        return hashlib.md5()
+    elif algo.lower() == 'sha256':
+        return hashlib.sha256()
+    logger.debug("Fallback to sha256.")
+    return hashlib.sha256()
+
+def digest_size(algo):
+    """
+    Length in bytes of the raw digests worker_hash_file produces for algo.
+    """
+    return new_hasher(algo).digest_size
+
+def worker_hash_file(file_path, algo, skip_size, sniff_dates=False):
+    """
+    Returns (file_path, hexdigest, error, size, mtime_ns). The size is passed
+    back so the caller can report byte throughput without another stat, and
+    size and mtime_ns together are the stat the digest belongs to (mtime_ns is
+    None if the file could not be stat'ed). With sniff_dates a sixth item
+    holds the photo/video capture year read on the way, or None.
+    With xattr_digests on, a digest tagged on the file is used when its size
+    and mtime still match, and a freshly computed one is tagged; the capture
+    year is kept in the same tag, so a tagged photo is not opened again.
+    """
+    size = 0
+    mtime_ns = None
+    year = None
     try:
-        size = os.path.getsize(file_path)
+        st = os.stat(file_path)
+        size = st.st_size
+        mtime_ns = st.st_mtime_ns
         if skip_size > 0 and size > skip_size:
-            return (file_path, None, ("SkipLargeFile", f"Size {size} > {skip_size}"))
-        if algo.lower() == 'xxhash' and XXHASH_AVAILABLE:
-            h = xxhash.xxh64()
-        elif algo.lower() == 'md5':
-            h = hashlib.md5()
-        elif algo.lower() == 'sha256':
-            h = hashlib.sha256()
-        else:
-            logging.debug("Fallback to sha256.")
-            h = hashlib.sha256()
-        with open(file_path, 'rb') as f:
-            while True:
-                chunk = f.read(8192)
-                if not chunk:
-                    break
-                h.update(chunk)
-        return (file_path, h.hexdigest(), None)
+            result = (file_path, None, ("SkipLargeFile", f"Size {size} > {skip_size}"), size, mtime_ns)
+            return result + (None,) if sniff_dates else result
+        tagging = CONFIG.get("xattr_digests", False)
+        tagged = read_digest(file_path, algo, st) if tagging else None
+        digest, tagged_year = tagged if tagged is not None else (None, None)
+        h = new_hasher(algo) if digest is None else None
+        throttle = current_throttle()
+        sniffer = DateSniffer.for_path(file_path) if sniff_dates else None
+        if sniffer is not None and tagged_year is not None:
+            # The tag already holds the year; no need to open the file for it
+            sniffer = None
+            year = tagged_year or None
+        if h is not None or sniffer is not None:
+            with open(file_path, 'rb') as f:
+                # With a tagged digest the file is only read as far as the sniffer needs,
+                # seeking over the boxes in between, so a moov at the end costs two short reads
+                while h is not None or not sniffer.done:
+                    if h is None:
+                        offset = sniffer.skip_to()
+                        if offset is not None:
+                            f.seek(offset)
+                            sniffer.seek(offset)
+                    started = time.monotonic()
+                    chunk = f.read(8192)
+                    if not chunk:
+                        break
+                    if throttle is not None:
+                        throttle.read(len(chunk), time.monotonic() - started)
+                    if h is not None:
+                        h.update(chunk)
+                    if sniffer is not None:
+                        sniffer.feed(chunk)
+        if sniffer is not None:
+            year = sniffer.year()
+        if h is not None:
+            digest = h.hexdigest()
+        if tagging and (h is not None or sniffer is not None):
+            after = os.stat(file_path)
+            # Not tagged if the file changed while it was read
+            if (after.st_size, after.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+                write_digest(file_path, algo, digest, st,
+                             (year or UNDATED) if sniffer is not None else tagged_year)
+        result = (file_path, digest, None, size, mtime_ns)
     except Exception as ex:
-        logging.error(f"Error hashing {file_path}: {ex}")
-        return (file_path, None, ("HashError", str(ex)))
+        logger.error("Error hashing %s: %s", file_path, ex)
+        result = (file_path, None, ("HashError", str(ex)), size, mtime_ns)
+    return result + (year,) if sniff_dates else result
+
+# Read size for byte comparison; a multiple of the page size
+VERIFY_CHUNK = 1024 * 1024
+# Candidates compared per pass over the reference, to stay well under the open file limit
+VERIFY_MAX_OPEN = 64
+
+def _read_full(f, view):
+    # Raw reads may return short; keep going until the view is full or EOF
+    total = 0
+    while total < len(view):
+        n = f.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+def verify_identical(reference, candidates, chunk_size=VERIFY_CHUNK):
+    """
+    Byte-for-byte check of candidates against reference. The reference is read
+    once per pass into a memory buffer and every candidate still matching is
+    compared against it chunk by chunk; a candidate drops out at its first
+    difference and the pass ends as soon as none are left.
+    Returns (identical candidates, [(path, error message)]).
+    """
+    identical = []
+    errors = []
+    try:
+        ref_size = os.path.getsize(reference)
+    except OSError as ex:
+        return [], [(reference, str(ex))]
+    sized = []
+    for path in candidates:
+        try:
+            if os.path.getsize(path) == ref_size:
+                sized.append(path)
+        except OSError as ex:
+            errors.append((path, str(ex)))
+
+    ref_buf = memoryview(bytearray(chunk_size))
+    cand_buf = memoryview(bytearray(chunk_size))
+    for start in range(0, len(sized), VERIFY_MAX_OPEN):
+        live = []
+        for path in sized[start:start + VERIFY_MAX_OPEN]:
+            try:
+                live.append((path, open(path, 'rb', buffering=0)))
+            except OSError as ex:
+                errors.append((path, str(ex)))
+        try:
+            with open(reference, 'rb', buffering=0) as ref:
+                while live:
+                    n = _read_full(ref, ref_buf)
+                    still = []
+                    for path, f in live:
+                        if _read_full(f, cand_buf) == n and cand_buf[:n] == ref_buf[:n]:
+                            still.append((path, f))
+                        else:
+                            f.close()
+                    live = still
+                    if n < chunk_size:
+                        break
+        except OSError as ex:
+            logger.error("Error verifying against %s: %s", reference, ex)
+            errors.extend((path, str(ex)) for path, _ in live)
+            for _, f in live:
+                f.close()
+            live = []
+        for path, f in live:
+            f.close()
+            identical.append(path)
+    return identical, errors
+
+def unverified_paths(reference, candidates, errors):
+    """
+    Candidates verify_identical could neither confirm nor rule out, given the
+    errors it returned: all of them when the reference failed, else those that failed.
+    """
+    failed = {path for path, _ in errors}
+    if reference in failed:
+        return set(candidates)
+    return failed.intersection(candidates)
 
 def select_best_file(file_group):
     if not file_group:
@@ -54,7 +197,7 @@ def select_best_file(file_group):
                     best = f
                     best_size = size
         except Exception as ex:
-            logging.error(f"Error selecting best file for {f}: {ex}")
+            logger.error("Error selecting best file for %s: %s", f, ex)
     return best
 
 def compare_file_size(file1, file2):
@@ -63,5 +206,5 @@ def compare_file_size(file1, file2):
         size2 = os.path.getsize(file2)
         return size1 == size2
     except Exception as e:
-        logging.error(f"Error getting file size: {e}")
+        logger.error("Error getting file size: %s", e)
         return False
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os, shutil, logging
 from organiser.section3_helpers import is_hidden, ensure_dir_exists, to_be_deleted_dir
 
+logger = logging.getLogger(__name__)
+
 def is_folder_transitively_empty(folder):
     """
     Checks if a folder is transitively empty, meaning it contains no files
@@ -16,7 +18,7 @@ def is_folder_transitively_empty(folder):
                     return False  # Found a non-empty subfolder
         return True  # No visible files and all subfolders are empty
     except Exception as ex:
-        logging.error(f"Error checking if folder {folder} is empty: {ex}")
+        logger.error("Error checking if folder %s is empty: %s", folder, ex)
         return False
 
 def sweep_empty_folders(target_folder, tbd_empty_folder):
@@ -30,9 +32,9 @@ def sweep_empty_folders(target_folder, tbd_empty_folder):
                 try:
                     shutil.move(d_path, final_path)
                     moved_count += 1
-                    logging.info(f"Swept empty folder: {d_path} -> {final_path}")
+                    logger.info("Swept empty folder: %s -> %s", d_path, final_path)
                 except Exception as ex:
-                    logging.error(f"Error moving empty folder {d_path}: {ex}")
+                    logger.error("Error moving empty folder %s: %s", d_path, ex)
     return moved_count
 
 def move_empty_folders_single_pass(organised_folder, target_folders):
@@ -48,7 +50,7 @@ def move_empty_folders_single_pass(organised_folder, target_folders):
                 if moved > 0:
                     total_moved_count += moved
                     changes = True
-        logging.info(f"Empty folder sweep: moved {total_moved_count} empty folders")
+        logger.info("Empty folder sweep: moved %d empty folders", total_moved_count)
         if not changes:
             break
     return total_moved_count
\ No newline at end of file
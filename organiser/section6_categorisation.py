@@ -2,16 +2,20 @@ import os, logging
 from datetime import datetime
 from organiser.section3_helpers import ensure_dir_exists
 
-def build_final_path_default(base, file_path):
+def build_final_path_default(base, file_path, year=None):
     """
     Builds the destination path based on the file extension and modification year,
-    following the requested hierarchical structure.
+    following the requested hierarchical structure. A capture year read from the
+    file's own metadata, when known, is used instead of the modification year.
     """
 
-    try:
-        year = str(datetime.fromtimestamp(os.path.getmtime(file_path)).year)
-    except Exception:
-        year = "UnknownYear"
+    if year is not None:
+        year = str(year)
+    else:
+        try:
+            year = str(datetime.fromtimestamp(os.path.getmtime(file_path)).year)
+        except Exception:
+            year = "UnknownYear"
 
     _, ext = os.path.splitext(file_path)
     ext = ext.lower().strip()
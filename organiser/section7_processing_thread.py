@@ -1,11 +1,37 @@
-import time, logging, os, multiprocessing, re
+import logging, os, multiprocessing, re
 from functools import partial
 from PyQt5.QtCore import QThread, pyqtSignal
 from organiser.section2_configuration import CONFIG
-from organiser.section3_helpers import ensure_dir_exists, move_with_collision, duplicates_dir, to_be_deleted_dir, categorised_dir
-from organiser.section4_hashing import worker_hash_file, select_best_file, compare_file_size
+from organiser.section3_helpers import ensure_dir_exists, move_with_collision, duplicates_dir, to_be_deleted_dir, categorised_dir, state_dir, quarantine_dir, review_dir
+from organiser.section4_hashing import worker_hash_file, select_best_file, compare_file_size, digest_size, verify_identical, unverified_paths
 from organiser.section5_empty_cleanup import is_folder_transitively_empty, sweep_empty_folders, move_empty_folders_single_pass
 from organiser.section6_categorisation import build_final_path_default
+from organiser.section11_summary import DestinationCounters
+from organiser.section14_telemetry import Telemetry
+from organiser.section18_external_sort import ExternalDigestSorter, SortedDigestIndex, SpillDirectory, DEFAULT_RUN_RECORDS
+from organiser.section19_manifest import Manifest, ManifestDigestLookup
+from organiser.section20_merkle import directory_digests, find_duplicate_directories, DEFAULT_MIN_FILES
+from organiser.section38_quarantine_store import QuarantineStore
+from organiser.section23_io_scheduler import any_rotational, plan_batches, run_batches, DEFAULT_HDD_WORKERS
+from organiser.section24_scanner import scan, scan_files, ENTRY_DIR, ENTRY_FILE, DEFAULT_SCAN_THREADS
+from organiser.section25_throttle import Throttle, install_throttle, init_throttled_worker, throttled_worker_args
+from organiser.section26_remote_hashing import RemoteHashPool
+from organiser.section30_similar_images import (worker_image_hash, group_similar, is_image, ImageHashCache, PIL_AVAILABLE,
+                                                DEFAULT_MAX_DISTANCE)
+from organiser.section31_similar_documents import (worker_document_signature, group_similar_documents, is_text_document,
+                                                   format_document_groups, SignatureCache, DEFAULT_THRESHOLD,
+                                                   NUMPY_AVAILABLE)
+from organiser.section32_archive_index import find_redundant_archives, format_archive_report, DEFAULT_ARCHIVE_THREADS
+from organiser.section33_xattr_digests import retag
+from organiser.section35_snapshots import (Snapshot, SnapshotWriter, latest_snapshot, SNAPSHOT_SOURCES,
+                                           SNAPSHOT_ORGANISED, DEFAULT_KEEP)
+
+logger = logging.getLogger(__name__)
+
+# File count from which hashes are spilled to sorted runs on disk instead of kept in memory
+DEFAULT_OUT_OF_CORE_THRESHOLD = 2000000
+# Files of one digest group organised at a time out of core; bigger groups come in slices
+MAX_GROUP_FILES = 10000
 
 
 class ProcessingThread(QThread):
@@ -15,41 +41,198 @@ class ProcessingThread(QThread):
     and non-duplicates to the 'Categorised' folder.
     """
     done_signal = pyqtSignal(str, int, int)  # (status, duplicates, nonduplicates)
-    progress_signal = pyqtSignal(int, int, float)
-    progress_cat_signal = pyqtSignal(int, int)
-    error_signal = pyqtSignal(str, str, str)
+    progress_signal = pyqtSignal(int, int, float)  # (hashed, total, eta seconds)
+    progress_cat_signal = pyqtSignal(int, int)  # (moved, total)
+    telemetry_signal = pyqtSignal(dict)  # Telemetry snapshot: stage, files, bytes, MB/s, ETA
+    errors_signal = pyqtSignal(list)  # Batched [(stage, filepath, message), ...]
 
-    def __init__(self, filepaths, algo, categories, skip_size, organised_folder, target_folders):
+    def __init__(self, filepaths, algo, categories, skip_size, organised_folder, target_folders, total_bytes=0,
+                 total_files=None):
         super().__init__()
+        # filepaths may be a lazy iterable when total_files is given
         self.filepaths = filepaths
+        self.total_files = len(filepaths) if total_files is None else total_files
         self.algo = algo
         self.categories = categories
         self.skip_size = skip_size
         self.organised_folder = organised_folder
         self.target_folders = target_folders
+        self.total_bytes = total_bytes
         self.stop_event = multiprocessing.Event()
+        self.telemetry = Telemetry()
+        # Live totals for the final summary, seeded by the destination walk and updated per move
+        self.dest_counters = DestinationCounters({
+            "Categorised": categorised_dir(organised_folder),
+            "Duplicates": duplicates_dir(organised_folder),
+            "To Be Deleted": to_be_deleted_dir(organised_folder),
+        })
+        # Size of each file being moved, for the destination counters
+        self.file_sizes = {}
+        # (digest, size, mtime_ns) of each file being moved, as it was hashed, to re-tag it at its destination
+        self.file_digests = {}
+        # Content-addressed store for duplicates headed to To Be Deleted, when enabled
+        self.quarantine = None
+        # Source files byte-checked against their destination match, when a verify stage ran
+        self.verified_duplicates = None
+        # Sources the verify stage could not compare because of a read error
+        self.unverified = set()
+        # Capture years from photo/video metadata, by digest, filled in while hashing
+        self.capture_years = {}
+        # Near-duplicate images headed for review: digest -> (path, digest) of the copy that is kept
+        self.similar_images = {}
+        # Read/write limits and back-off shared with the worker processes; adjustable mid-run
+        self.throttle = Throttle.from_config()
+        # This run's snapshot writers by label, and the last organised snapshot for reusing digests
+        self.snapshots = None
+        self.previous_snapshot = None
+        self.organised_prefix = os.path.join(os.path.normpath(organised_folder), "")
 
         # We'll track duplicates for final summary
         self.duplicate_files_count = 0
         self.nonduplicate_files_count = 0
 
     def run(self):
+        # Destination hashing happens on this thread, so it is throttled here as well
+        install_throttle(self.throttle)
         try:
+            self.open_snapshots()
             self._process_files()
         except Exception as ex:
-            logging.error(f"ProcessingThread error: {ex}")
+            logger.error("ProcessingThread error: %s", ex)
+            self.publish_progress()
             self.done_signal.emit("aborted", 0, 0)
+        finally:
+            install_throttle(None)
+            # Still open only when the run did not finish; a partial snapshot is worse than none
+            self.close_snapshots(completed=False)
 
     def stop(self):
         self.stop_event.set()
 
+    def open_snapshots(self):
+        if not CONFIG.get("snapshots", True):
+            return
+        previous = latest_snapshot(self.organised_folder, SNAPSHOT_ORGANISED)
+        if previous is not None:
+            try:
+                snapshot = Snapshot(previous)
+                if snapshot.algo == self.algo.lower():
+                    self.previous_snapshot = snapshot
+                else:
+                    snapshot.close()
+            except (OSError, ValueError) as ex:
+                logger.warning("Ignoring snapshot %s: %s", previous, ex)
+        run_records = CONFIG.get("out_of_core_run_records", DEFAULT_RUN_RECORDS)
+        self.snapshots = {label: SnapshotWriter(self.organised_folder, label, self.algo, digest_size(self.algo),
+                                                run_records)
+                          for label in (SNAPSHOT_SOURCES, SNAPSHOT_ORGANISED)}
+
+    def close_snapshots(self, completed):
+        if self.previous_snapshot is not None:
+            self.previous_snapshot.close()
+            self.previous_snapshot = None
+        if self.snapshots is None:
+            return
+        for writer in self.snapshots.values():
+            try:
+                if completed:
+                    writer.finish(CONFIG.get("snapshot_keep", DEFAULT_KEEP))
+                else:
+                    writer.abandon()
+            except OSError as ex:
+                logger.error("Could not write snapshot %s: %s", writer.path, ex)
+        self.snapshots = None
+
+    def snapshot(self, label, filepath, file_hash, st=None):
+        if self.snapshots is not None:
+            self.snapshots[label].add(filepath, file_hash, st)
+
+    def snapshot_removed(self, filepath):
+        # An organised file moved away during the run must not stay in the organised snapshot
+        if self.snapshots is not None and os.path.normpath(filepath).startswith(self.organised_prefix):
+            self.snapshots[SNAPSHOT_ORGANISED].remove(filepath)
+
+    def snapshot_moved(self, src, dest, hashed):
+        """
+        Records a file moved from src to dest in the organised snapshot. hashed is
+        (digest, size, mtime_ns) as the file was hashed, or None; a file that
+        changed since it was hashed is recorded without a digest.
+        """
+        if self.snapshots is None:
+            return
+        self.snapshot_removed(src)
+        try:
+            st = os.stat(dest)
+        except OSError as ex:
+            logger.debug("Not in snapshot, cannot stat %s: %s", dest, ex)
+            return
+        same = hashed is not None and (st.st_size, st.st_mtime_ns) == tuple(hashed[1:])
+        self.snapshot(SNAPSHOT_ORGANISED, dest, hashed[0] if same else None, st)
+
+    def report_error(self, stage, filepath, message):
+        """
+        Queues an error for the next batched errors_signal instead of emitting one signal per failure.
+        """
+        if self.telemetry.error(stage, filepath, message):
+            self.publish_progress()
+
+    def advance(self, files=1, nbytes=0):
+        if self.telemetry.advance(files, nbytes):
+            self.publish_progress()
+
+    def use_out_of_core(self):
+        threshold = CONFIG.get("out_of_core_threshold", DEFAULT_OUT_OF_CORE_THRESHOLD)
+        return threshold > 0 and self.total_files >= threshold
+
+    def open_quarantine(self):
+        if CONFIG.get("quarantine_store", False):
+            self.quarantine = QuarantineStore(self.organised_folder, self.algo)
+        return self.quarantine
+
+    def close_quarantine(self):
+        if self.quarantine is not None:
+            self.quarantine.close()
+            self.quarantine = None
+
+    def use_io_scheduling(self, filepaths):
+        # Planning needs every path up front, so streamed (out-of-core) runs keep the plain pool
+        return (CONFIG.get("io_scheduling", True) and isinstance(filepaths, list)
+                and any_rotational(self.target_folders))
+
+    def move_file(self, src, dest):
+        """
+        move_with_collision plus bookkeeping of the destination counters.
+        """
+        self.throttle.write(src, os.path.dirname(dest), self.file_sizes.get(src, 0))
+        final_dest = move_with_collision(src, dest)
+        self.dest_counters.add_file(final_dest, self.file_sizes.get(src, 0))
+        hashed = self.file_digests.get(src)
+        self.snapshot_moved(src, final_dest, hashed)
+        if hashed is not None and CONFIG.get("xattr_digests", False):
+            # A rename keeps the tag; a copy across filesystems may not
+            retag(final_dest, self.algo, *hashed, self.capture_years.get(hashed[0]))
+        return final_dest
+
+    def publish_progress(self):
+        """
+        Emits the coalesced progress of the current stage and any queued errors.
+        """
+        snapshot, errors = self.telemetry.flush()
+        if errors:
+            self.errors_signal.emit(errors)
+        if snapshot is None:
+            return
+        self.telemetry_signal.emit(snapshot)
+        if snapshot["stage"] == "Hashing":
+            self.progress_signal.emit(snapshot["files"], snapshot["total_files"], snapshot["eta"])
+        elif snapshot["stage"] == "Moving":
+            self.progress_cat_signal.emit(snapshot["files"], snapshot["total_files"])
+
     def _process_files(self):
         """
         Orchestrates the file processing workflow, including hashing, duplicate detection,
         categorization, and cleanup.
         """
-        total_files = len(self.filepaths)
-
         # Prepare main directories
         cat_path = categorised_dir(self.organised_folder)
         dup_path = duplicates_dir(self.organised_folder)
@@ -59,133 +242,668 @@ class ProcessingThread(QThread):
         ensure_dir_exists(tbd_path)
         hashes_in_dup = set()
 
-        # Hash the destination folder
-        dest_hashes = self.hash_folder(self.organised_folder)
+        spill = None
+        sorters = []
+        self.open_quarantine()
+        try:
+            if self.use_out_of_core():
+                # Hashes go to sorted runs on disk; memory stays flat whatever the file count
+                spill = SpillDirectory(CONFIG.get("out_of_core_dir") or state_dir(self.organised_folder))
+                logger.info("Out-of-core mode for %d files, spilling to %s", self.total_files, spill.path)
+                dest_sorter = self.new_sorter(spill.path, "destination")
+                source_sorter = self.new_sorter(spill.path, "source")
+                sorters = [dest_sorter, source_sorter]
+                self.hash_folder(self.organised_folder, dest_sorter)
+                dest_lookup = SortedDigestIndex(dest_sorter)
+                sorters.insert(0, dest_lookup)
+                if self.hash_files(self.filepaths, source_sorter) is None:
+                    return
+                source_hashes = {}
+                total_hashed = source_sorter.count
+                hashed = self.iter_grouped(source_sorter)
+            else:
+                # Hash the destination folder, searchable by digest
+                dest_manifest = self.hash_folder(self.organised_folder)
+                dest_lookup = ManifestDigestLookup(dest_manifest)
 
-        # Hash the source folder
-        source_hashes = self.hash_files(self.filepaths)
+                # Hash the source folder
+                source_hashes = self.hash_files(self.filepaths)
+                if source_hashes is None:
+                    return
 
-        # Process files for duplicates and categorization
-        processed_count = 0
-        for filepath, file_hash in source_hashes.items():
+                # Whole duplicate folders are set aside in one rename each
+                skip_dirs, skipped = set(), 0
+                if CONFIG.get("directory_dedup", False):
+                    skip_dirs, skipped = self.move_duplicate_directories(source_hashes, dest_manifest, cat_path, tbd_path)
+                total_hashed = len(source_hashes) - skipped
+                if CONFIG.get("verify_duplicates", False):
+                    self.verify_duplicates(source_hashes, dest_lookup, skip_dirs)
+                if CONFIG.get("similar_images", False):
+                    self.find_similar_images(source_hashes, dest_manifest, dest_lookup, skip_dirs)
+                    if self.stop_event.is_set():
+                        self.publish_progress()
+                        self.done_signal.emit("aborted", 0, 0)
+                        return
+                hashed = self.iter_hashed(source_hashes.entries(skip_dirs))
 
-            processed_count += 1
+            # Process files for duplicates and categorization
+            self.telemetry.start_stage("Moving", total_hashed)
+            for filepath, file_hash in hashed:
+                self.advance()
 
-            if self.stop_event.is_set():
-                self.done_signal.emit("aborted", 0, 0)
-                return
+                if self.stop_event.is_set():
+                    self.publish_progress()
+                    self.done_signal.emit("aborted", 0, 0)
+                    return
 
-            # Check for potential filename duplicates
-            potential_duplicates = self.find_potential_duplicates([filepath])
-            is_duplicate = False
-
-            for file1, file2 in potential_duplicates:
-                if compare_file_size(file1, file2):
-                    # Process the filename duplicate and move it
-                    self.process_filename_duplicate(file1, file2, cat_path, dup_path, tbd_path, hashes_in_dup, source_hashes)
-                    is_duplicate = True
-                    break  # Only process file pairs once
-
-            if not is_duplicate:
-                # Check against hashed files to see if it exists in the final destination
-                dest_match = self.find_duplicate_in_hashes(file_hash,dest_hashes.copy())
-                if dest_match is not None:
-                    self.duplicate_files_count += 1
-                    # It's a duplicate
-                    self.move_duplicate_file(filepath, dest_match, cat_path, dup_path, tbd_path, hashes_in_dup)
-                else:
-                    # It is NOT a duplicate and should be moved to a categorised folder
-                    try:
-                        final_path = build_final_path_default(cat_path, filepath)
-                        logging.info(f"[Non-Dup => Categorised] {filepath} => {final_path}")
-                        move_with_collision(filepath, final_path)
-                        self.nonduplicate_files_count += 1
-                    except Exception as ex:
-                        self.error_signal.emit("MoveError", filepath, str(ex))
+                self.organise_file(filepath, file_hash, dest_lookup, cat_path, dup_path, tbd_path, hashes_in_dup, source_hashes)
+        finally:
+            self.close_quarantine()
+            for sorter in sorters:
+                sorter.close()
+            if spill is not None:
+                spill.cleanup()
+
+        if CONFIG.get("similar_documents", False):
+            self.report_similar_documents(os.path.join(cat_path, "Documents", "Text Documents"))
+        if CONFIG.get("archive_redundancy", False):
+            self.report_redundant_archives(cat_path)
 
         # Clean up leftover files and process empty folders
+        self.telemetry.start_stage("Empty folders")
+        self.publish_progress()
         self.cleanup_and_process_empty_folders(cat_path, dup_path, tbd_path, hashes_in_dup)
 
+        self.close_snapshots(completed=True)
+        self.publish_progress()
         self.done_signal.emit("success", self.duplicate_files_count, self.nonduplicate_files_count)
 
+    def organise_file(self, filepath, file_hash, dest_hashes, cat_path, dup_path, tbd_path, hashes_in_dup, source_hashes):
+        """
+        Decides where a single hashed source file belongs and moves it there.
+        dest_hashes is whatever find_duplicate_in_hashes understands.
+        """
+        # Check for potential filename duplicates
+        potential_duplicates = self.find_potential_duplicates([filepath])
+        is_duplicate = False
+
+        for file1, file2 in potential_duplicates:
+            if compare_file_size(file1, file2):
+                # Process the filename duplicate and move it
+                self.process_filename_duplicate(file1, file2, cat_path, dup_path, tbd_path, hashes_in_dup, source_hashes)
+                is_duplicate = True
+                break  # Only process file pairs once
+
+        if not is_duplicate:
+            # Check against hashed files to see if it exists in the final destination
+            dest_match = self.find_duplicate_in_hashes(file_hash,dest_hashes)
+            verified = self.is_verified_duplicate(filepath, dest_match) if dest_match is not None else True
+            if verified is None:
+                # The comparison could not be made (already reported); leave the file for another run
+                logger.warning("[Unverified => Left in place] %s", filepath)
+                return
+            if not verified:
+                self.report_error("Verifying", filepath, f"Content differs from {dest_match} despite equal hash")
+                dest_match = None
+            if dest_match is not None:
+                self.duplicate_files_count += 1
+                # It's a duplicate
+                self.move_duplicate_file(filepath, dest_match, cat_path, dup_path, tbd_path, hashes_in_dup, file_hash)
+            elif file_hash in self.similar_images:
+                self.move_similar_image(filepath, file_hash)
+            else:
+                # It is NOT a duplicate and should be moved to a categorised folder
+                try:
+                    final_path = build_final_path_default(cat_path, filepath, self.capture_years.get(file_hash))
+                    logger.info("[Non-Dup => Categorised] %s => %s", filepath, final_path)
+                    self.move_file(filepath, final_path)
+                    self.nonduplicate_files_count += 1
+                except Exception as ex:
+                    self.report_error("MoveError", filepath, str(ex))
+
+    def verify_duplicates(self, source_manifest, dest_lookup, skip_dirs=None):
+        """
+        Optional stage between hashing and moving: every source file whose hash matches a
+        destination file is compared byte for byte. Sources matching the same destination
+        file are checked together, so that file is read once per group.
+        """
+        groups = {}
+        for path, digest, _, _ in source_manifest.entries(skip_dirs):
+            match = dest_lookup.lookup(digest)
+            if match is not None:
+                groups.setdefault(match, []).append(path)
+        self.telemetry.start_stage("Verifying", sum(len(paths) for paths in groups.values()))
+        self.verified_duplicates = set()
+        self.unverified = set()
+        for reference, paths in groups.items():
+            if self.stop_event.is_set():
+                break
+            identical, errors = verify_identical(reference, paths)
+            self.verified_duplicates.update(identical)
+            self.unverified.update(unverified_paths(reference, paths, errors))
+            for path, message in errors:
+                self.report_error("Verifying", path, message)
+            self.advance(len(paths))
+        self.publish_progress()
+
+    def find_similar_images(self, source_manifest, dest_manifest, dest_lookup, skip_dirs=None):
+        """
+        Optional stage between hashing and moving: source images that are not exact
+        duplicates get a perceptual hash, as do the images already in Categorised
+        (cached between runs), and pictures within similar_images_distance bits of
+        each other are grouped. A group keeps its largest organised image if it has
+        one, else its largest source image; the source images besides the keeper
+        are set aside in the Review folder by organise_file.
+        """
+        if not PIL_AVAILABLE:
+            logger.warning("Similar image detection needs Pillow; skipping")
+            return
+        # One path per digest; exact copies of it are handled by the hash match as usual
+        candidates = {}
+        for path, digest, size, _ in source_manifest.entries(skip_dirs):
+            if digest not in candidates and is_image(path) and dest_lookup.lookup(digest) is None:
+                candidates[digest] = (path, size)
+        by_path = {path: (digest, size) for digest, (path, size) in candidates.items()}
+        paths, digests, values, ranks = [], [], [], []
+        # Indices of organised images; they can be kept but are never moved
+        organised = set()
+        cache = ImageHashCache(self.organised_folder)
+        pending = {}
+        try:
+            keeper_prefix = os.path.join(categorised_dir(self.organised_folder), "")
+            seen = set()
+            for path, digest, size, _ in dest_manifest.entries():
+                if digest in seen or path in by_path or not path.startswith(keeper_prefix) or not is_image(path):
+                    continue
+                seen.add(digest)
+                try:
+                    st = os.stat(path)
+                except OSError as ex:
+                    self.report_error("Comparing images", path, str(ex))
+                    continue
+                cached = cache.get(path, st.st_size, st.st_mtime_ns)
+                if cached is None:
+                    pending[path] = (digest, st.st_size, st.st_mtime_ns)
+                elif cached[0] is not None:
+                    organised.add(len(values))
+                    paths.append(path)
+                    digests.append(digest)
+                    values.append(cached[0])
+                    ranks.append((cached[1], size))
+            logger.info("Comparing images: %d new, %d organised cached, %d organised to read",
+                        len(by_path), len(organised), len(pending))
+            self.telemetry.start_stage("Comparing images", len(by_path) + len(pending))
+            pool = multiprocessing.Pool(
+                processes=(multiprocessing.cpu_count() if CONFIG['multiprocessing_cores'] <= 0
+                           else CONFIG['multiprocessing_cores']),
+                initializer=init_throttled_worker,
+                initargs=throttled_worker_args(self.throttle)
+            )
+            try:
+                for path, value, pixels, err in pool.imap_unordered(worker_image_hash, list(by_path) + list(pending),
+                                                                    chunksize=32):
+                    if self.stop_event.is_set():
+                        break
+                    if path in pending:
+                        digest, size, mtime_ns = pending[path]
+                        # Undecodable organised images are cached too, so they are reported once
+                        cache.put(path, size, mtime_ns, value, pixels)
+                        if err is None:
+                            organised.add(len(values))
+                    else:
+                        digest, size = by_path[path]
+                    self.advance(1, size)
+                    if err is not None:
+                        self.report_error("Comparing images", path, err)
+                        continue
+                    paths.append(path)
+                    digests.append(digest)
+                    values.append(value)
+                    ranks.append((pixels, size))
+            finally:
+                if self.stop_event.is_set():
+                    pool.terminate()
+                else:
+                    pool.close()
+                pool.join()
+        finally:
+            # An interrupted pass has not seen every organised image; keep the rest of the cache
+            cache.close(prune=not self.stop_event.is_set())
+        if self.stop_event.is_set():
+            return
+        max_distance = CONFIG.get("similar_images_distance", DEFAULT_MAX_DISTANCE)
+        for group in group_similar(values, max_distance):
+            keeper = max([i for i in group if i in organised] or group, key=lambda i: ranks[i])
+            for i in group:
+                if i != keeper and i not in organised:
+                    self.similar_images[digests[i]] = (paths[keeper], digests[keeper])
+        logger.info("Found %d near-duplicate images", len(self.similar_images))
+        self.publish_progress()
+
+    def report_similar_documents(self, folder):
+        """
+        Optional stage after moving: text documents in folder are shingled and
+        MinHashed, and groups whose estimated Jaccard similarity reaches
+        similar_documents_threshold are written to Review/Similar Documents.txt.
+        Nothing is moved; drafts are for a person to weed out. Signatures are
+        cached, so only new or changed documents are read.
+        """
+        if not NUMPY_AVAILABLE:
+            logger.warning("Similar document detection needs NumPy; skipping")
+            return
+        report_path = os.path.join(review_dir(self.organised_folder), "Similar Documents.txt")
+        cache = SignatureCache(self.organised_folder)
+        paths, signatures, pending = [], [], {}
+        try:
+            for path in scan_files([folder], stop_event=self.stop_event):
+                if not is_text_document(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError as ex:
+                    self.report_error("Comparing documents", path, str(ex))
+                    continue
+                hit, signature = cache.get(path, st.st_size, st.st_mtime_ns)
+                if not hit:
+                    pending[path] = (st.st_size, st.st_mtime_ns)
+                elif signature is not None:
+                    paths.append(path)
+                    signatures.append(signature)
+            logger.info("Comparing documents: %d cached, %d to read", len(paths), len(pending))
+            self.telemetry.start_stage("Comparing documents", len(pending))
+            if pending:
+                pool = multiprocessing.Pool(
+                    processes=(multiprocessing.cpu_count() if CONFIG['multiprocessing_cores'] <= 0
+                               else CONFIG['multiprocessing_cores']),
+                    initializer=init_throttled_worker,
+                    initargs=throttled_worker_args(self.throttle)
+                )
+                try:
+                    results = pool.imap_unordered(worker_document_signature, list(pending), chunksize=16)
+                    for path, signature, err in results:
+                        if self.stop_event.is_set():
+                            break
+                        self.advance(1, pending[path][0])
+                        if err is not None:
+                            self.report_error("Comparing documents", path, err)
+                            continue
+                        cache.put(path, *pending[path], signature)
+                        if signature is not None:
+                            paths.append(path)
+                            signatures.append(signature)
+                finally:
+                    if self.stop_event.is_set():
+                        pool.terminate()
+                    else:
+                        pool.close()
+                    pool.join()
+        finally:
+            # An interrupted scan has not seen every document; keep the rest of the cache
+            cache.close(prune=not self.stop_event.is_set())
+        if self.stop_event.is_set():
+            return
+        threshold = CONFIG.get("similar_documents_threshold", DEFAULT_THRESHOLD)
+        groups = group_similar_documents(signatures, threshold)
+        groups = [(sorted(paths[i] for i in members), similarity) for members, similarity in groups]
+        logger.info("Found %d groups of similar documents", len(groups))
+        if groups:
+            ensure_dir_exists(os.path.dirname(report_path))
+            with open(report_path, "w", encoding="utf-8") as f:
+                f.write(format_document_groups(groups))
+        elif os.path.exists(report_path):
+            os.remove(report_path)
+        self.publish_progress()
+
+    def report_redundant_archives(self, folder):
+        """
+        Optional stage after moving: zip and tar archives below folder are
+        matched member by member against the loose files there, and archives
+        that hold nothing new, or folders that an archive already holds, are
+        written to Review/Redundant Archives.txt. Nothing is extracted or moved.
+        """
+        report_path = os.path.join(review_dir(self.organised_folder), "Redundant Archives.txt")
+        self.telemetry.start_stage("Indexing archives")
+        self.publish_progress()
+        results, folder_files = find_redundant_archives(
+            [folder], threads=CONFIG.get("archive_threads", DEFAULT_ARCHIVE_THREADS), stop_event=self.stop_event)
+        if self.stop_event.is_set():
+            return
+        for result in results:
+            if result.error is not None:
+                self.report_error("Indexing archives", result.path, result.error)
+        report = format_archive_report(results, folder_files)
+        logger.info("Indexed %d archives, %d fully redundant", len(results), sum(r.redundant for r in results))
+        if report:
+            ensure_dir_exists(os.path.dirname(report_path))
+            with open(report_path, "w", encoding="utf-8") as f:
+                f.write(report)
+        elif os.path.exists(report_path):
+            os.remove(report_path)
+        self.publish_progress()
+
+    def move_similar_image(self, filepath, file_hash):
+        keeper, keeper_hash = self.similar_images[file_hash]
+        # One folder per kept picture, so each look-alike sits next to the name of what it resembles
+        stem = os.path.splitext(os.path.basename(keeper))[0]
+        folder = os.path.join(review_dir(self.organised_folder), "Similar Images", f"{stem} ({keeper_hash[:8]})")
+        try:
+            ensure_dir_exists(folder)
+            final_path = os.path.join(folder, os.path.basename(filepath))
+            logger.info("[Similar => Review] %s => %s (like %s)", filepath, final_path, keeper)
+            self.move_file(filepath, final_path)
+            self.nonduplicate_files_count += 1
+        except Exception as ex:
+            self.report_error("MoveError", filepath, str(ex))
+
+    def is_verified_duplicate(self, filepath, dest_match):
+        """
+        True when filepath has the same bytes as dest_match (or verification is
+        off), False when they differ, None when a read error kept them from
+        being compared; the error has been reported by then.
+        """
+        if not CONFIG.get("verify_duplicates", False):
+            return True
+        if self.verified_duplicates is not None:
+            if filepath in self.unverified:
+                return None
+            return filepath in self.verified_duplicates
+        # No verify stage ran (out-of-core or watch mode); check this pair now
+        identical, errors = verify_identical(dest_match, [filepath])
+        for path, message in errors:
+            self.report_error("Verifying", path, message)
+        if unverified_paths(dest_match, [filepath], errors):
+            return None
+        return bool(identical)
+
+    def folder_is_identical(self, directory, original):
+        """
+        Byte-for-byte check of every file below directory against the same relative path below original.
+        Like is_verified_duplicate, returns None when a read error got in the way.
+        """
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                reference = os.path.join(original, os.path.relpath(path, directory))
+                identical, errors = verify_identical(reference, [path])
+                if unverified_paths(reference, [path], errors):
+                    for failed, message in errors:
+                        self.report_error("Verifying", failed, message)
+                    return None
+                if not identical:
+                    return False
+        return True
+
+    def move_duplicate_directories(self, source_manifest, dest_manifest, cat_path, tbd_path):
+        """
+        Finds source folders whose whole contents duplicate another source folder or a
+        folder under Categorised (by Merkle directory digest) and moves each into
+        'To Be Deleted' with a single rename. Returns (manifest directory ids that
+        moved, number of files inside them) so the per-file pass can skip them.
+        """
+        source_digests = directory_digests(source_manifest, self.target_folders, self.algo)
+        dest_digests = directory_digests(dest_manifest, [cat_path], self.algo)
+        duplicates = find_duplicate_directories(source_digests, dest_digests,
+                                                CONFIG.get("directory_dedup_min_files", DEFAULT_MIN_FILES))
+        self.telemetry.start_stage("Duplicate folders", len(duplicates))
+        moved = {}
+        for directory, count, original in duplicates:
+            if self.stop_event.is_set():
+                break
+            identical = self.folder_is_identical(directory, original) if CONFIG.get("verify_duplicates", False) else True
+            if not identical:
+                # Left to the per-file pass, which verifies each file on its own
+                if identical is False:
+                    self.report_error("Verifying", directory, f"Content differs from {original} despite equal hash")
+                continue
+            d_path = os.path.join(tbd_path, os.path.basename(directory))
+            try:
+                final_path = move_with_collision(directory, d_path)
+            except Exception as ex:
+                self.report_error("MoveError", directory, str(ex))
+                continue
+            logger.info("[Dup-Folder => TBD] %s => %s (%d files)", directory, final_path, count)
+            moved[directory] = final_path
+            self.duplicate_files_count += count
+            self.advance()
+        if not moved:
+            return set(), 0
+
+        # Manifest directories that went along with a moved folder, and where they are now
+        relocated = {}
+        for dir_id, directory in enumerate(source_manifest.dirs):
+            # directory_digests reports normalised paths
+            directory = os.path.normpath(directory)
+            ancestor = directory
+            while ancestor not in moved:
+                parent = os.path.dirname(ancestor)
+                if parent == ancestor:
+                    break
+                ancestor = parent
+            if ancestor in moved:
+                relocated[dir_id] = moved[ancestor] + directory[len(ancestor):]
+
+        skipped = 0
+        for i in range(len(source_manifest)):
+            new_dir = relocated.get(source_manifest.dir_ids[i])
+            if new_dir is not None:
+                skipped += 1
+                name = source_manifest.names[source_manifest.name_ids[i]]
+                self.dest_counters.add_file(os.path.join(new_dir, name), source_manifest.sizes[i])
+                self.snapshot_moved(source_manifest.path(i), os.path.join(new_dir, name),
+                                    (source_manifest.digest(i), source_manifest.sizes[i], source_manifest.mtimes[i]))
+        for final_path in moved.values():
+            # Picks up subfolders that hold no files
+            for root, _, _ in os.walk(final_path):
+                self.dest_counters.add_dir(root)
+        return set(relocated), skipped
+
     def find_duplicate_in_hashes(self, file_hash,hashes):
         """
-        Checks if the file hash exists in the source or destination hashes and returns the file
+        Checks if the file hash exists in the destination hashes and returns the file
         :param file_hash: Hash of the file to check
+        :param hashes: {hash: filepath} dict, or an index with a lookup(hash) method
         :return: Full file path of the hash file
         """
-        for path, hash in hashes.items():
-            if file_hash == hash:
-                #remove_hash = path
-                return path
-        return None
+        if isinstance(hashes, dict):
+            return hashes.get(file_hash)
+        return hashes.lookup(file_hash)
+
+    def new_sorter(self, workdir, name):
+        return ExternalDigestSorter(workdir, digest_size(self.algo), name,
+                                    CONFIG.get("out_of_core_run_records", DEFAULT_RUN_RECORDS))
 
-    def hash_folder(self, folder):
+    def iter_hashed(self, entries):
         """
-        Hashes all files in a folder and returns a dictionary of {filepath: hash}.
+        Turns (filepath, hash, size, mtime_ns) entries into (filepath, hash)
+        pairs for the decision loop, keeping only the current file's size and
+        hash-time digest and stat in file_sizes and file_digests.
         """
-        file_hashes = {}
-        for root, _, files in os.walk(folder):
-            for filename in files:
-                filepath = os.path.join(root, filename)
+        for path, digest, size, mtime_ns in entries:
+            self.file_sizes[path] = size
+            self.file_digests[path] = (digest, size, mtime_ns)
+            try:
+                yield path, digest
+            finally:
+                self.file_sizes.pop(path, None)
+                self.file_digests.pop(path, None)
+
+    def iter_grouped(self, sorter):
+        """
+        Out-of-core counterpart of iter_hashed: the merged source records are
+        organised one digest group at a time, and capture_years only ever holds
+        the year of the group being organised, read back from the records.
+        """
+        current = None
+        for group in sorter.iter_groups(min_size=1, max_files=MAX_GROUP_FILES):
+            digest = group[0][1]
+            if digest != current:
+                current = digest
+                self.capture_years = {}
+            if digest not in self.capture_years:
+                year = next((year for _, _, _, year, _ in group if year), None)
+                if year is not None:
+                    self.capture_years[digest] = year
+            yield from self.iter_hashed((path, hexdigest, size, mtime_ns) for path, hexdigest, size, _, mtime_ns in group)
+        self.capture_years = {}
+
+    def hash_folder(self, folder, sorter=None):
+        """
+        Hashes all files in a folder and returns a Manifest of (filepath, hash, size).
+        With a sorter, records are streamed into it instead and the sorter is returned.
+        """
+        file_hashes = Manifest(digest_size(self.algo))
+        self.telemetry.start_stage("Hashing destination")
+        store_dir = quarantine_dir(folder)
+        # Prune our own index/cache folder; the quarantine store is counted but never hashed
+        entries = scan([folder], CONFIG.get("scan_threads_per_device", DEFAULT_SCAN_THREADS),
+                       skip_dirs=(state_dir(folder), store_dir), with_sizes=False, stop_event=self.stop_event)
+        if os.path.isdir(store_dir):
+            self.count_folder(store_dir)
+        for kind, filepath, detail in entries:
+            if kind == ENTRY_DIR:
+                self.dest_counters.add_dir(filepath)
+            elif kind != ENTRY_FILE:
+                self.report_error("Scanning", filepath, detail)
+            else:
                 try:
-                    fhash, err = self.hash_file(filepath)
-                    if err is None:
-                        file_hashes[filepath] = fhash
+                    fhash, err, size, st = self.hash_known_file(filepath)
+                    self.advance(1, size)
+                    self.dest_counters.add_file(filepath, size)
+                    self.snapshot(SNAPSHOT_ORGANISED, filepath, fhash if err is None else None, st)
+                    if err is not None:
+                        self.report_error("Hashing", filepath, f"{err[0]}: {err[1]}")
+                        if sorter is None:
+                            file_hashes.mark_incomplete(filepath)
+                    elif sorter is not None:
+                        sorter.add(fhash, size, filepath)
                     else:
-                        self.error_signal.emit("Hashing", filepath, f"{err[0]}: {err[1]}")
+                        file_hashes.add(filepath, fhash, size)
                 except Exception as ex:
-                    self.error_signal.emit("Hashing", filepath, str(ex))
+                    self.report_error("Hashing", filepath, str(ex))
+                    if sorter is None:
+                        file_hashes.mark_incomplete(filepath)
 
+        if sorter is not None:
+            sorter.finish()
+            return sorter
+        file_hashes.compact()
         return file_hashes
 
-    def hash_files(self, filepaths):
+    def hash_files(self, filepaths, sorter=None):
         """
-        Hashes a list of files and returns a dictionary of {filepath: hash}.
+        Hashes a list of files and returns a Manifest of (filepath, hash, size).
+        With a sorter, records are streamed into it instead and the sorter is returned.
         """
-        file_hashes = {}
-        start_time = time.time()
-        total_files = len(filepaths)
-        processed = 0
-        # Create a multiprocessing pool for hashing
-        pool = multiprocessing.Pool(
-            processes=(
-                multiprocessing.cpu_count() if CONFIG['multiprocessing_cores'] <= 0
-                else CONFIG['multiprocessing_cores']
-            )
+        file_hashes = Manifest(digest_size(self.algo))
+        self.telemetry.start_stage("Hashing", self.total_files, self.total_bytes)
+        processes = (
+            multiprocessing.cpu_count() if CONFIG['multiprocessing_cores'] <= 0
+            else CONFIG['multiprocessing_cores']
         )
-        worker = partial(worker_hash_file, algo=self.algo, skip_size=self.skip_size)
-        results_iter = pool.imap_unordered(worker, filepaths)
+        worker = partial(worker_hash_file, algo=self.algo, skip_size=self.skip_size,
+                         sniff_dates=CONFIG.get("capture_dates", True))
+        pool = None
+        remote = RemoteHashPool.from_config(self.organised_folder, self.algo, self.skip_size, self.stop_event)
+        if remote is None and self.use_io_scheduling(filepaths):
+            # Spinning disks get ordered reads and a few workers each; other devices go wide
+            batches = plan_batches(filepaths, processes, CONFIG.get("hdd_workers_per_device", DEFAULT_HDD_WORKERS))
+            results_iter = run_batches(batches, worker, init_throttled_worker, throttled_worker_args(self.throttle),
+                                       self.stop_event)
+        else:
+            # Create a multiprocessing pool for hashing
+            pool = multiprocessing.Pool(
+                processes=processes,
+                initializer=init_throttled_worker,
+                initargs=throttled_worker_args(self.throttle)
+            )
+            if remote is not None:
+                # Paths on a worker's share are hashed next to the data; the pool takes the rest
+                results_iter = remote.imap(filepaths, pool, worker)
+            else:
+                # Larger chunks cut IPC overhead when there are millions of files
+                results_iter = pool.imap_unordered(worker, filepaths, chunksize=64 if sorter is not None else 1)
 
         # Hashing loop
         for result in results_iter:
             if self.stop_event.is_set():
-                pool.terminate()
-                pool.join()
-                self.done_signal.emit("aborted", 0, 0)
-                return
-            (fpath, fhash, err) = result
-            processed += 1
+                break
+            (fpath, fhash, err, size, mtime_ns) = result[:5]
+            year = result[5] if len(result) > 5 else None
+            if year is not None and sorter is None:
+                self.capture_years[fhash] = year
+            self.advance(1, size)
+            self.snapshot(SNAPSHOT_SOURCES, fpath, fhash if err is None else None)
             if err is not None:
-                self.error_signal.emit("Hashing", fpath, f"{err[0]}: {err[1]}")
+                self.report_error("Hashing", fpath, f"{err[0]}: {err[1]}")
+                if sorter is None:
+                    file_hashes.mark_incomplete(fpath)
+            elif sorter is not None:
+                sorter.add(fhash, size, fpath, year, mtime_ns)
             else:
-                file_hashes[fpath] = fhash
+                file_hashes.add(fpath, fhash, size, mtime_ns)
 
-        pool.close()
-        pool.join()
+        if remote is not None:
+            results_iter.close()
+        if pool is not None:
+            if self.stop_event.is_set():
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+        else:
+            results_iter.close()
+        if self.stop_event.is_set():
+            self.publish_progress()
+            self.done_signal.emit("aborted", 0, 0)
+            return None
 
+        if sorter is not None:
+            sorter.finish()
+            return sorter
+        file_hashes.compact()
         return file_hashes
 
+    def count_folder(self, folder):
+        """
+        Adds a folder and everything below it to the destination counters without hashing.
+        """
+        self.dest_counters.add_dir(folder)
+        for root, dirs, files in os.walk(folder):
+            for d in dirs:
+                self.dest_counters.add_dir(os.path.join(root, d))
+            for filename in files:
+                filepath = os.path.join(root, filename)
+                try:
+                    self.dest_counters.add_file(filepath, os.path.getsize(filepath))
+                except OSError as ex:
+                    self.report_error("Hashing", filepath, str(ex))
+
+    def hash_known_file(self, filepath):
+        """
+        hash_file, except that a file the last snapshot saw with the same size,
+        mtime and inode keeps the digest recorded then. Returns (hash, error, size, stat or None).
+        """
+        if self.previous_snapshot is not None:
+            try:
+                st = os.stat(filepath)
+            except OSError as ex:
+                return None, ("HashError", str(ex)), 0, None
+            entry = self.previous_snapshot.lookup(filepath)
+            if entry is not None and entry.digest is not None and entry.same_stat(st):
+                return entry.digest, None, st.st_size, st
+            return self.hash_file(filepath) + (st,)
+        return self.hash_file(filepath) + (None,)
+
     def hash_file(self, filepath):
         """
-        Hashes a single file using worker_hash_file.
+        Hashes a single file using worker_hash_file. Returns (hash, error, size).
         """
         try:
             fhash = worker_hash_file(filepath, self.algo, self.skip_size)
-            return fhash[1], fhash[2]
+            return fhash[1], fhash[2], fhash[3]
         except Exception as e:
-            logging.error(f"Error hashing {filepath}: {e}")
-            return None, ("HashError", str(e))
+            logger.error("Error hashing %s: %s", filepath, e)
+            return None, ("HashError", str(e)), 0
 
     def find_potential_duplicates(self, filepaths):
         """
@@ -245,11 +963,11 @@ class ProcessingThread(QThread):
         original = file1
         duplicate = file2
         final_path = build_final_path_default(cat_path, original)
-        logging.info(f"[Dup-Name => Categorised] {original} => {final_path}")
+        logger.info("[Dup-Name => Categorised] %s => %s", original, final_path)
         try:
-            move_with_collision(original, final_path)
+            self.move_file(original, final_path)
         except Exception as ex:
-            self.error_signal.emit("MoveError", original, str(ex))
+            self.report_error("MoveError", original, str(ex))
 
         self.duplicate_files_count += 1 #It's a duplicate
 
@@ -264,30 +982,42 @@ class ProcessingThread(QThread):
         if found_hash in hashes_in_dup:
             # Already have a file of this hash in Duplicates => move to "To Be Deleted"
             del_path = os.path.join(tbd_path, os.path.basename(duplicate))
-            logging.info(f"[Dup => AlreadyInDup => TBD] {duplicate} => {del_path}")
+            logger.info("[Dup => AlreadyInDup => TBD] %s => %s", duplicate, del_path)
             try:
-                move_with_collision(duplicate, del_path)
+                self.move_file(duplicate, del_path)
             except Exception as ex:
-                self.error_signal.emit("MoveError", duplicate, str(ex))
+                self.report_error("MoveError", duplicate, str(ex))
         else:
             # Place the first encountered duplicate in the Duplicates folder
-            d_path = build_final_path_default(dup_path, duplicate)
-            logging.info(f"[Dup => Duplicates] {duplicate} => {d_path}")
+            d_path = build_final_path_default(dup_path, duplicate, self.capture_years.get(found_hash))
+            logger.info("[Dup => Duplicates] %s => %s", duplicate, d_path)
             try:
-                move_with_collision(duplicate, d_path)
+                self.move_file(duplicate, d_path)
                 hashes_in_dup.add(found_hash)
             except Exception as ex:
-                self.error_signal.emit("MoveError", duplicate, str(ex))
+                self.report_error("MoveError", duplicate, str(ex))
 
-    def move_duplicate_file(self, src_path,dest_path, cat_path, dup_path, tbd_path, hashes_in_dup):
+    def move_duplicate_file(self, src_path,dest_path, cat_path, dup_path, tbd_path, hashes_in_dup, file_hash=None):
         """
         Moves the duplicate file to the appropriate destination, either Duplicates or To Be Deleted.
+        With the quarantine store enabled and the hash known, the file goes into the store instead,
+        where identical content is only kept once.
         """
         try:
+            if self.quarantine is not None and file_hash is not None:
+                size = self.file_sizes.get(src_path, 0)
+                self.throttle.write(src_path, self.quarantine.root, size)
+                blob, is_new = self.quarantine.put(src_path, file_hash, size)
+                if blob is not None:
+                    logger.info("[Dup => Quarantine] %s => %s", src_path, blob)
+                    self.snapshot_removed(src_path)
+                    if is_new:
+                        self.dest_counters.add_file(blob, size)
+                    return
             found_hash = None
             d_path = os.path.join(to_be_deleted_dir(self.organised_folder), os.path.basename(src_path))
-            logging.info(f"[Dup => AlreadyInDup => TBD] {src_path} => {d_path}")
-            move_with_collision(src_path, d_path)
+            logger.info("[Dup => AlreadyInDup => TBD] %s => %s", src_path, d_path)
+            self.move_file(src_path, d_path)
             # Remove all files so that they do not hash or move to new location
             try:
                 src_path_string = src_path
@@ -295,21 +1025,23 @@ class ProcessingThread(QThread):
                 del src_path_string
                 del dest_path_string
             except Exception as ex:
-                self.error_signal.emit("DeletionError", src_path, str(ex))
+                self.report_error("DeletionError", src_path, str(ex))
 
         except Exception as ex:
-            self.error_signal.emit("MoveError", src_path, str(ex))
+            self.report_error("MoveError", src_path, str(ex))
 
     def cleanup_and_process_empty_folders(self, cat_path, dup_path, tbd_path, hashes_in_dup):
         """
         Cleans up any leftover files in the source folders and processes empty folders.
         """
         # Handle empty folders *after* everything else
-        logging.info("[EmptyFolders] Running empty folder cleanup.")
+        logger.info("[EmptyFolders] Running empty folder cleanup.")
         total_moved_count = 0  # Initialize total_moved_count here
         for folder in self.target_folders:
             if os.path.isdir(folder):
                 # Moved the empty folder sweep to after processing non-duplicates
                 total_moved_count += move_empty_folders_single_pass(self.organised_folder, [folder])
+        self.dest_counters.add_dir(os.path.join(tbd_path, "empty folders"))
+        self.dest_counters["To Be Deleted"].add_folders(total_moved_count)
 
-        logging.info(f"[EmptyFolders] Moved a total of {total_moved_count} empty folders.")
\ No newline at end of file
+        logger.info("[EmptyFolders] Moved a total of %d empty folders.", total_moved_count)
\ No newline at end of file
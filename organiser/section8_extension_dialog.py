@@ -1,7 +1,11 @@
-import os, shutil, logging
+import logging
 from PyQt5.QtWidgets import (QDialog, QFormLayout, QLineEdit, QPushButton, QHBoxLayout,
-                             QDialogButtonBox, QMessageBox, QFileDialog, QLabel)
-from organiser.section3_helpers import ensure_dir_exists
+                             QDialogButtonBox, QMessageBox, QFileDialog, QLabel, QPlainTextEdit)
+from organiser.section2_configuration import CONFIG
+from organiser.section27_pattern_matcher import PatternMatcher, move_matching, KIND_EXTENSION, DEFAULT_MOVE_THREADS
+from organiser.section28_rule_routing import parse_routes, route_matching, format_route_summary
+
+logger = logging.getLogger(__name__)
 
 class ExtensionOrganizerDialog(QDialog):
     def __init__(self, parent=None):
@@ -29,7 +33,12 @@ class ExtensionOrganizerDialog(QDialog):
         layout.addRow("Target Folder:", target_layout)
         
         self.extension_input = QLineEdit()
-        layout.addRow("Extensions (comma separated, e.g. mp3,wav):", self.extension_input)
+        layout.addRow("Extensions (comma separated, e.g. mp3,wav; re:/glob: for patterns):", self.extension_input)
+
+        self.routes_input = QPlainTextEdit()
+        self.routes_input.setPlaceholderText("mp3 => Audio/{year}\npdf => Documents/{ext}")
+        self.routes_input.setMaximumHeight(100)
+        layout.addRow("Or route each extension (one per line, ext => folder template):", self.routes_input)
         
         self.result_label = QLabel("")
         layout.addRow("Results:", self.result_label)
@@ -54,7 +63,11 @@ class ExtensionOrganizerDialog(QDialog):
         source = self.source_folder.text().strip()
         target = self.target_folder.text().strip()
         extensions_text = self.extension_input.text().strip()
-        
+        routes = parse_routes(self.routes_input.toPlainText())
+
+        if source and target and routes:
+            self.process_routes(source, target, routes)
+            return
         if not source or not target or not extensions_text:
             QMessageBox.warning(self, "Missing Information", 
                                 "Please provide source folder, target folder, and extensions.")
@@ -74,35 +87,26 @@ class ExtensionOrganizerDialog(QDialog):
             QMessageBox.critical(self, "Error", f"An error occurred: {ex}")
             self.result_label.setText(f"Error: {ex}")
 
+    def process_routes(self, source, target, routes):
+        try:
+            summary, errors = route_matching(source, target, routes, KIND_EXTENSION,
+                                             threads=CONFIG.get("organiser_move_threads", DEFAULT_MOVE_THREADS))
+            moved_count = sum(moved for moved, _ in summary.values())
+            details = format_route_summary(summary)
+            if errors:
+                QMessageBox.warning(self, "Completed with Errors",
+                                    f"Moved {moved_count} files with {len(errors)} errors.\n\n{details}")
+            else:
+                QMessageBox.information(self, "Success", f"Successfully moved {moved_count} files.\n\n{details}")
+            self.result_label.setText(f"Moved {moved_count} files")
+        except Exception as ex:
+            QMessageBox.critical(self, "Error", f"An error occurred: {ex}")
+            self.result_label.setText(f"Error: {ex}")
+
 def organize_by_extension(source_folder, target_folder, extensions):
-    ensure_dir_exists(target_folder)
-    moved_count = 0
-    errors = []
-    # Normalize extensions: ensure they start with "."
-    normalized_exts = []
+    matcher = PatternMatcher()
     for ext in extensions:
-        ext = ext.strip().lower()
-        if not ext.startswith('.'):
-            ext = '.' + ext
-        normalized_exts.append(ext)
-
-    for root, _, files in os.walk(source_folder):
-        for filename in files:
-            f_lower = filename.lower()
-            if any(f_lower.endswith(ext) for ext in normalized_exts):
-                src_path = os.path.join(root, filename)
-                dest_path = os.path.join(target_folder, filename)
-                counter = 1
-                while os.path.exists(dest_path):
-                    base, ext_ = os.path.splitext(filename)
-                    dest_path = os.path.join(target_folder, f"{base} ({counter}){ext_}")
-                    counter += 1
-                try:
-                    shutil.move(src_path, dest_path)
-                    moved_count += 1
-                    logging.info(f"Moved {src_path} -> {dest_path}")
-                except Exception as ex:
-                    err_msg = f"Error moving {src_path}: {ex}"
-                    logging.error(err_msg)
-                    errors.append(err_msg)
-    return moved_count, errors
\ No newline at end of file
+        if ext.strip():
+            matcher.add_text(ext.strip(), KIND_EXTENSION)
+    return move_matching(source_folder, target_folder, matcher,
+                         CONFIG.get("organiser_move_threads", DEFAULT_MOVE_THREADS))
@@ -1,7 +1,11 @@
-import os, shutil, logging
+import logging
 from PyQt5.QtWidgets import (QDialog, QFormLayout, QLineEdit, QPushButton, QHBoxLayout,
-                             QDialogButtonBox, QMessageBox, QFileDialog, QLabel, QComboBox)
-from organiser.section3_helpers import ensure_dir_exists
+                             QDialogButtonBox, QMessageBox, QFileDialog, QLabel, QPlainTextEdit, QComboBox)
+from organiser.section2_configuration import CONFIG
+from organiser.section27_pattern_matcher import PatternMatcher, move_matching, KIND_KEYWORD, DEFAULT_MOVE_THREADS
+from organiser.section28_rule_routing import parse_routes, route_matching, format_route_summary
+
+logger = logging.getLogger(__name__)
 
 class KeywordOrganizerDialog(QDialog):
     def __init__(self, parent=None):
@@ -29,7 +33,12 @@ class KeywordOrganizerDialog(QDialog):
         layout.addRow("Target Folder:", target_layout)
         
         self.keyword_input = QLineEdit()
-        layout.addRow("Keywords (comma separated):", self.keyword_input)
+        layout.addRow("Keywords (comma separated; re:/glob: for patterns):", self.keyword_input)
+
+        self.routes_input = QPlainTextEdit()
+        self.routes_input.setPlaceholderText("invoice => Finance/{keyword}/{year}\ncontract => Legal/{year}")
+        self.routes_input.setMaximumHeight(100)
+        layout.addRow("Or route each keyword (one per line, keyword => folder template):", self.routes_input)
         
         self.case_sensitive = QComboBox()
         self.case_sensitive.addItems(["Case Insensitive", "Case Sensitive"])
@@ -59,7 +68,11 @@ class KeywordOrganizerDialog(QDialog):
         target = self.target_folder.text().strip()
         keywords_text = self.keyword_input.text().strip()
         case_sensitive = (self.case_sensitive.currentText() == "Case Sensitive")
-        
+        routes = parse_routes(self.routes_input.toPlainText())
+
+        if source and target and routes:
+            self.process_routes(source, target, routes, case_sensitive)
+            return
         if not source or not target or not keywords_text:
             QMessageBox.warning(self, "Missing Information", 
                                 "Please provide source folder, target folder, and keywords.")
@@ -79,32 +92,25 @@ class KeywordOrganizerDialog(QDialog):
             QMessageBox.critical(self, "Error", f"An error occurred: {ex}")
             self.result_label.setText(f"Error: {ex}")
 
+    def process_routes(self, source, target, routes, case_sensitive):
+        try:
+            summary, errors = route_matching(source, target, routes, KIND_KEYWORD, case_sensitive,
+                                             CONFIG.get("organiser_move_threads", DEFAULT_MOVE_THREADS))
+            moved_count = sum(moved for moved, _ in summary.values())
+            details = format_route_summary(summary)
+            if errors:
+                QMessageBox.warning(self, "Completed with Errors",
+                                    f"Moved {moved_count} files with {len(errors)} errors.\n\n{details}")
+            else:
+                QMessageBox.information(self, "Success", f"Successfully moved {moved_count} files.\n\n{details}")
+            self.result_label.setText(f"Moved {moved_count} files")
+        except Exception as ex:
+            QMessageBox.critical(self, "Error", f"An error occurred: {ex}")
+            self.result_label.setText(f"Error: {ex}")
+
 def organize_by_keyword(source_folder, target_folder, keywords, case_sensitive=False):
-    ensure_dir_exists(target_folder)
-    moved_count = 0
-    errors = []
-    
-    if not case_sensitive:
-        # Convert keywords to lowercase
-        keywords = [kw.lower() for kw in keywords]
-    
-    for root, _, files in os.walk(source_folder):
-        for file in files:
-            file_check = file if case_sensitive else file.lower()
-            if any(kw in file_check for kw in keywords):
-                src_path = os.path.join(root, file)
-                dest_path = os.path.join(target_folder, file)
-                counter = 1
-                while os.path.exists(dest_path):
-                    base, ext_ = os.path.splitext(file)
-                    dest_path = os.path.join(target_folder, f"{base} ({counter}){ext_}")
-                    counter += 1
-                try:
-                    shutil.move(src_path, dest_path)
-                    moved_count += 1
-                    logging.info(f"Moved {src_path} -> {dest_path}")
-                except Exception as ex:
-                    err_msg = f"Error moving {src_path}: {ex}"
-                    logging.error(err_msg)
-                    errors.append(err_msg)
-    return moved_count, errors
\ No newline at end of file
+    matcher = PatternMatcher(case_sensitive)
+    for kw in keywords:
+        matcher.add_text(kw, KIND_KEYWORD)
+    return move_matching(source_folder, target_folder, matcher,
+                         CONFIG.get("organiser_move_threads", DEFAULT_MOVE_THREADS))
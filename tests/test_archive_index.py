@@ -0,0 +1,103 @@
+import io, os, random, tarfile, zipfile
+from organiser.section32_archive_index import (LooseIndex, archive_kind, confirm_member, find_redundant_archives,
+                                               format_archive_report, covered_folders)
+
+
+def _tree(root):
+    rng = random.Random(5)
+    photos, docs, arch = root / "photos", root / "docs", root / "arch"
+    for folder in (photos, docs, arch):
+        folder.mkdir()
+    for i in range(6):
+        (photos / f"p{i}.bin").write_bytes(rng.randbytes(rng.randrange(1000, 200000)))
+    for i in range(3):
+        (docs / f"d{i}.bin").write_bytes(rng.randbytes(4000))
+    # Every photo, plus a folder entry and an empty member that do not count
+    with zipfile.ZipFile(arch / "photos.zip", "w", zipfile.ZIP_DEFLATED) as z:
+        for i in range(6):
+            z.write(photos / f"p{i}.bin", f"photos/p{i}.bin")
+        z.writestr("empty/", "")
+        z.writestr("zero.bin", "")
+    # The docs plus one file that exists nowhere else
+    with zipfile.ZipFile(arch / "docs.zip", "w") as z:
+        for i in range(3):
+            z.write(docs / f"d{i}.bin", f"d{i}.bin")
+        z.writestr("new.bin", rng.randbytes(4000))
+    # Same size as the docs, different content
+    with zipfile.ZipFile(arch / "decoy.zip", "w") as z:
+        z.writestr("x.bin", rng.randbytes(4000))
+    with tarfile.open(arch / "photos.tar.gz", "w:gz") as t:
+        for i in range(6):
+            t.add(photos / f"p{i}.bin", f"p{i}.bin")
+    with tarfile.open(arch / "decoy.tar", "w") as t:
+        data = rng.randbytes(4000)
+        info = tarfile.TarInfo("y.bin")
+        info.size = len(data)
+        t.addfile(info, io.BytesIO(data))
+    (arch / "broken.zip").write_bytes(b"PK not really a zip")
+
+
+def _by_name(results):
+    return {os.path.basename(r.path): r for r in results}
+
+
+def test_archive_kind():
+    assert archive_kind("/a/B.ZIP") == "zip"
+    assert archive_kind("/a/b.tar.gz") == "tar"
+    assert archive_kind("/a/b.tgz") == "tar"
+    assert archive_kind("/a/b.gz") is None
+    assert archive_kind("/a/b.txt") is None
+
+
+def test_confirm_member_picks_the_identical_file(tmp_path):
+    data = b"abc" * 1000
+    same, other = tmp_path / "same", tmp_path / "other"
+    same.write_bytes(data)
+    other.write_bytes(data[:-1] + b"x")
+    assert confirm_member(io.BytesIO(data), [str(other), str(same)]) == str(same)
+    assert confirm_member(io.BytesIO(data), [str(other), str(tmp_path / "gone")]) is None
+
+
+def test_loose_index_filters_by_crc(tmp_path):
+    loose = LooseIndex()
+    for name, data in (("a", b"1234"), ("b", b"5678"), ("c", b"")):
+        (tmp_path / name).write_bytes(data)
+        loose.add(str(tmp_path / name), len(data))
+    assert 0 not in loose.by_size
+    assert sorted(loose.candidates(4)) == [str(tmp_path / "a"), str(tmp_path / "b")]
+    crc = zipfile.crc32(b"5678")
+    assert loose.candidates(4, crc) == [str(tmp_path / "b")]
+
+
+def test_find_redundant_archives(tmp_path):
+    _tree(tmp_path)
+    results, folder_files = find_redundant_archives([str(tmp_path)], threads=2)
+    found = _by_name(results)
+    assert set(found) == {"photos.zip", "docs.zip", "decoy.zip", "photos.tar.gz", "decoy.tar", "broken.zip"}
+
+    assert found["photos.zip"].members == 6 and found["photos.zip"].redundant
+    assert found["photos.zip"].matched["photos/p0.bin"] == str(tmp_path / "photos" / "p0.bin")
+    assert found["photos.tar.gz"].redundant
+    assert (found["docs.zip"].members, len(found["docs.zip"].matched)) == (4, 3)
+    assert not found["docs.zip"].redundant
+    assert not found["decoy.zip"].matched and not found["decoy.tar"].matched
+    assert found["broken.zip"].error is not None and not found["broken.zip"].redundant
+
+    # Archives are not counted as loose files of their folder
+    assert folder_files == {str(tmp_path / "photos"): 6, str(tmp_path / "docs"): 3}
+    covered = covered_folders(results, folder_files)
+    assert (str(tmp_path / "docs"), str(tmp_path / "arch" / "docs.zip")) in covered
+    assert {folder for folder, _ in covered} == {str(tmp_path / "photos"), str(tmp_path / "docs")}
+
+
+def test_skip_dirs_and_report(tmp_path):
+    _tree(tmp_path)
+    results, folder_files = find_redundant_archives([str(tmp_path)], skip_dirs=[str(tmp_path / "docs")])
+    found = _by_name(results)
+    assert not found["docs.zip"].matched
+    report = format_archive_report(results, folder_files)
+    assert "Archives whose every file is also stored loose:" in report
+    assert f"{tmp_path / 'arch' / 'photos.zip'} (6 files)" in report
+    assert f"{tmp_path / 'photos'} => " in report
+    assert f"{tmp_path / 'arch' / 'broken.zip'}: " in report
+    assert format_archive_report([], {}) == ""
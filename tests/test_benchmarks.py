@@ -0,0 +1,43 @@
+import os, hashlib
+from benchmarks.tree_generator import generate_tree, list_files
+from benchmarks.run_benchmarks import SCENARIOS, BASELINE_PATH, load_baseline, save_baseline, compare
+
+
+def _tree_digest(root):
+    h = hashlib.sha256()
+    for path in sorted(list_files(root)):
+        h.update(os.path.relpath(path, root).encode("utf-8"))
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def test_same_seed_same_tree(tmp_path):
+    spec = {"files": 60, "empty_chains": 2}
+    generate_tree(str(tmp_path / "a"), spec, seed=7)
+    generate_tree(str(tmp_path / "b"), spec, seed=7)
+    generate_tree(str(tmp_path / "c"), spec, seed=8)
+    assert _tree_digest(str(tmp_path / "a")) == _tree_digest(str(tmp_path / "b"))
+    assert _tree_digest(str(tmp_path / "a")) != _tree_digest(str(tmp_path / "c"))
+
+
+def test_committed_baseline_covers_every_scenario():
+    baseline = load_baseline(BASELINE_PATH)
+    assert set(baseline) == set(SCENARIOS)
+
+
+def test_compare_verdicts():
+    base = {"x": {"median_s": 1.0, "scale": 1.0, "seed": 1}}
+    result = {"median_s": 2.0, "scale": 1.0, "seed": 1}
+    assert compare("x", result, base) == (2.0, "REGRESSION")
+    assert compare("x", dict(result, median_s=0.5), base) == (0.5, "improved")
+    assert compare("x", dict(result, median_s=1.1), base)[1] == "ok"
+    assert compare("x", dict(result, seed=2), base)[0] is None
+    assert compare("y", result, base) == (None, "no baseline")
+
+
+def test_save_baseline_merges(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    save_baseline({"a": {"median_s": 1.0}}, path)
+    save_baseline({"b": {"median_s": 2.0}}, path)
+    assert load_baseline(path) == {"a": {"median_s": 1.0}, "b": {"median_s": 2.0}}
@@ -0,0 +1,50 @@
+import os
+from organiser.section16_destination_index import DestinationIndex
+
+
+def _add(index, path, digest):
+    st = os.stat(path)
+    index.add(path, digest, st.st_size, st.st_mtime)
+
+
+def test_lookup_skips_deleted_and_changed_files(tmp_path):
+    organised = str(tmp_path / "org")
+    os.makedirs(organised)
+    a, b = os.path.join(organised, "a.txt"), os.path.join(organised, "b.txt")
+    for path in (a, b):
+        with open(path, "w") as f:
+            f.write("same")
+    index = DestinationIndex(organised, "sha256")
+    try:
+        _add(index, a, "d1")
+        index.commit()
+        assert index.lookup("d1") == a
+
+        os.remove(a)
+        assert index.lookup("d1") is None
+        assert len(index) == 0
+
+        _add(index, b, "d1")
+        with open(b, "w") as f:
+            f.write("edited since it was indexed")
+        assert index.lookup("d1") is None
+        assert len(index) == 0
+    finally:
+        index.close()
+
+
+def test_lookup_falls_through_to_a_live_copy(tmp_path):
+    organised = str(tmp_path / "org")
+    os.makedirs(organised)
+    paths = [os.path.join(organised, f"{n}.txt") for n in "ab"]
+    for path in paths:
+        with open(path, "w") as f:
+            f.write("same")
+    index = DestinationIndex(organised, "sha256")
+    try:
+        for path in paths:
+            _add(index, path, "d1")
+        os.remove(paths[0])
+        assert index.lookup("d1") == paths[1]
+    finally:
+        index.close()
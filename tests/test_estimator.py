@@ -0,0 +1,106 @@
+import time
+import organiser.section34_estimator as estimator
+from organiser.section34_estimator import (DuplicateSampler, DuplicateEstimate, partial_digest,
+                                           format_duration, format_estimate, PARTIAL_BYTES)
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path), len(data)
+
+
+def test_partial_digest_reads_head_and_tail_only(tmp_path):
+    big = bytes(range(256)) * (3 * PARTIAL_BYTES // 256)
+    path, size = _write(tmp_path / "big", big)
+    digest, _, _, nbytes = partial_digest(path, size)
+    assert nbytes == 2 * PARTIAL_BYTES
+    # A change in the middle goes unseen; one at the end does not
+    middle = bytearray(big)
+    middle[size // 2] ^= 1
+    assert partial_digest(_write(tmp_path / "middle", bytes(middle))[0], size)[0] == digest
+    tail = bytearray(big)
+    tail[-1] ^= 1
+    assert partial_digest(_write(tmp_path / "tail", bytes(tail))[0], size)[0] != digest
+
+
+def test_exact_count_when_nothing_is_sampled_away(tmp_path):
+    sampler = DuplicateSampler()
+    for i in range(6):
+        sampler.add(*_write(tmp_path / f"a{i}", b"same content"))
+    for i in range(3):
+        sampler.add(*_write(tmp_path / f"b{i}", b"other %d" % i))
+    for i in range(4):
+        sampler.add(*_write(tmp_path / f"e{i}", b""))
+    estimate = sampler.estimate(threads=2)
+    assert (estimate.files, estimate.bytes) == (13, 6 * 12 + 3 * 7)
+    # Five extra copies of the 12-byte file and three extra empty files
+    assert estimate.dup_files == 8
+    assert estimate.dup_bytes == 5 * 12
+    assert estimate.dup_files_ci == 0
+    assert estimate.sampled_files == 9
+    assert estimate.hashing_seconds() is not None
+
+
+def test_skip_size_leaves_large_files_out(tmp_path):
+    sampler = DuplicateSampler(skip_size=4)
+    for i in range(3):
+        sampler.add(*_write(tmp_path / f"big{i}", b"too large"))
+    sampler.add(*_write(tmp_path / "small", b"ok"))
+    estimate = sampler.estimate()
+    assert (estimate.files, estimate.dup_files) == (1, 0)
+
+
+def test_unreadable_files_are_skipped(tmp_path):
+    sampler = DuplicateSampler()
+    for i in range(3):
+        sampler.add(*_write(tmp_path / f"a{i}", b"dup"))
+    sampler.add(str(tmp_path / "gone"), 3)
+    estimate = sampler.estimate()
+    assert estimate.sampled_files == 3
+    # The bucket is judged from the files that could be read, and all of those match
+    assert estimate.dup_files == 3
+
+
+def test_sampled_strata_scale_to_the_whole(tmp_path, monkeypatch):
+    monkeypatch.setattr(estimator, "STRATUM_BUDGET", 4)
+    sampler = DuplicateSampler()
+    for size in range(64, 128):
+        data = bytes([size % 251]) * size
+        sampler.add(*_write(tmp_path / f"{size}a", data))
+        sampler.add(*_write(tmp_path / f"{size}b", data))
+    stratum = sampler.strata[7]
+    assert stratum.level > 0
+    assert len(stratum.buckets) <= 4
+    estimate = sampler.estimate()
+    # Every bucket kept holds one duplicate, scaled up by the sampling rate
+    assert estimate.dup_files == len(stratum.buckets) * 2 ** stratum.level
+    assert estimate.files == 128
+
+
+def test_deadline_stops_buckets_midway(tmp_path, monkeypatch):
+    def slow_digest(path, size):
+        time.sleep(0.05)
+        return b"same", 0.0, 0.05, size
+    monkeypatch.setattr(estimator, "partial_digest", slow_digest)
+    sampler = DuplicateSampler()
+    for i in range(200):
+        sampler.add(str(tmp_path / f"f{i}"), 10)
+    started = time.monotonic()
+    estimate = sampler.estimate(threads=1, seconds=0.3)
+    # The one bucket would take ten seconds to hash in full
+    assert time.monotonic() - started < 2
+    assert 1 < estimate.sampled_files < 200
+    # The part hashed is a sample of the bucket, so the count still covers all of it
+    assert estimate.dup_files == 199
+
+
+def test_format_estimate():
+    estimate = DuplicateEstimate()
+    estimate.files, estimate.bytes = 1000, 1024 ** 3
+    estimate.dup_files, estimate.dup_files_ci = 120, 15
+    estimate.open_seconds, estimate.read_rate = 0.001, 100 * 1024 * 1024
+    text = format_estimate(estimate, parallelism=2)
+    assert "120 files (± 15)" in text
+    assert "at 100 MB/s measured" in text
+    assert format_duration(30) == "under a minute"
+    assert format_duration(5400) == "about 1 h 30 min"
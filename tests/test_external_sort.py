@@ -0,0 +1,69 @@
+import os, random
+from organiser.section18_external_sort import PathTable, ExternalDigestSorter, SortedDigestIndex
+
+
+def _digest(n):
+    return f"{n:064x}"
+
+
+def _sorter(tmp_path, records, run_records=3):
+    sorter = ExternalDigestSorter(str(tmp_path), 32, "test", run_records)
+    for digest, size, path, year in records:
+        sorter.add(digest, size, path, year, 1000 + size)
+    sorter.finish()
+    return sorter
+
+
+def test_path_table_round_trip(tmp_path):
+    table = PathTable(str(tmp_path / "paths"))
+    ids = [table.append(p) for p in ("/a", "/b/ü.txt", "")]
+    assert [table.get(i) for i in ids] == ["/a", "/b/ü.txt", ""]
+    table.close()
+
+
+def test_runs_merge_in_digest_order(tmp_path):
+    rng = random.Random(3)
+    records = [(_digest(rng.randrange(50)), i, f"/f{i}", None) for i in range(40)]
+    sorter = _sorter(tmp_path, records)
+    assert len(sorter.runs) > 1
+    merged = list(sorter.iter_sorted())
+    assert [d for _, d, _, _, _ in merged] == sorted(d for d, _, _, _ in records)
+    assert sorted(p for p, _, _, _, _ in merged) == sorted(p for _, _, p, _ in records)
+    assert all(mtime_ns == 1000 + size for _, _, size, _, mtime_ns in merged)
+    sorter.close()
+
+
+def test_groups_carry_years_and_respect_min_size(tmp_path):
+    records = [(_digest(1), 5, "/a", 2019), (_digest(1), 5, "/b", None),
+               (_digest(2), 7, "/c", None), (_digest(3), 9, "/d", 2001)]
+    sorter = _sorter(tmp_path, records)
+    groups = list(sorter.iter_groups())
+    assert [sorted(p for p, _, _, _, _ in g) for g in groups] == [["/a", "/b"]]
+    assert {p: y for p, _, _, y, _ in groups[0]} == {"/a": 2019, "/b": None}
+    assert [len(g) for g in sorter.iter_groups(min_size=1)] == [2, 1, 1]
+    sorter.close()
+
+
+def test_large_groups_come_out_in_slices(tmp_path):
+    records = [(_digest(1), 1, f"/same{i}", None) for i in range(7)] + [(_digest(2), 1, "/other", None)]
+    sorter = _sorter(tmp_path, records)
+    groups = list(sorter.iter_groups(min_size=2, max_files=3))
+    assert [len(g) for g in groups] == [3, 3, 1]
+    assert all(d == _digest(1) for g in groups for _, d, _, _, _ in g)
+    sorter.close()
+
+
+def test_sorted_index_lookup(tmp_path):
+    records = [(_digest(n * 3), n, f"/f{n}", None) for n in range(20)]
+    sorter = _sorter(tmp_path, records)
+    index = SortedDigestIndex(sorter)
+    try:
+        assert len(index) == 20
+        assert index.lookup(_digest(9)) == "/f3"
+        assert index.lookup(_digest(10)) is None
+        assert index.lookup(_digest(0)) == "/f0"
+        assert index.lookup(_digest(1000)) is None
+        assert os.path.basename(sorter.runs[0]) == "test.sorted"
+    finally:
+        index.close()
+        sorter.close()
@@ -0,0 +1,71 @@
+import os, types
+import organiser.section23_io_scheduler as io_scheduler
+from organiser.section23_io_scheduler import plan_batches, run_batches
+
+
+def _fake_devices(monkeypatch, devices, rotational, offsets):
+    """
+    Files named <device>_<n> live on that device; rotational maps device to
+    is_rotational's answer and offsets maps file name to its first extent.
+    """
+    real_stat = os.stat
+
+    def fake_stat(path, *args, **kwargs):
+        st = real_stat(path, *args, **kwargs)
+        name = os.path.basename(path)
+        dev = devices.get(name.split("_")[0])
+        if dev is None:
+            return st
+        return types.SimpleNamespace(st_dev=dev, st_ino=st.st_ino, st_size=st.st_size)
+    monkeypatch.setattr(io_scheduler.os, "stat", fake_stat)
+    monkeypatch.setattr(io_scheduler, "is_rotational", lambda dev: rotational.get(dev))
+    monkeypatch.setattr(io_scheduler, "physical_offset", lambda path: offsets.get(os.path.basename(path)))
+
+
+def _touch(root, names):
+    paths = []
+    for name in names:
+        (root / name).write_bytes(name.encode())
+        paths.append(str(root / name))
+    return paths
+
+
+def _names(batch):
+    return [os.path.basename(p) for p in batch.paths]
+
+
+def test_spinning_disks_read_by_extent_then_inode(tmp_path, monkeypatch):
+    paths = _touch(tmp_path, ["hdd_a", "hdd_b", "hdd_c", "hdd_d"])
+    _fake_devices(monkeypatch, {"hdd": 1}, {1: True}, {"hdd_a": 900, "hdd_c": 100})
+    inodes = {os.path.basename(p): os.stat(p).st_ino for p in paths}
+    (batch,) = plan_batches(paths, wide_workers=8, hdd_workers=2)
+    assert (batch.dev, batch.rotational, batch.workers) == (1, True, 2)
+    # Files with a known extent first, by offset; the rest after them, by inode
+    assert _names(batch)[:2] == ["hdd_c", "hdd_a"]
+    assert _names(batch)[2:] == sorted(["hdd_b", "hdd_d"], key=inodes.get)
+
+
+def test_everything_but_spinning_disks_shares_one_wide_batch(tmp_path, monkeypatch):
+    names = ["ssd1_a", "hdd_a", "ssd2_a", "net_a", "ssd1_b", "hdd_b"]
+    paths = _touch(tmp_path, names) + [str(tmp_path / "gone")]
+    _fake_devices(monkeypatch, {"ssd1": 1, "ssd2": 2, "hdd": 3, "net": 4}, {1: False, 2: False, 3: True, 4: None}, {})
+    batches = plan_batches(paths, wide_workers=8, hdd_workers=2)
+    assert len(batches) == 2
+    hdd, wide = batches
+    assert (hdd.dev, hdd.workers, sorted(_names(hdd))) == (3, 2, ["hdd_a", "hdd_b"])
+    # SSDs, unknown devices and unstattable paths, in the order given
+    assert (wide.dev, wide.rotational, wide.workers) == (None, False, 8)
+    assert _names(wide) == ["ssd1_a", "ssd2_a", "net_a", "ssd1_b", "gone"]
+
+
+def test_two_spinning_disks_get_a_pool_each(tmp_path, monkeypatch):
+    paths = _touch(tmp_path, ["one_a", "two_a", "one_b"])
+    _fake_devices(monkeypatch, {"one": 1, "two": 2}, {1: True, 2: True}, {})
+    batches = plan_batches(paths, wide_workers=8, hdd_workers=3, use_fiemap=False)
+    assert sorted((b.dev, len(b.paths), b.workers) for b in batches) == [(1, 2, 3), (2, 1, 3)]
+
+
+def test_run_batches_yields_every_result(tmp_path):
+    paths = _touch(tmp_path, [f"f{i}" for i in range(30)])
+    batches = plan_batches(paths, wide_workers=2)
+    assert sorted(run_batches(batches, os.path.basename)) == sorted(f"f{i}" for i in range(30))
@@ -0,0 +1,155 @@
+import os, errno, types
+import pytest
+import organiser.section37_link_plan as link_plan
+from organiser.section2_configuration import CONFIG
+from organiser.section37_link_plan import (plan_link_dedup, apply_link_plan, replace_with_link, reflink,
+                                           MODE_AUTO, MODE_REFLINK, MODE_HARDLINK)
+
+
+@pytest.fixture(autouse=True)
+def _one_core(monkeypatch):
+    monkeypatch.setitem(CONFIG, "multiprocessing_cores", 1)
+
+
+def _files(root, names, data=b"same bytes"):
+    paths = []
+    for name in names:
+        path = root / name
+        path.write_bytes(data)
+        paths.append(str(path))
+    return paths
+
+
+def _ioctl_failing_with(code):
+    def ioctl(fd, request, arg):
+        raise OSError(code, os.strerror(code))
+    return ioctl
+
+
+def _ioctl_copying(fd, request, src_fd):
+    # Stands in for FICLONE on filesystems that have no reflinks: same bytes, new inode
+    os.lseek(src_fd, 0, os.SEEK_SET)
+    while True:
+        chunk = os.read(src_fd, 65536)
+        if not chunk:
+            break
+        os.write(fd, chunk)
+
+
+def _leftovers(folder):
+    return [name for name in os.listdir(folder) if ".fwlink-" in name]
+
+
+@pytest.mark.parametrize("code", [errno.EOPNOTSUPP, errno.EXDEV])
+def test_auto_mode_falls_back_to_a_hardlink(tmp_path, monkeypatch, code):
+    keep, dup = _files(tmp_path, ["keep", "dup"])
+    monkeypatch.setattr(link_plan, "FCNTL_AVAILABLE", True)
+    monkeypatch.setattr(link_plan, "fcntl", types.SimpleNamespace(ioctl=_ioctl_failing_with(code)), raising=False)
+    assert replace_with_link(keep, dup, MODE_AUTO) == MODE_HARDLINK
+    assert os.stat(keep).st_ino == os.stat(dup).st_ino
+    assert not _leftovers(tmp_path)
+
+
+def test_reflink_only_mode_does_not_fall_back(tmp_path, monkeypatch):
+    keep, dup = _files(tmp_path, ["keep", "dup"])
+    monkeypatch.setattr(link_plan, "FCNTL_AVAILABLE", True)
+    monkeypatch.setattr(link_plan, "fcntl",
+                        types.SimpleNamespace(ioctl=_ioctl_failing_with(errno.EOPNOTSUPP)), raising=False)
+    with pytest.raises(OSError):
+        replace_with_link(keep, dup, MODE_REFLINK)
+    assert os.stat(keep).st_ino != os.stat(dup).st_ino
+    assert not _leftovers(tmp_path)
+
+
+def test_reflink_keeps_permissions_and_mtime(tmp_path, monkeypatch):
+    keep, dup = _files(tmp_path, ["keep", "dup"])
+    os.chmod(dup, 0o640)
+    os.utime(dup, ns=(1_000_000_000, 1_234_567_890_000))
+    before = os.stat(dup)
+    monkeypatch.setattr(link_plan, "FCNTL_AVAILABLE", True)
+    monkeypatch.setattr(link_plan, "fcntl", types.SimpleNamespace(ioctl=_ioctl_copying), raising=False)
+    assert replace_with_link(keep, dup, MODE_AUTO) == MODE_REFLINK
+    after = os.stat(dup)
+    assert after.st_ino not in (before.st_ino, os.stat(keep).st_ino)
+    assert after.st_mode & 0o7777 == 0o640
+    assert after.st_mtime_ns == before.st_mtime_ns
+    assert open(dup, "rb").read() == b"same bytes"
+
+
+def test_failed_replace_removes_the_temporary_link(tmp_path, monkeypatch):
+    keep, dup = _files(tmp_path, ["keep", "dup"])
+    ino = os.stat(dup).st_ino
+
+    def failing_replace(src, dest):
+        raise OSError(errno.EACCES, "denied")
+    monkeypatch.setattr(link_plan.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        replace_with_link(keep, dup, MODE_HARDLINK)
+    assert os.stat(dup).st_ino == ino
+    assert not _leftovers(tmp_path)
+
+
+def test_reflink_cleans_up_when_the_clone_fails(tmp_path, monkeypatch):
+    keep, = _files(tmp_path, ["keep"])
+    monkeypatch.setattr(link_plan, "FCNTL_AVAILABLE", True)
+    monkeypatch.setattr(link_plan, "fcntl", types.SimpleNamespace(ioctl=_ioctl_failing_with(errno.EXDEV)),
+                        raising=False)
+    with pytest.raises(OSError):
+        reflink(keep, str(tmp_path / "clone"))
+    assert not (tmp_path / "clone").exists()
+
+
+def test_plan_counts_existing_links_and_skips_them(tmp_path):
+    a, b, c = _files(tmp_path, ["a", "b", "c"])
+    _files(tmp_path, ["other"], b"different!")
+    linked = str(tmp_path / "a_link")
+    os.link(a, linked)
+    plan = plan_link_dedup([str(tmp_path)], "sha256", 0)
+    assert plan.groups == [(a, [b, c], len(b"same bytes"))]
+    assert plan.already_linked == 1
+    assert plan.reclaimable == 2 * len(b"same bytes")
+    assert not plan.errors
+
+
+def test_plan_never_groups_across_devices(tmp_path, monkeypatch):
+    _files(tmp_path, ["a", "b", "other_dev"])
+    real_lstat = os.lstat
+
+    def fake_lstat(path, *args, **kwargs):
+        st = real_lstat(path, *args, **kwargs)
+        if os.path.basename(path).startswith("other_"):
+            return types.SimpleNamespace(st_mode=st.st_mode, st_size=st.st_size, st_dev=st.st_dev + 1,
+                                         st_ino=st.st_ino, st_mtime_ns=st.st_mtime_ns)
+        return st
+    monkeypatch.setattr(link_plan.os, "lstat", fake_lstat)
+    plan = plan_link_dedup([str(tmp_path)], "sha256", 0)
+    assert [(os.path.basename(keep), [os.path.basename(d) for d in dups]) for keep, dups, _ in plan.groups] == \
+        [("a", ["b"])]
+
+
+def test_apply_links_and_skips_files_changed_since_the_scan(tmp_path):
+    a, b, c, d = _files(tmp_path, ["a", "b", "c", "d"])
+    plan = plan_link_dedup([str(tmp_path)], "sha256", 0)
+    assert plan.duplicate_count() == 3
+    # Same size, new content and mtime: the scan's verdict no longer holds
+    with open(c, "wb") as f:
+        f.write(b"SAME BYTES")
+    os.utime(c, ns=(0, 10 ** 9))
+    os.unlink(d)
+    seen = []
+    linked, reclaimed, errors = apply_link_plan(plan, MODE_HARDLINK, progress=lambda done, total: seen.append(done))
+    assert (linked, reclaimed) == (1, len(b"same bytes"))
+    assert os.stat(a).st_ino == os.stat(b).st_ino
+    assert open(c, "rb").read() == b"SAME BYTES"
+    assert sorted(path for path, _ in errors) == [c, d]
+    assert seen == [1, 2, 3]
+
+
+def test_apply_skips_groups_whose_kept_copy_changed(tmp_path):
+    a, b = _files(tmp_path, ["a", "b"])
+    plan = plan_link_dedup([str(tmp_path)], "sha256", 0)
+    os.utime(a, ns=(0, 10 ** 9))
+    linked, _, errors = apply_link_plan(plan, MODE_HARDLINK)
+    assert linked == 0
+    assert [path for path, _ in errors] == [b]
+    assert os.stat(a).st_ino != os.stat(b).st_ino
@@ -0,0 +1,64 @@
+import os, struct
+from datetime import datetime
+import pytest
+from organiser import section4_hashing
+from organiser.section4_hashing import worker_hash_file
+from organiser.section25_throttle import install_throttle
+from organiser.section29_media_dates import DateSniffer, MAC_EPOCH
+from organiser.section33_xattr_digests import XATTR_AVAILABLE, write_digest
+
+
+def _mp4(mdat_size, moov_first=False):
+    created = int((datetime(2017, 3, 1) - MAC_EPOCH).total_seconds())
+    mvhd = struct.pack(">I4sB3sIIII", 108, b"mvhd", 0, b"\0\0\0", created, created, 1000, 5000) + b"\0" * 80
+    moov = struct.pack(">I4s", 8 + len(mvhd), b"moov") + mvhd
+    ftyp = struct.pack(">I4s", 16, b"ftyp") + b"isom" + b"\0" * 4
+    mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + mdat_size) + bytes(mdat_size)
+    return ftyp + moov + mdat if moov_first else ftyp + mdat + moov
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 16, 8192])
+def test_sniffer_finds_moov_in_any_chunking(chunk):
+    for moov_first in (False, True):
+        data = _mp4(50000, moov_first)
+        sniffer = DateSniffer("bmff")
+        for start in range(0, len(data), chunk):
+            sniffer.feed(data[start:start + chunk])
+        assert sniffer.year() == 2017
+
+
+def test_sniffer_seeks_over_mdat():
+    data = _mp4(50000)
+    sniffer = DateSniffer("bmff")
+    sniffer.feed(data[:16])
+    assert sniffer.skip_to() is None
+    sniffer.feed(data[16:32])
+    offset = sniffer.skip_to()
+    assert offset == len(data) - 116
+    sniffer.seek(offset)
+    sniffer.feed(data[offset:])
+    assert sniffer.year() == 2017
+
+
+class _CountingThrottle:
+    def __init__(self):
+        self.bytes = 0
+
+    def read(self, nbytes, seconds):
+        self.bytes += nbytes
+
+
+def test_tagged_video_is_not_read_in_full(tmp_path, monkeypatch):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(_mp4(4 * 1024 * 1024))
+    if not XATTR_AVAILABLE or not write_digest(str(path), "sha256", "0" * 64, os.stat(path)):
+        pytest.skip("No user xattrs here")
+    monkeypatch.setitem(section4_hashing.CONFIG, "xattr_digests", True)
+    counter = _CountingThrottle()
+    install_throttle(counter)
+    try:
+        result = worker_hash_file(str(path), "sha256", 0, sniff_dates=True)
+    finally:
+        install_throttle(None)
+    assert result[1] == "0" * 64 and result[5] == 2017
+    assert counter.bytes < 64 * 1024
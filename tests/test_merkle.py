@@ -0,0 +1,44 @@
+import os, ntpath, types
+import organiser.section20_merkle as merkle
+from organiser.section19_manifest import Manifest
+from organiser.section20_merkle import directory_digests, find_duplicate_directories
+
+
+def _manifest(files):
+    manifest = Manifest(32)
+    for path, digest in files:
+        manifest.add(path, digest, 1)
+    return manifest
+
+
+def _tree(root, join):
+    return [(join(root, "a", "x.txt"), "11" * 32), (join(root, "a", "y.txt"), "22" * 32),
+            (join(root, "b", "x.txt"), "11" * 32), (join(root, "b", "y.txt"), "22" * 32),
+            (join(root, "c", "x.txt"), "33" * 32)]
+
+
+def test_identical_folders_share_a_digest(tmp_path):
+    root = str(tmp_path)
+    digests = directory_digests(_manifest(_tree(root, os.path.join)), [root], "sha256")
+    a, b, c = (os.path.join(root, n) for n in "abc")
+    assert digests[a] == digests[b]
+    assert digests[a][1] == 2
+    assert digests[c][0] != digests[a][0]
+    assert find_duplicate_directories(digests) == [(b, 2, a)]
+
+
+def test_incomplete_folders_get_no_digest(tmp_path):
+    root = str(tmp_path)
+    manifest = _manifest(_tree(root, os.path.join))
+    manifest.mark_incomplete(os.path.join(root, "a", "broken.txt"))
+    digests = directory_digests(manifest, [root], "sha256")
+    assert os.path.join(root, "a") not in digests
+    assert os.path.join(root, "b") in digests
+
+
+def test_forward_slash_paths_on_windows(monkeypatch):
+    # Qt file dialogs return C:/... paths; the manifest keeps whatever it was given
+    monkeypatch.setattr(merkle, "os", types.SimpleNamespace(path=ntpath, sep="\\", fsencode=os.fsencode))
+    manifest = _manifest(_tree("C:/src", lambda *parts: "/".join(parts)))
+    digests = directory_digests(manifest, ["C:/src"], "sha256")
+    assert digests["C:\\src\\a"] == digests["C:\\src\\b"]
@@ -0,0 +1,64 @@
+import random
+from organiser.section27_pattern_matcher import (AhoCorasick, PatternMatcher, ParallelMover, move_matching,
+                                                 KIND_KEYWORD, KIND_EXTENSION)
+
+
+def test_aho_corasick_agrees_with_substring_search():
+    rng = random.Random(7)
+    patterns = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(30)]
+    automaton = AhoCorasick(patterns)
+    for _ in range(500):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 12)))
+        hits = [i for i, pattern in enumerate(patterns) if pattern in text]
+        assert automaton.search(text) == (hits[0] if hits else None)
+
+
+def test_first_added_rule_wins():
+    matcher = PatternMatcher()
+    matcher.add(KIND_EXTENSION, "pdf").add(KIND_KEYWORD, "Invoice").add_text("re:^scan_\\d+", KIND_KEYWORD)
+    assert matcher.match("invoice_march.PDF") == "pdf"
+    assert matcher.match("INVOICE.txt") == "Invoice"
+    assert matcher.match("scan_0042.png") == "re:^scan_\\d+"
+    assert matcher.match("holiday.jpg") is None
+
+
+def test_extensions_match_every_suffix():
+    matcher = PatternMatcher().add(KIND_EXTENSION, "tar.gz").add(KIND_EXTENSION, ".gz")
+    assert matcher.match("backup.tar.gz") == "tar.gz"
+    assert matcher.match("notes.gz") == ".gz"
+    assert matcher.match("gz") is None
+
+
+def test_case_sensitive_keywords():
+    matcher = PatternMatcher(case_sensitive=True).add(KIND_KEYWORD, "Draft").add_text("glob:*.TXT", KIND_KEYWORD)
+    assert matcher.match("Draft 2.doc") == "Draft"
+    assert matcher.match("draft 2.doc") is None
+    assert matcher.match("a.TXT") == "glob:*.TXT"
+    assert matcher.match("a.txt") is None
+
+
+def test_parallel_mover_keeps_same_names_apart(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir()
+    (target / "photo.jpg").write_text("already there")
+    mover = ParallelMover(threads=4)
+    for i in range(5):
+        folder = tmp_path / f"src{i}"
+        folder.mkdir()
+        (folder / "photo.jpg").write_text(str(i))
+        mover.submit(str(folder / "photo.jpg"), str(target))
+    moved, errors = mover.finish()
+    assert (moved, errors) == (5, [])
+    contents = sorted(p.read_text() for p in target.iterdir())
+    assert contents == ["0", "1", "2", "3", "4", "already there"]
+
+
+def test_move_matching_skips_a_target_inside_the_source(tmp_path):
+    (tmp_path / "report.pdf").write_text("a")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "other.pdf").write_text("b")
+    (tmp_path / "keep.txt").write_text("c")
+    moved, errors = move_matching(str(tmp_path), str(tmp_path / "pdfs"), PatternMatcher().add(KIND_EXTENSION, "pdf"))
+    assert (moved, errors) == (2, [])
+    assert sorted(p.name for p in (tmp_path / "pdfs").iterdir()) == ["other.pdf", "report.pdf"]
+    assert (tmp_path / "keep.txt").exists()
@@ -0,0 +1,42 @@
+import os
+from organiser.section38_quarantine_store import QuarantineStore
+
+
+def _store_with(tmp_path, count):
+    organised = str(tmp_path / "org")
+    os.makedirs(organised)
+    store = QuarantineStore(organised, "sha256")
+    for i in range(count):
+        path = str(tmp_path / f"f{i}.txt")
+        with open(path, "w") as f:
+            f.write(str(i))
+        store.put(path, f"{i:064x}")
+    return store
+
+
+def test_entries_page_through_everything_once(tmp_path):
+    store = _store_with(tmp_path, 23)
+    try:
+        seen, page = [], store.entries(5)
+        while page:
+            seen.extend(page)
+            page = store.entries(5, page[-1])
+        assert len(seen) == store.count() == 23
+        assert len({row[0] for row in seen}) == 23
+        times = [row[3] for row in seen]
+        assert times == sorted(times, reverse=True)
+    finally:
+        store.close()
+
+
+def test_restore_puts_the_file_back(tmp_path):
+    store = _store_with(tmp_path, 1)
+    try:
+        (entry_id, original_path, _, _), = store.entries()
+        assert not os.path.exists(original_path)
+        assert store.restore(entry_id) == original_path
+        with open(original_path) as f:
+            assert f.read() == "0"
+        assert store.count() == 0
+    finally:
+        store.close()
@@ -0,0 +1,137 @@
+import socket, sqlite3, hashlib, socketserver, threading, multiprocessing
+import pytest
+from functools import partial
+from organiser.section4_hashing import worker_hash_file
+from organiser.section26_remote_hashing import HashWorkerServer, RemoteWorker, RemoteHashPool, DigestCache, main
+from organiser.section33_xattr_digests import UNDATED
+from tests.test_media_dates import _mp4
+
+
+def _free_address():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "127.0.0.1:%d" % sock.getsockname()[1]
+
+
+def _make_files(root, count):
+    expected = {}
+    for i in range(count):
+        path = root / f"file{i}.txt"
+        data = f"contents {i}".encode()
+        path.write_bytes(data)
+        expected[str(path)] = hashlib.sha256(data).hexdigest()
+    return expected
+
+
+def test_down_worker_falls_back_to_local_pool(tmp_path):
+    expected = _make_files(tmp_path, 20)
+    # Nothing listens on this port, so the whole share is handed to the local pool
+    worker = RemoteWorker(_free_address(), local_prefix=str(tmp_path), remote_prefix="/srv", token="t")
+    remote = RemoteHashPool([worker], "sha256", 0)
+    local_worker = partial(worker_hash_file, algo="sha256", skip_size=0, sniff_dates=True)
+    with multiprocessing.Pool(2) as pool:
+        results = list(remote.imap(list(expected), pool, local_worker))
+    assert all(len(result) == 6 for result in results)
+    assert {path: digest for path, digest, err, size, mtime_ns, year in results} == expected
+    assert all(err is None and mtime_ns for _, _, err, _, mtime_ns, _ in results)
+
+
+def _start_daemon(token="t"):
+    server = HashWorkerServer("127.0.0.1:0", processes=2, token=token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "127.0.0.1:%d" % server.server.server_address[1]
+
+
+def test_shares_are_hashed_by_their_own_daemons(tmp_path):
+    expected = {}
+    daemons = []
+    workers = []
+    try:
+        for name in ("a", "b"):
+            share = tmp_path / name
+            share.mkdir()
+            server, address = _start_daemon()
+            daemons.append(server)
+            # The coordinator sees the share under /mnt; the daemon under its real path
+            workers.append(RemoteWorker(address, local_prefix=f"/mnt/{name}", remote_prefix=str(share), token="t"))
+            expected.update({path.replace(str(share), f"/mnt/{name}"): digest
+                             for path, digest in _make_files(share, 300).items()})
+        remote = RemoteHashPool(workers, "sha256", 0)
+        with multiprocessing.Pool(1) as pool:
+            results = list(remote.imap(list(expected), pool, partial(worker_hash_file, algo="sha256", skip_size=0)))
+        assert {path: digest for path, digest, err, size, mtime_ns, year in results} == expected
+        assert all(server.cache for server in daemons)
+    finally:
+        for server in daemons:
+            server.shutdown()
+
+
+def test_daemons_read_capture_years_and_the_cache_keeps_them(tmp_path):
+    share = tmp_path / "share"
+    share.mkdir()
+    (share / "clip.mp4").write_bytes(_mp4(10000))
+    (share / "notes.txt").write_bytes(b"no date here")
+    paths = [str(share / "clip.mp4"), str(share / "notes.txt")]
+    organised = tmp_path / "org"
+    organised.mkdir()
+    server, address = _start_daemon()
+    try:
+        local_worker = partial(worker_hash_file, algo="sha256", skip_size=0, sniff_dates=True)
+        for sniff_dates, years in ((True, [2017, None]), (False, [None, None])):
+            worker = RemoteWorker(address, local_prefix=str(share), token="t")
+            remote = RemoteHashPool([worker], "sha256", 0, DigestCache(str(organised), "sha256"),
+                                    sniff_dates=sniff_dates)
+            with multiprocessing.Pool(1) as pool:
+                results = {path: year for path, _, _, _, _, year in remote.imap(paths, pool, local_worker)}
+            assert [results[path] for path in paths] == years
+        cache = DigestCache(str(organised), "sha256")
+        assert [hint[3] for hint in cache.hints(paths)] == [2017, UNDATED]
+        cache.close()
+    finally:
+        server.shutdown()
+
+
+def test_digest_cache_adds_the_year_column(tmp_path):
+    organised = tmp_path / "org"
+    cache = DigestCache(str(organised), "md5")
+    cache.close()
+    # A cache from before years were kept
+    conn = sqlite3.connect(cache.path)
+    conn.execute("DROP TABLE digests")
+    conn.execute("CREATE TABLE digests (path TEXT NOT NULL, algo TEXT NOT NULL, size INTEGER, mtime_ns INTEGER, "
+                 "digest TEXT NOT NULL, PRIMARY KEY (path, algo))")
+    conn.execute("INSERT INTO digests VALUES ('/a', 'md5', 1, 2, 'ab')")
+    conn.commit()
+    conn.close()
+    cache = DigestCache(str(organised), "md5")
+    assert cache.hints(["/a", "/b"]) == [[1, 2, "ab", None], None]
+    cache.store([("/b", "cd", 3, 4, 2020)])
+    assert cache.hints(["/b"]) == [[3, 4, "cd", 2020]]
+    cache.close()
+
+
+def test_daemon_rejects_a_wrong_token():
+    server, address = _start_daemon()
+    try:
+        assert RemoteWorker(address, token="t").ping() is not None
+        assert RemoteWorker(address, token="wrong").ping() is None
+    finally:
+        server.shutdown()
+
+
+def test_daemon_leaves_the_stdlib_servers_alone():
+    server, _ = _start_daemon()
+    try:
+        assert server.server.daemon_threads and server.server.allow_reuse_address
+        assert not socketserver.ThreadingTCPServer.daemon_threads
+        assert not socketserver.TCPServer.allow_reuse_address
+    finally:
+        server.shutdown()
+
+
+def test_tcp_daemon_needs_a_token(monkeypatch):
+    monkeypatch.delenv("FILEWIZARD_WORKER_TOKEN", raising=False)
+    with pytest.raises(ValueError):
+        HashWorkerServer("127.0.0.1:0", processes=1)
+    with pytest.raises(SystemExit):
+        main(["--listen", "127.0.0.1:0"])
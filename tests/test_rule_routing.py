@@ -0,0 +1,31 @@
+import time
+from organiser import section27_pattern_matcher
+from organiser.section27_pattern_matcher import KIND_KEYWORD
+from organiser.section28_rule_routing import parse_routes, route_matching
+
+
+def test_parse_routes():
+    text = "# comment\ninvoice => Finance/{year}\n\nreceipt\n"
+    assert parse_routes(text) == [("invoice", "Finance/{year}"), ("receipt", "{keyword}")]
+
+
+def test_counts_come_from_each_move(tmp_path, monkeypatch):
+    source = tmp_path / "in"
+    source.mkdir()
+    for i in range(40):
+        (source / f"invoice{i}{'_bad' if i % 4 == 0 else ''}.txt").write_text(str(i))
+    real_move = section27_pattern_matcher.shutil.move
+
+    def move(src, dest):
+        # Overlap the moves so successes and failures land while others are in flight
+        time.sleep(0.01)
+        if "_bad" in src:
+            raise OSError("refused")
+        return real_move(src, dest)
+
+    monkeypatch.setattr(section27_pattern_matcher.shutil, "move", move)
+    summary, errors = route_matching(str(source), str(tmp_path / "out"), [("invoice", "{keyword}")],
+                                     KIND_KEYWORD, threads=8)
+    assert summary == {"invoice": (30, 10)}
+    assert len(errors) == 10
+    assert len(list((tmp_path / "out" / "invoice").iterdir())) == 30
@@ -0,0 +1,56 @@
+import os
+from organiser.section24_scanner import scan, scan_files, scan_summary, ENTRY_DIR, ENTRY_FILE
+
+
+def _make_tree(root):
+    for i in range(4):
+        folder = root / f"d{i}" / "inner"
+        folder.mkdir(parents=True)
+        for j in range(5):
+            (folder / f"f{j}.txt").write_bytes(b"x" * j)
+        (root / f"d{i}" / "top.txt").write_bytes(b"y")
+    (root / "empty").mkdir()
+
+
+def _walk(root):
+    files, dirs = set(), set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirs.update(os.path.join(dirpath, d) for d in dirnames)
+        files.update(os.path.join(dirpath, f) for f in filenames)
+    return files, dirs
+
+
+def test_scan_matches_os_walk(tmp_path):
+    _make_tree(tmp_path)
+    os.symlink(tmp_path / "d0", tmp_path / "link")
+    files, dirs = _walk(str(tmp_path))
+    entries = list(scan([str(tmp_path)], threads_per_device=3))
+    assert {path for kind, path, _ in entries if kind == ENTRY_FILE} == files
+    # The symlinked folder is reported but not entered
+    assert {path for kind, path, _ in entries if kind == ENTRY_DIR} == dirs
+    assert len(entries) == len(files) + len(dirs)
+
+
+def test_skip_dirs_and_missing_roots(tmp_path):
+    _make_tree(tmp_path)
+    skipped = str(tmp_path / "d1")
+    found = set(scan_files([str(tmp_path), str(tmp_path / "missing")], skip_dirs=(skipped,)))
+    assert found and not any(path.startswith(skipped + os.sep) for path in found)
+    assert len(found) == 18
+
+
+def test_scan_summary_counts_like_a_walk(tmp_path):
+    _make_tree(tmp_path)
+    seen = []
+    files, folders, size, paths = scan_summary([str(tmp_path)], observer=lambda path, size: seen.append(size))
+    assert (files, folders, size) == (24, 9, 4 * (0 + 1 + 2 + 3 + 4 + 1))
+    assert len(paths) == len(seen) == 24
+    assert scan_summary([str(tmp_path)], collect_limit=10)[3] is None
+
+
+def test_abandoned_scan_winds_down(tmp_path):
+    _make_tree(tmp_path)
+    entries = scan([str(tmp_path)], threads_per_device=2)
+    next(entries)
+    entries.close()
+    assert len(list(scan_files([str(tmp_path)]))) == 24
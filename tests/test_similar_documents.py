@@ -0,0 +1,124 @@
+import random, zipfile
+import pytest
+from organiser import section31_similar_documents
+from organiser.section31_similar_documents import (lsh_shape, extract_text, is_text_document, SignatureCache,
+                                                   worker_document_signature, group_similar_documents, NUM_PERM)
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.8, 0.9])
+def test_lsh_shape_puts_the_curve_just_below_the_threshold(threshold):
+    bands, rows = lsh_shape(threshold)
+    assert bands * rows == NUM_PERM
+    midpoint = (1 / bands) ** (1 / rows)
+    assert midpoint <= threshold
+    # No other split of the signature sits closer below the threshold
+    for r in range(1, NUM_PERM + 1):
+        if NUM_PERM % r == 0:
+            other = (r / NUM_PERM) ** (1 / r)
+            assert not midpoint < other <= threshold
+
+
+def test_lsh_shape_examples():
+    assert lsh_shape(0.8) == (16, 8)
+    assert lsh_shape(0.5, 12) == (6, 2)
+    # Nothing fits below a tiny threshold; one row per band is the most lenient there is
+    assert lsh_shape(0.01) == (NUM_PERM, 1)
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def _words(text):
+    return text.split()
+
+
+def test_extract_plain_text_and_rtf(tmp_path):
+    (tmp_path / "notes.txt").write_bytes("Grüße from the notes".encode("utf-8"))
+    assert extract_text(str(tmp_path / "notes.txt")) == "Grüße from the notes"
+    (tmp_path / "letter.rtf").write_bytes(rb"{\rtf1\ansi\deff0 {\b Dear} reader,\par see you\par}")
+    assert _words(extract_text(str(tmp_path / "letter.rtf"))) == ["Dear", "reader,", "see", "you"]
+
+
+def test_extract_zipped_documents(tmp_path):
+    docx = _zip(tmp_path / "report.docx", {
+        "word/document.xml": "<w:document><w:p><w:r><w:t>Quarterly</w:t></w:r><w:r><w:t>report</w:t></w:r></w:p>"
+                             "</w:document>",
+        "word/styles.xml": "<w:styles>Heading</w:styles>"})
+    assert _words(extract_text(docx)) == ["Quarterly", "report"]
+    odt = _zip(tmp_path / "minutes.odt", {"content.xml": "<office:text><text:p>Meeting minutes</text:p></office:text>",
+                                          "meta.xml": "<meta>Author</meta>"})
+    assert _words(extract_text(odt)) == ["Meeting", "minutes"]
+    epub = _zip(tmp_path / "book.epub", {"mimetype": "application/epub+zip",
+                                         "OEBPS/ch1.xhtml": "<html><body><p>Chapter one</p></body></html>",
+                                         "OEBPS/ch2.html": "<p>Chapter two</p>",
+                                         "OEBPS/style.css": "p { margin: 0 }"})
+    assert _words(extract_text(epub)) == ["Chapter", "one", "Chapter", "two"]
+
+
+def test_extract_text_stops_at_the_byte_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(section31_similar_documents, "MAX_TEXT_BYTES", 10)
+    (tmp_path / "long.txt").write_bytes(b"0123456789abcdef")
+    assert extract_text(str(tmp_path / "long.txt")) == "0123456789"
+    epub = _zip(tmp_path / "book.epub", {"a.html": "abcdefgh", "b.html": "ijklmnop", "c.html": "qrstuvwx"})
+    assert extract_text(epub).replace(" ", "") == "abcdefghij"
+
+
+def test_is_text_document():
+    assert is_text_document("/a/B.DOCX") and is_text_document("/a/b.md")
+    assert not is_text_document("/a/b.pdf")
+
+
+def test_signature_cache(tmp_path):
+    cache = SignatureCache(str(tmp_path))
+    cache.put("/a.txt", 10, 100, b"sig-a")
+    cache.put("/empty.txt", 0, 100, None)
+    cache.put("/gone.txt", 5, 100, b"sig-gone")
+    cache.close()
+    cache = SignatureCache(str(tmp_path))
+    assert cache.get("/a.txt", 10, 100) == (True, b"sig-a")
+    assert cache.get("/empty.txt", 0, 100) == (True, None)
+    # A changed size or mtime is a miss
+    assert cache.get("/a.txt", 11, 100) == (False, None)
+    assert cache.get("/a.txt", 10, 101) == (False, None)
+    assert cache.get("/new.txt", 1, 1) == (False, None)
+    cache.close()
+    # Rows neither looked up nor stored in a run are dropped at its end
+    cache = SignatureCache(str(tmp_path))
+    assert cache.get("/gone.txt", 5, 100) == (False, None)
+    assert cache.get("/a.txt", 10, 100) == (True, b"sig-a")
+    cache.close(prune=False)
+    # That run did not prune, so what it left alone is still there
+    cache = SignatureCache(str(tmp_path))
+    assert cache.get("/empty.txt", 0, 100) == (True, None)
+    assert cache.get("/a.txt", 10, 100) == (True, b"sig-a")
+    cache.close()
+
+
+def test_group_similar_documents(tmp_path):
+    if not section31_similar_documents.NUMPY_AVAILABLE:
+        pytest.skip("NumPy not installed")
+    rng = random.Random(4)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    draft = [rng.choice(vocabulary) for _ in range(600)]
+    revised = list(draft)
+    revised[300] = "changed"
+    texts = {"draft.txt": draft, "other.txt": [rng.choice(vocabulary) for _ in range(600)],
+             "revised.md": revised, "copy.txt": draft, "blank.txt": []}
+    signatures = {}
+    for name, words in texts.items():
+        (tmp_path / name).write_text(" ".join(words))
+        path, signature, error = worker_document_signature(str(tmp_path / name))
+        assert error is None
+        signatures[name] = signature
+    assert signatures["blank.txt"] is None
+    names = [name for name in texts if signatures[name] is not None]
+    groups = group_similar_documents([signatures[name] for name in names], threshold=0.8)
+    assert len(groups) == 1
+    members, similarity = groups[0]
+    assert sorted(names[i] for i in members) == ["copy.txt", "draft.txt", "revised.md"]
+    assert 0.8 <= similarity < 1.0
+    assert group_similar_documents([]) == []
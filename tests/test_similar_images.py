@@ -0,0 +1,72 @@
+import random
+import pytest
+from organiser import section30_similar_images
+from organiser.section30_similar_images import group_similar, hamming, ImageHashCache
+
+
+def _hashes(seed=1, count=400):
+    rng = random.Random(seed)
+    values = []
+    for _ in range(count):
+        value = rng.getrandbits(64)
+        values.append(value)
+        if rng.random() < 0.4:
+            for _ in range(rng.randint(0, 6)):
+                value ^= 1 << rng.randrange(64)
+            values.append(value)
+    # Exact repeats and one large bucket of near-identical hashes
+    return values + values[:20] + [0xFF00FF00FF00FF00 ^ (1 << i) for i in range(40)]
+
+
+def _brute_force(values, max_distance):
+    parent = list(range(len(values)))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(len(values)):
+        for j in range(i):
+            if hamming(values[i], values[j]) <= max_distance:
+                a, b = find(i), find(j)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+    groups = {}
+    for i in range(len(values)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(sorted(g) for g in groups.values() if len(g) > 1)
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 6])
+def test_bktree_grouping_matches_brute_force(monkeypatch, max_distance):
+    monkeypatch.setattr(section30_similar_images, "NUMPY_AVAILABLE", False)
+    values = _hashes()
+    assert sorted(sorted(g) for g in group_similar(values, max_distance)) == _brute_force(values, max_distance)
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 6])
+def test_numpy_grouping_in_small_slabs_matches_brute_force(monkeypatch, max_distance):
+    if not section30_similar_images.NUMPY_AVAILABLE:
+        pytest.skip("NumPy not installed")
+    # A few rows per step, so every bucket is compared in several slabs
+    monkeypatch.setattr(section30_similar_images, "PAIR_CELLS", 64)
+    values = _hashes()
+    assert sorted(sorted(g) for g in group_similar(values, max_distance)) == _brute_force(values, max_distance)
+
+
+def test_image_hash_cache(tmp_path):
+    cache = ImageHashCache(str(tmp_path))
+    cache.put("/a.jpg", 10, 100, 0xFFFFFFFFFFFFFFFF, 640 * 480)
+    cache.put("/broken.jpg", 5, 100, None, 0)
+    cache.put("/gone.jpg", 5, 100, 1, 1)
+    cache.close()
+    cache = ImageHashCache(str(tmp_path))
+    assert cache.get("/a.jpg", 10, 100) == (0xFFFFFFFFFFFFFFFF, 640 * 480)
+    assert cache.get("/a.jpg", 10, 101) is None
+    assert cache.get("/broken.jpg", 5, 100) == (None, 0)
+    cache.close()
+    # Rows not looked up in a run are dropped at its end
+    cache = ImageHashCache(str(tmp_path))
+    assert cache.get("/gone.jpg", 5, 100) is None
+    cache.close()
@@ -0,0 +1,89 @@
+import os
+from organiser.section35_snapshots import (SnapshotWriter, Snapshot, diff_snapshots, list_snapshots,
+                                           ADDED, REMOVED, MODIFIED, MOVED)
+
+
+def _digest(n):
+    return f"{n:064x}"
+
+
+def _write(organised, files, run_records=2):
+    writer = SnapshotWriter(str(organised), "organised", "sha256", 32, run_records)
+    for path, digest in files:
+        writer.add(str(path), digest)
+    return writer
+
+
+def _read(snap_path):
+    snapshot = Snapshot(snap_path)
+    try:
+        return {entry.path: entry.digest for entry in snapshot}
+    finally:
+        snapshot.close()
+
+
+def test_round_trip_and_lookup(tmp_path):
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    files = []
+    for i in range(7):
+        (tree / f"f{i}").write_text(str(i))
+        files.append((tree / f"f{i}", _digest(i) if i % 3 else None))
+    snap_path = _write(tmp_path, files).finish()
+    snapshot = Snapshot(snap_path)
+    try:
+        assert len(snapshot) == 7
+        entry = snapshot.lookup(str(tree / "f4"))
+        assert entry.digest == _digest(4) and entry.same_stat(os.stat(tree / "f4"))
+        assert snapshot.lookup(str(tree / "f3")).digest is None
+        assert snapshot.lookup(str(tree / "missing")) is None
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_holds_the_end_state(tmp_path):
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    for name in ("kept", "moved", "back"):
+        (tree / name).write_text(name)
+    writer = _write(tmp_path, [(tree / "kept", _digest(1)), (tree / "moved", _digest(2)), (tree / "back", _digest(3))])
+    # Moved out during the run; "back" is replaced by another file afterwards
+    writer.remove(str(tree / "moved"))
+    writer.remove(str(tree / "back"))
+    writer.add(str(tree / "back"), _digest(4))
+    writer.add(str(tree / "kept"), _digest(5))
+    assert _read(writer.finish()) == {str(tree / "kept"): _digest(5), str(tree / "back"): _digest(4)}
+    # The run files are gone once the snapshot is written
+    left = os.listdir(tmp_path / ".filewizard" / "snapshots")
+    assert sorted(os.path.splitext(name)[1] for name in left) == [".paths", ".snap"]
+
+
+def test_diff_between_runs(tmp_path):
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    for i in range(4):
+        (tree / f"f{i}").write_text(str(i))
+    _write(tmp_path, [(tree / f"f{i}", _digest(i)) for i in range(4)]).finish()
+    (tree / "f0").write_text("changed")
+    os.rename(tree / "f1", tree / "renamed")
+    os.remove(tree / "f2")
+    (tree / "new").write_text("new")
+    current = [(tree / "f0", _digest(10)), (tree / "renamed", _digest(1)), (tree / "f3", _digest(3)),
+               (tree / "new", _digest(11))]
+    _write(tmp_path, current).finish()
+    old_path, new_path = list_snapshots(str(tmp_path), "organised")
+    old, new = Snapshot(old_path), Snapshot(new_path)
+    try:
+        changes = {(kind, os.path.basename((new_entry or old_entry).path)) for kind, old_entry, new_entry
+                   in diff_snapshots(old, new)}
+    finally:
+        old.close()
+        new.close()
+    assert changes == {(MODIFIED, "f0"), (MOVED, "renamed"), (REMOVED, "f2"), (ADDED, "new")}
+
+
+def test_old_snapshots_are_pruned(tmp_path):
+    (tmp_path / "f").write_text("x")
+    for _ in range(3):
+        _write(tmp_path, [(tmp_path / "f", _digest(1))]).finish(keep=2)
+    assert len(list_snapshots(str(tmp_path), "organised")) == 2
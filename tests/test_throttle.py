@@ -0,0 +1,28 @@
+import sys, time, subprocess
+from organiser.section25_throttle import Throttle, MB
+
+
+def test_headless_modules_do_not_need_qt():
+    # Hashing workers and the remote hashing daemon run on machines without PyQt5
+    code = ("import sys, organiser.section4_hashing, organiser.section26_remote_hashing; "
+            "sys.exit(any(m.split('.')[0] == 'PyQt5' for m in sys.modules))")
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_read_limit_paces_reads():
+    throttle = Throttle(read_rate=4 * MB)
+    started = time.monotonic()
+    for _ in range(8):
+        throttle.read(MB, 0.0)
+    # One second of burst, then 4 MB/s
+    assert time.monotonic() - started >= 0.9
+
+
+def test_limits_change_on_the_fly():
+    throttle = Throttle(read_rate=MB, latency_ms=50)
+    throttle.set_limits(read_rate=0, latency_ms=0)
+    assert throttle.reads.rate == 0
+    assert throttle.scale == 1.0
+    started = time.monotonic()
+    throttle.read(100 * MB, 0.0)
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,41 @@
+import os
+import pytest
+from organiser.section4_hashing import verify_identical, unverified_paths
+
+
+def _files(root, contents):
+    paths = {}
+    for name, data in contents.items():
+        (root / name).write_bytes(data)
+        paths[name] = str(root / name)
+    return paths
+
+
+def test_verify_identical_splits_matches_differences_and_errors(tmp_path):
+    paths = _files(tmp_path, {"ref": b"x" * 5000, "same": b"x" * 5000, "late": b"x" * 4999 + b"y",
+                              "short": b"x" * 10})
+    gone = str(tmp_path / "gone")
+    candidates = [paths["same"], paths["late"], paths["short"], gone]
+    identical, errors = verify_identical(paths["ref"], candidates, chunk_size=1024)
+    assert identical == [paths["same"]]
+    assert [path for path, _ in errors] == [gone]
+    # Only the missing file is undecided; the others were compared
+    assert unverified_paths(paths["ref"], candidates, errors) == {gone}
+
+
+def test_unreadable_reference_leaves_every_candidate_unverified(tmp_path):
+    paths = _files(tmp_path, {"a": b"1", "b": b"1"})
+    reference = str(tmp_path / "gone")
+    identical, errors = verify_identical(reference, list(paths.values()))
+    assert identical == []
+    assert unverified_paths(reference, list(paths.values()), errors) == set(paths.values())
+
+
+def test_unreadable_candidate(tmp_path):
+    if os.geteuid() == 0:
+        pytest.skip("root reads files whatever their mode")
+    paths = _files(tmp_path, {"ref": b"abc", "locked": b"abc"})
+    os.chmod(paths["locked"], 0)
+    identical, errors = verify_identical(paths["ref"], [paths["locked"]])
+    assert identical == []
+    assert unverified_paths(paths["ref"], [paths["locked"]], errors) == {paths["locked"]}
@@ -0,0 +1,68 @@
+import os
+import pytest
+from organiser import section4_hashing
+from organiser.section4_hashing import worker_hash_file
+from organiser.section25_throttle import install_throttle
+from organiser.section33_xattr_digests import XATTR_AVAILABLE, UNDATED, read_digest, write_digest, retag
+from tests.test_media_dates import _mp4, _CountingThrottle
+
+
+@pytest.fixture
+def tagged_file(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"hashed")
+    if not XATTR_AVAILABLE or not write_digest(str(path), "sha256", "0" * 64, os.stat(path)):
+        pytest.skip("No user xattrs here")
+    return str(path)
+
+
+def test_tag_follows_the_stat(tagged_file):
+    st = os.stat(tagged_file)
+    assert read_digest(tagged_file, "sha256", st) == ("0" * 64, None)
+    with open(tagged_file, "ab") as f:
+        f.write(b" and changed")
+    assert read_digest(tagged_file, "sha256", os.stat(tagged_file)) is None
+
+
+def test_tag_keeps_the_year(tagged_file):
+    st = os.stat(tagged_file)
+    assert write_digest(tagged_file, "sha256", "2" * 64, st, 2019)
+    assert read_digest(tagged_file, "sha256", st) == ("2" * 64, 2019)
+    assert write_digest(tagged_file, "sha256", "2" * 64, st, UNDATED)
+    assert read_digest(tagged_file, "sha256", st) == ("2" * 64, UNDATED)
+
+
+def test_retag_skips_a_file_changed_since_it_was_hashed(tagged_file):
+    st = os.stat(tagged_file)
+    assert retag(tagged_file, "sha256", "1" * 64, st.st_size, st.st_mtime_ns, 2015)
+    assert read_digest(tagged_file, "sha256", os.stat(tagged_file)) == ("1" * 64, 2015)
+    with open(tagged_file, "ab") as f:
+        f.write(b" and changed")
+    assert not retag(tagged_file, "sha256", "1" * 64, st.st_size, st.st_mtime_ns)
+    assert read_digest(tagged_file, "sha256", os.stat(tagged_file)) is None
+
+
+def _hash_counting(path):
+    counter = _CountingThrottle()
+    install_throttle(counter)
+    try:
+        return worker_hash_file(path, "sha256", 0, sniff_dates=True), counter.bytes
+    finally:
+        install_throttle(None)
+
+
+def test_tagged_year_spares_the_read(tmp_path, monkeypatch):
+    video, text = tmp_path / "clip.mp4", tmp_path / "notes.jpg"
+    video.write_bytes(_mp4(100000))
+    text.write_bytes(b"not really a photo")
+    if not XATTR_AVAILABLE or not write_digest(str(video), "sha256", "0" * 64, os.stat(video)):
+        pytest.skip("No user xattrs here")
+    monkeypatch.setitem(section4_hashing.CONFIG, "xattr_digests", True)
+    for path, year in ((str(video), 2017), (str(text), None)):
+        first, read = _hash_counting(path)
+        assert first[5] == year and read > 0
+        # Digest and year (or the lack of one) both come from the tag now
+        again, read = _hash_counting(path)
+        assert again[1] == first[1] and again[5] == year
+        assert read == 0
+        assert read_digest(path, "sha256", os.stat(path))[1] == (year or UNDATED)